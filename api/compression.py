@@ -0,0 +1,161 @@
+# api/compression.py - 响应压缩（br / gzip）
+# 按 Accept-Encoding 协商压缩方式，只压缩一次性返回的响应体；流式响应（导出、行情推送）原样转发。
+# 带 ETag 的响应按 (URL, ETag, 压缩方式) 缓存压缩结果：数据版本不变时同一页面只压缩一次
+import gzip
+from collections import OrderedDict
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于此大小的响应压缩收益不抵开销
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+# brotli 质量4～5 的速度与 gzip 6 相当，中文JSON压缩率更高
+BROTLI_QUALITY = 5
+# 超过此大小的响应体放到线程池中压缩，不阻塞事件循环
+THREAD_THRESHOLD = 64 * 1024
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding):
+    """按客户端声明选择压缩方式，优先 br；q=0 表示不接受"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    def acceptable(name):
+        return accepted.get(name, accepted.get("*", 0)) > 0
+
+    if brotli is not None and acceptable("br"):
+        return "br"
+    if acceptable("gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressedCache:
+    """按总字节数限制大小的LRU缓存，只在事件循环线程中访问"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is not None:
+            self.entries.move_to_end(key)
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=MINIMUM_SIZE, cache_max_bytes=CACHE_MAX_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedCache(cache_max_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        url = scope["path"] + ("?" + scope["query_string"].decode("latin-1") if scope["query_string"] else "")
+        responder = _CompressionResponder(self, send, encoding, url)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware, send, encoding, url):
+        self.middleware = middleware
+        self.downstream = send
+        self.encoding = encoding
+        self.url = url
+        self.start_message = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        self.passthrough = True
+        body = message.get("body", b"")
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if message.get("more_body", False) or not self._compressible(headers, body):
+            # 流式响应、已压缩或太小的响应原样发送
+            await self.downstream(self.start_message)
+            await self.downstream(message)
+            return
+
+        compressed = await self._compressed(body, headers.get("etag"))
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        await self.downstream(self.start_message)
+        await self.downstream({"type": "http.response.body", "body": compressed})
+
+    def _compressible(self, headers, body):
+        return (self.start_message["status"] not in (204, 304)
+                and len(body) >= self.middleware.minimum_size
+                and "content-encoding" not in headers
+                and not headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES))
+
+    async def _compressed(self, body, etag):
+        cache = self.middleware.cache
+        key = (self.url, etag, self.encoding) if etag else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        if len(body) > THREAD_THRESHOLD:
+            compressed = await anyio.to_thread.run_sync(compress, body, self.encoding)
+        else:
+            compressed = compress(body, self.encoding)
+
+        if key is not None:
+            cache.put(key, compressed)
+        return compressed
@@ -0,0 +1,69 @@
+# api/conditional.py - 轮询接口的条件请求（ETag / Last-Modified）
+# 版本号来自 table_stats（由数据表触发器维护），读取它只是一次主键查询；
+# 客户端带回的 If-None-Match 与当前版本一致时直接返回304，不执行列表查询
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response
+
+from database.models import TableStats
+
+# 浏览器收到后每次使用缓存前都带上验证头重新请求
+CACHE_CONTROL = "no-cache"
+
+
+class DataVersion:
+    """若干数据表当前的版本；必须在执行数据查询之前读取，保证响应内容不会比ETag旧"""
+
+    def __init__(self, etag, last_modified):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def read(cls, db, *table_names):
+        rows = {row.table_name: row for row in
+                db.query(TableStats.table_name, TableStats.version, TableStats.changed_at)
+                .filter(TableStats.table_name.in_(table_names))}
+        parts, changed_at = [], 0
+        for table_name in table_names:
+            row = rows.get(table_name)
+            parts.append(f"{row.version:x}" if row else "0")
+            changed_at = max(changed_at, row.changed_at or 0) if row else changed_at
+        # 修改时间也放进ETag：重建数据库后版本号从头计数，也不会与旧ETag相同
+        etag = f'W/"{"-".join(parts)}.{changed_at:x}"'
+        last_modified = datetime.fromtimestamp(changed_at, timezone.utc) if changed_at else None
+        return cls(etag, last_modified)
+
+    @property
+    def headers(self):
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.last_modified:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, request):
+        """按HTTP规则判断客户端缓存是否仍然有效：有 If-None-Match 时忽略 If-Modified-Since"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or _weak(self.etag) in {_weak(tag) for tag in tags}
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def not_modified(self):
+        return Response(status_code=304, headers=self.headers)
+
+    def apply(self, response):
+        response.headers.update(self.headers)
+        return response
+
+
+def _weak(tag):
+    """弱比较：忽略 W/ 前缀"""
+    return tag[2:] if tag.startswith("W/") else tag
@@ -0,0 +1,234 @@
+# api/crawl_scheduler.py - 按计划运行爬虫配置
+# 爬虫配置的 schedule 字段（JSON）二选一：
+#   {"interval": 60, "offhours_interval": 1800}    交易时段每60秒一次，非交易时段每30分钟一次（开盘时立即恢复）
+#   {"cron": "*/5 9-15 * * 1-5"}                   cron表达式（分 时 日 月 周），按北京时间
+# 可选项：
+#   "market_hours_only": true   只在A股交易时段运行
+#   "jitter": 10                每次在计划时间后随机推迟0～10秒，避免多个配置同时启动
+#   "priority": 10              提交到爬取任务队列时的优先级
+# 计划时间到达时如果该配置上一次运行还在排队或运行中，跳过这一次。下次运行时间只保存在内存中，
+# API重启后按 last_run_at 推算
+import json
+import os
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+
+from database.crawler_config import CrawlerConfig
+from database.models import get_session
+from api.crawl_service import PRIORITY_NORMAL
+from api.market_calendar import MARKET_TZ, is_market_open, market_time, next_market_open
+
+# 检查到期配置的间隔（秒）
+SCHEDULER_TICK = float(os.environ.get('CRAWL_SCHEDULER_TICK', 5))
+MIN_INTERVAL = 10  # 秒
+
+_CRON_FIELDS = (('分钟', 0, 59), ('小时', 0, 23), ('日', 1, 31), ('月', 1, 12), ('星期', 0, 7))
+
+
+class InvalidSchedule(ValueError):
+    pass
+
+
+class CronExpression:
+    """五段式cron表达式，支持 *、数字、a-b、*/n、a-b/n 和逗号分隔的列表；星期的0和7都表示周日"""
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise InvalidSchedule("cron表达式需要5段：分 时 日 月 周")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, *field) for part, field in zip(parts, _CRON_FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # 与标准cron一致：日和星期都有限制时满足任一即可；以 * 开头的字段（*、*/n）不算限制
+        self.days_restricted = not parts[2].startswith('*')
+        self.weekdays_restricted = not parts[4].startswith('*')
+
+    @staticmethod
+    def _parse(part, name, low, high):
+        values = set()
+        for item in part.split(','):
+            spec, _, step = item.partition('/')
+            try:
+                step = int(step) if step else 1
+                if spec == '*':
+                    start, end = low, high
+                elif '-' in spec:
+                    start, end = (int(value) for value in spec.split('-', 1))
+                else:
+                    start = end = int(spec)
+            except ValueError:
+                raise InvalidSchedule(f"无效的{name}: {item}")
+            if step < 1 or start < low or end > high or start > end:
+                raise InvalidSchedule(f"{name}超出范围: {item}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        """moment（北京时间）之后第一个匹配的整分钟"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # 逐级跳过不匹配的月、日、时，最多查找约5年
+        for _ in range(100000):
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise InvalidSchedule("cron表达式没有匹配的时间")
+
+
+def parse_schedule(schedule):
+    """校验计划配置（字典或JSON字符串），返回字典；无效时抛出 InvalidSchedule"""
+    if isinstance(schedule, str):
+        try:
+            schedule = json.loads(schedule)
+        except json.JSONDecodeError:
+            raise InvalidSchedule("计划配置不是有效的JSON")
+    if not isinstance(schedule, dict):
+        raise InvalidSchedule("计划配置应为JSON对象")
+    if ('interval' in schedule) == ('cron' in schedule):
+        raise InvalidSchedule("interval 和 cron 需要且只能设置一个")
+
+    if 'cron' in schedule:
+        if not isinstance(schedule['cron'], str):
+            raise InvalidSchedule("cron 应为字符串")
+        CronExpression(schedule['cron'])
+    for key in ('interval', 'offhours_interval'):
+        if key in schedule and (not isinstance(schedule[key], (int, float)) or schedule[key] < MIN_INTERVAL):
+            raise InvalidSchedule(f"{key} 应为不小于 {MIN_INTERVAL} 的秒数")
+    if not isinstance(schedule.get('jitter', 0), (int, float)) or schedule.get('jitter', 0) < 0:
+        raise InvalidSchedule("jitter 应为非负的秒数")
+    if not isinstance(schedule.get('priority', PRIORITY_NORMAL), int):
+        raise InvalidSchedule("priority 应为整数")
+    return schedule
+
+
+def next_run_time(schedule, after, rng=random):
+    """after 之后的下一次运行时间（北京时间），已加上随机推迟"""
+    after = market_time(after)
+    market_hours_only = schedule.get('market_hours_only', False)
+    if 'cron' in schedule:
+        cron = CronExpression(schedule['cron'])
+        moment = cron.next_after(after)
+        # 只在交易时段运行时跳过落在休市时间的匹配，一年内没有就放弃
+        while market_hours_only and not is_market_open(moment):
+            if moment - after > timedelta(days=366):
+                raise InvalidSchedule("cron表达式在交易时段内没有匹配的时间")
+            moment = cron.next_after(moment)
+    elif is_market_open(after):
+        moment = after + timedelta(seconds=schedule['interval'])
+        if market_hours_only and not is_market_open(moment):
+            moment = next_market_open(moment)
+    elif market_hours_only:
+        moment = next_market_open(after)
+    else:
+        offhours = timedelta(seconds=schedule.get('offhours_interval', schedule['interval']))
+        moment = min(after + offhours, next_market_open(after))
+    return moment + timedelta(seconds=rng.uniform(0, schedule.get('jitter', 0)))
+
+
+class CrawlScheduler:
+    """后台线程：定期检查启用且设置了计划的爬虫配置，到期后提交到爬取任务队列"""
+
+    def __init__(self, service, tick=SCHEDULER_TICK):
+        self.service = service
+        self.tick = tick
+        self.next_runs = {}  # config_id -> (schedule原文, 下次运行时间)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='crawl-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"爬虫计划检查失败: {e}")
+
+    def run_due(self, now=None):
+        """提交所有到期的配置，返回提交的任务列表"""
+        now = market_time(now or datetime.now(timezone.utc))
+        session = get_session()
+        try:
+            configs = session.query(CrawlerConfig).filter(
+                CrawlerConfig.is_active == True, CrawlerConfig.schedule.isnot(None)  # noqa: E712
+            ).all()
+            session.expunge_all()
+        finally:
+            session.close()
+
+        jobs = []
+        scheduled = set()
+        for config in configs:
+            scheduled.add(config.id)
+            try:
+                schedule = parse_schedule(config.schedule)
+            except InvalidSchedule as e:
+                if self.next_runs.get(config.id, (None,))[0] != config.schedule:
+                    print(f"爬虫配置 '{config.name}' 的计划无效: {e}")
+                    self.next_runs[config.id] = (config.schedule, None)
+                continue
+
+            text, due = self.next_runs.get(config.id, (None, None))
+            if text != config.schedule or due is None:
+                due = self._first_run(schedule, config.last_run_at, now)
+                self.next_runs[config.id] = (config.schedule, due)
+            if due > now:
+                continue
+
+            self.next_runs[config.id] = (config.schedule, next_run_time(schedule, now))
+            if self.service.is_active('dynamic', config_id=config.id):
+                print(f"爬虫配置 '{config.name}' 上次运行尚未结束，跳过本次计划运行")
+                continue
+            job, merged = self.service.submit_config(config, priority=schedule.get('priority', PRIORITY_NORMAL))
+            if not merged:
+                jobs.append(job)
+
+        # 删除或停用的配置不再保留计划
+        for config_id in set(self.next_runs) - scheduled:
+            del self.next_runs[config_id]
+        return jobs
+
+    @staticmethod
+    def _first_run(schedule, last_run_at, now):
+        """API启动或计划修改后的第一次运行时间：按上次运行时间推算，已经错过的尽快补上"""
+        if last_run_at is not None:
+            due = next_run_time(schedule, last_run_at)
+        elif 'interval' in schedule:
+            due = now
+        else:
+            due = next_run_time(schedule, now)
+        if due > now:
+            return due
+        if schedule.get('market_hours_only') and not is_market_open(now):
+            return next_run_time(schedule, now)
+        return now
+
+    def upcoming(self):
+        """{config_id: 下次运行时间（北京时间）}"""
+        return {config_id: due.astimezone(MARKET_TZ) if due else None
+                for config_id, (_, due) in list(self.next_runs.items())}
@@ -0,0 +1,233 @@
+# api/crawl_service.py - 爬取任务队列
+# API提交的爬取任务先进入这里的优先队列，满足并发限制时才交给爬虫工作进程池：
+# - 同一爬虫（动态爬虫按配置区分）已在排队或运行时，重复的提交合并到已有任务，不会启动第二个
+# - 同时运行的任务总数不超过 max_concurrent，同一网站同时运行的任务不超过 max_per_domain
+# - 优先级高的先运行（数值越大越优先，与Scrapy请求的priority一致），同优先级按提交顺序
+import heapq
+import itertools
+import os
+import threading
+from urllib.parse import urlparse
+
+from database.crawl_jobs import create_job, finish_job
+from database.crawler_config import record_run_started, record_run_finished
+
+PRIORITY_REALTIME = 10  # 实时行情
+PRIORITY_NORMAL = 0
+PRIORITY_BACKFILL = -10  # 新闻、研报等补数据
+
+# 按配置运行动态爬虫时的设置，限制数量避免过度爬取
+CONFIG_RUN_SETTINGS = {'CLOSESPIDER_ITEMCOUNT': 50}
+
+MAX_CONCURRENT = int(os.environ.get('CRAWL_MAX_CONCURRENT', 2))
+MAX_PER_DOMAIN = int(os.environ.get('CRAWL_MAX_PER_DOMAIN', 1))
+
+# 形如 sina.com.cn 的网站取最后三段
+_SECOND_LEVEL_LABELS = {'com', 'net', 'org', 'gov', 'edu', 'ac'}
+
+
+def site_of(host):
+    """主机名 -> 网站（注册域名），如 finance.sina.com.cn -> sina.com.cn"""
+    labels = host.lower().strip('.').split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL_LABELS:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def config_domains(config):
+    """动态爬虫配置访问的域名：allowed_domains，没有时取 start_urls 的主机名"""
+    domains = list(config.get('allowed_domains') or [])
+    if not domains:
+        domains = [urlparse(url).hostname for url in config.get('start_urls', [])]
+    return [domain for domain in domains if domain]
+
+
+class QueuedCrawl:
+    def __init__(self, job, key, priority, sites, config_id):
+        self.job = job
+        self.key = key
+        self.priority = priority
+        self.sites = sites
+        self.config_id = config_id
+        self.cancelled = False  # 优先级提升后旧的队列项作废
+        self.recorded = False  # 任务记录写入数据库之后才进入优先队列
+
+
+class CrawlService:
+    """爬取任务的优先队列与并发控制，所有状态在 _lock 下访问"""
+
+    def __init__(self, pool, max_concurrent=MAX_CONCURRENT, max_per_domain=MAX_PER_DOMAIN):
+        self.pool = pool
+        # 进程池中每个工作进程同时只运行一个任务，并发数超过进程数的任务只会在进程池的队列里等待
+        self.max_concurrent = min(max_concurrent, pool.size) if pool.size > 0 else max_concurrent
+        self.max_per_domain = max_per_domain
+        self._lock = threading.Lock()
+        self._heap = []
+        self._order = itertools.count()
+        self._active = {}  # 单飞键 -> 排队或运行中的 QueuedCrawl
+        self._running = set()  # 运行中的单飞键
+        self._site_counts = {}
+        self._closed = False
+
+    def submit(self, spider_name, spider_args=None, settings=None, priority=PRIORITY_NORMAL,
+               config_id=None, domains=None):
+        """提交任务，返回 (CrawlJob, 是否合并到了已有任务)
+
+        domains 为爬虫访问的域名，不提供时使用工作进程上报的 allowed_domains。
+        单飞登记在 _lock 下完成；任务记录在释放 _lock 后写入数据库，写入之后才进入优先队列，
+        数据库写入慢时不会挡住其他提交和任务结束的处理
+        """
+        spider_args = dict(spider_args or {})
+        key = self._key(spider_name, spider_args, config_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("爬取任务队列已关闭")
+            existing = self._active.get(key)
+            if existing is not None:
+                if key not in self._running and priority > existing.priority:
+                    self._requeue(existing, priority)
+                return existing.job, True
+
+            job = self.pool.create_job(spider_name, spider_args, settings)
+            if domains is None:
+                domains = self.pool.spider_domains.get(spider_name)
+            # 还不知道域名的爬虫按爬虫名限制
+            sites = frozenset(site_of(domain) for domain in domains) if domains else frozenset([spider_name])
+            queued = QueuedCrawl(job, key, priority, sites, config_id)
+            self._active[key] = queued
+
+        try:
+            create_job(job.job_id, spider_name, spider_args, config_id, job.log_file)
+        except Exception as e:
+            # 合并到这个任务的调用方也在等待结果
+            with self._lock:
+                self._active.pop(key, None)
+            job.future.set_result({'status': 'failed', 'finish_reason': None, 'stats': {},
+                                   'error': f"写入任务记录失败: {e}"})
+            raise
+
+        with self._lock:
+            queued.recorded = True
+            closed = self._closed
+            if closed:
+                self._active.pop(key, None)
+                started = []
+            else:
+                heapq.heappush(self._heap, (-queued.priority, next(self._order), queued))
+                started = self._dispatch()
+        if closed:
+            job.future.set_result({'status': 'failed', 'finish_reason': None, 'stats': {},
+                                   'error': "API关闭，任务未运行"})
+            self._record_finished(job)
+        self._launch(started)
+        return job, False
+
+    def submit_config(self, config, priority=PRIORITY_NORMAL):
+        """按爬虫配置（CrawlerConfig）运行动态爬虫，并更新配置的运行次数和成功次数
+
+        运行统计用各自的会话写入，不依赖调用方（请求）的数据库会话
+        """
+        job, merged = self.submit('dynamic', {'config_name': config.name}, CONFIG_RUN_SETTINGS, priority=priority,
+                                  config_id=config.id, domains=config_domains(config.get_config()))
+        if not merged:
+            record_run_started(config.id)
+            job.future.add_done_callback(
+                lambda future, config_id=config.id: self._record_config_result(config_id, future.result()))
+        return job, merged
+
+    @staticmethod
+    def _record_config_result(config_id, result):
+        try:
+            record_run_finished(config_id, result['status'] == 'finished')
+        except Exception as e:
+            print(f"更新配置运行统计失败: {e}")
+
+    def is_active(self, spider_name, spider_args=None, config_id=None):
+        """该爬虫（或配置）是否有任务在排队或运行"""
+        with self._lock:
+            return self._key(spider_name, spider_args, config_id) in self._active
+
+    @staticmethod
+    def _key(spider_name, spider_args, config_id):
+        """单飞键：动态爬虫按配置区分，其他爬虫按名称和参数区分"""
+        if config_id is not None:
+            return spider_name, config_id
+        return spider_name, tuple(sorted((spider_args or {}).items()))
+
+    def queued(self):
+        """排队中的任务，按将要运行的顺序"""
+        with self._lock:
+            return [queued.job for _, _, queued in sorted(self._heap) if not queued.cancelled]
+
+    def shutdown(self):
+        """不再接受新任务，排队中的任务标记为失败；运行中的任务由进程池负责结束"""
+        with self._lock:
+            self._closed = True
+            pending = [queued for _, _, queued in self._heap if not queued.cancelled]
+            self._heap = []
+            for queued in pending:
+                self._active.pop(queued.key, None)
+        for queued in pending:
+            queued.job.future.set_result({'status': 'failed', 'finish_reason': None, 'stats': {},
+                                          'error': "API关闭，任务未运行"})
+            self._record_finished(queued.job)
+
+    def _requeue(self, queued, priority):
+        if not queued.recorded:
+            # 还没有进入优先队列，入队时使用新的优先级
+            queued.priority = priority
+            return
+        queued.cancelled = True
+        replacement = QueuedCrawl(queued.job, queued.key, priority, queued.sites, queued.config_id)
+        self._active[queued.key] = replacement
+        heapq.heappush(self._heap, (-priority, next(self._order), replacement))
+
+    def _dispatch(self):
+        """在持有 _lock 时调用：按优先级取出所有满足并发限制的任务并计入运行中，返回这些任务
+
+        网站已满的任务留在队列中，不挡住后面其他网站的任务。
+        取出的任务由调用方在释放 _lock 之后用 _launch 交给进程池
+        """
+        started = []
+        skipped = []
+        while self._heap and len(self._running) < self.max_concurrent:
+            entry = heapq.heappop(self._heap)
+            queued = entry[2]
+            if queued.cancelled:
+                continue
+            if any(self._site_counts.get(site, 0) >= self.max_per_domain for site in queued.sites):
+                skipped.append(entry)
+                continue
+            self._running.add(queued.key)
+            for site in queued.sites:
+                self._site_counts[site] = self._site_counts.get(site, 0) + 1
+            started.append(queued)
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return started
+
+    def _launch(self, started):
+        """不能持有 _lock 调用：已完成的 future 会立即执行回调，进程池也有自己的锁"""
+        for queued in started:
+            queued.job.future.add_done_callback(lambda _, queued=queued: self._finished(queued))
+            self.pool.submit_job(queued.job)
+
+    def _finished(self, queued):
+        with self._lock:
+            self._running.discard(queued.key)
+            self._active.pop(queued.key, None)
+            for site in queued.sites:
+                self._site_counts[site] -= 1
+            started = self._dispatch() if not self._closed else []
+        self._launch(started)
+        self._record_finished(queued.job)
+
+    def _record_finished(self, job):
+        result = job.future.result()
+        try:
+            finish_job(job.job_id, result['status'], result['error'])
+        except Exception as e:
+            print(f"更新爬取任务记录失败: {e}")
+        print(f"爬虫 {job.spider_name} 执行完成，状态: {result['status']}, 日志: {job.log_file}")
+        if result['error']:
+            print(f"错误: {result['error']}")
@@ -1,28 +1,85 @@
 # api/main.py - FastAPI主应用
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+import anyio.to_thread
+import json
 import sys
 import os
-import subprocess
 # 启动api接口命令：python -m uvicorn api.main:app --host 0.0.0.0 --port 8000 --reload
 # 添加数据库路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 
-from database.models import get_session, StockData, ResearchReport, FinancialNews
-from pydantic import BaseModel
+from database.models import ENGINE_SETTINGS, get_session, StockData, LatestQuote, ResearchReport, FinancialNews, TableStats
+from database.normalize import format_price, format_change, format_percent, format_volume
+from database.fulltext import build_match_query, search_fulltext
+from database.export import EXPORT_FORMATS, InvalidExport, export_model, stream_export
+from pydantic import BaseModel, Field, field_validator
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 from database.crawler_config import CrawlerConfig, DEFAULT_CONFIG_TEMPLATE
+from database.crawl_jobs import JOB_STATES, CrawlJobRecord, interrupt_unfinished_jobs
+from database.crawl_runs import CrawlRun
+from api.pagination import Keyset, InvalidCursor, NEXT_CURSOR_HEADER
+from api.projection import FieldSet, InvalidFields, FastJSONResponse
+from api.conditional import DataVersion
+from api.quote_stream import QuoteHub
+from api.compression import CompressionMiddleware
+from api.crawl_service import CrawlService, PRIORITY_NORMAL
+from api.crawl_scheduler import CrawlScheduler, InvalidSchedule, parse_schedule
+from api.market_calendar import check_holiday_coverage, is_market_open, market_time, next_market_open
+from scrapy_project.worker_pool import CrawlWorkerPool
+
+
+# 同步接口在线程池中执行；默认线程数与数据库连接池上限一致，线程不会因等待连接而阻塞
+API_THREADPOOL_SIZE = int(os.environ.get(
+    'API_THREADPOOL_SIZE', ENGINE_SETTINGS['pool_size'] + ENGINE_SETTINGS['max_overflow']
+))
+
+# 常驻爬虫工作进程数；为0时每次爬取启动一个 scrapy crawl 子进程
+CRAWL_WORKERS = int(os.environ.get('CRAWL_WORKERS', 2))
+CRAWL_POOL = CrawlWorkerPool(CRAWL_WORKERS)
+# 爬取任务先进入队列：重复提交合并，按优先级和并发限制交给进程池
+CRAWL_SERVICE = CrawlService(CRAWL_POOL)
+# 按爬虫配置的 schedule 定期提交任务，设为0时不启动
+CRAWL_SCHEDULER_ENABLED = os.environ.get('CRAWL_SCHEDULER_ENABLED', '1').lower() in ('1', 'true', 'yes', 'on')
+CRAWL_SCHEDULER = CrawlScheduler(CRAWL_SERVICE)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    # 启动时就提示缺少当年的休市安排，不等到第一次按交易时段调度
+    check_holiday_coverage(market_time(datetime.utcnow()).date())
+    try:
+        interrupted = await anyio.to_thread.run_sync(interrupt_unfinished_jobs)
+        if interrupted:
+            print(f"{interrupted} 个上次未结束的爬取任务已标记为失败")
+    except Exception as e:
+        print(f"更新爬取任务记录失败: {e}")
+    # 工作进程在后台预热，不阻塞API启动
+    CRAWL_POOL.start()
+    if CRAWL_SCHEDULER_ENABLED:
+        CRAWL_SCHEDULER.start()
+    yield
+    await QUOTE_HUB.close()
+    await anyio.to_thread.run_sync(CRAWL_SCHEDULER.stop)
+    await anyio.to_thread.run_sync(CRAWL_SERVICE.shutdown)
+    await anyio.to_thread.run_sync(CRAWL_POOL.shutdown)
 
 
 # 创建FastAPI应用
+# 访问数据库的接口都定义为普通函数（def），由FastAPI放到线程池中执行，慢查询不会阻塞事件循环
 app = FastAPI(
     title="金融数据爬虫API",
     description="提供股票数据、研究报告和财经新闻的REST API接口",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件，允许前端访问
@@ -32,20 +89,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],  # 允许前端读取下一页游标和缓存验证头
 )
 
+# 按 Accept-Encoding 压缩响应（br / gzip），带ETag的响应缓存压缩结果；流式响应不压缩
+app.add_middleware(CompressionMiddleware)
+
 # Pydantic模型用于API响应
 class StockDataResponse(BaseModel):
-    id: int
+    # 最新行情快照（latest=true）没有历史记录id
+    id: Optional[int] = None
     symbol: str
     name: str
+    # 展示字符串，格式与前端约定一致，例如 "+0.42"、"+1.10%"
     price: Optional[str]
     change: Optional[str]
     change_percent: Optional[str]
     volume: Optional[str]
+    # 数据库中的原始数值
+    price_value: Optional[float] = Field(None, validation_alias='price')
+    change_value: Optional[float] = Field(None, validation_alias='change')
+    change_percent_value: Optional[float] = Field(None, validation_alias='change_percent')
+    volume_value: Optional[int] = Field(None, validation_alias='volume')
+    turnover: Optional[float] = None  # 成交额（元）
+    quote_time: Optional[datetime] = None
     source_url: Optional[str]
     crawl_time: Optional[datetime]
 
+    @field_validator('price', mode='before')
+    @classmethod
+    def _format_price(cls, value):
+        return format_price(value) if isinstance(value, (int, float)) else value
+
+    @field_validator('change', mode='before')
+    @classmethod
+    def _format_change(cls, value):
+        return format_change(value) if isinstance(value, (int, float)) else value
+
+    @field_validator('change_percent', mode='before')
+    @classmethod
+    def _format_percent(cls, value):
+        return format_percent(value) if isinstance(value, (int, float)) else value
+
+    @field_validator('volume', mode='before')
+    @classmethod
+    def _format_volume(cls, value):
+        return format_volume(value) if isinstance(value, (int, float)) else value
+
     class Config:
         from_attributes = True
 
@@ -80,6 +170,29 @@ class FinancialNewsResponse(BaseModel):
         from_attributes = True
 
 
+# 列表接口可选的字段，fields= 参数取值范围
+STOCK_FIELDS = FieldSet.from_response_model(StockDataResponse, formatters={
+    'price': format_price,
+    'change': format_change,
+    'change_percent': format_percent,
+    'volume': format_volume,
+})
+REPORT_FIELDS = FieldSet.from_response_model(ResearchReportResponse)
+NEWS_FIELDS = FieldSet.from_response_model(FinancialNewsResponse)
+
+FIELDS_DESCRIPTION = "只返回指定字段，逗号分隔，例如 id,title,crawl_time；未指定时返回全部字段"
+
+
+class ReportSearchResult(ResearchReportResponse):
+    snippet: Optional[str] = None  # 命中位置的高亮摘要，命中词用 <mark></mark> 包裹
+    score: Optional[float] = None  # BM25得分，越小越相关
+
+
+class NewsSearchResult(FinancialNewsResponse):
+    snippet: Optional[str] = None
+    score: Optional[float] = None
+
+
 class SystemStatsResponse(BaseModel):
     total_stocks: int
     total_reports: int
@@ -99,6 +212,7 @@ class CrawlerConfigResponse(BaseModel):
     last_run_at: Optional[datetime]
     run_count: int
     success_count: int
+    schedule: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -108,6 +222,11 @@ class ConfigCreateRequest(BaseModel):
     description: Optional[str] = ""
     website_name: str
     config_json: str
+    schedule: Optional[dict] = None
+
+
+class ScheduleRequest(BaseModel):
+    schedule: Optional[dict] = Field(None, description="运行计划，为空时取消计划")
 
 
 # 依赖项：获取数据库会话
@@ -131,75 +250,159 @@ async def root():
             "stocks": "/api/stocks",
             "reports": "/api/reports",
             "news": "/api/news",
-            "stats": "/api/stats"
+            "stats": "/api/stats",
+            "export": "/api/export/{table}",
+            "crawl_jobs": "/api/crawl/jobs"
         }
     }
 
 # 系统状态
 @app.get("/api/stats", response_model=SystemStatsResponse, tags=["系统"])
-async def get_system_stats(db: Session = Depends(get_db)):
-    """获取系统统计信息"""
+def get_system_stats(request: Request, response: Response, db: Session = Depends(get_db)):
+    """获取系统统计信息（支持 If-None-Match，数据未变化时返回304）"""
     try:
-        total_stocks = db.query(StockData).count()
-        total_reports = db.query(ResearchReport).count()
-        total_news = db.query(FinancialNews).count()
+        version = DataVersion.read(db, StockData.__tablename__, ResearchReport.__tablename__,
+                                   FinancialNews.__tablename__)
+        if version.matches(request):
+            return version.not_modified()
+        version.apply(response)
+
+        # 读取pipeline维护的计数器，不扫描数据表；计数器不准时运行 python database/table_stats.py 重建
+        stats = {row.table_name: row for row in db.query(TableStats).all()}
 
-        # 获取最新更新时间
-        latest_stock = db.query(StockData).order_by(StockData.crawl_time.desc()).first()
-        last_update = latest_stock.crawl_time if latest_stock else None
+        def row_count(model):
+            return stats[model.__tablename__].row_count if model.__tablename__ in stats else 0
+
+        stock_stats = stats.get(StockData.__tablename__)
 
         return SystemStatsResponse(
-            total_stocks=total_stocks,
-            total_reports=total_reports,
-            total_news=total_news,
-            last_update=last_update
+            total_stocks=row_count(StockData),
+            total_reports=row_count(ResearchReport),
+            total_news=row_count(FinancialNews),
+            last_update=stock_stats.last_update if stock_stats else None
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
 
 # 股票数据API
+def stock_keyset(sort_by: str = "crawl_time", order: str = "desc", latest: bool = False) -> Keyset:
+    """股票列表的排序方式；快照表以主键symbol作为决胜列，历史表用自增id"""
+    model = LatestQuote if latest else StockData
+    if sort_by not in model.__table__.columns:
+        sort_by = "crawl_time"
+    return Keyset(
+        getattr(model, sort_by),
+        model.symbol if latest else model.id,
+        descending=order.lower() == "desc",
+        # crawl_time 入库时总会赋值，按非空处理才能让游标条件走索引
+        nullable=False if sort_by == "crawl_time" else None,
+    )
+
+
+def build_stock_query(db: Session, symbol: Optional[str] = None, name_contains: Optional[str] = None,
+                      sort_by: str = "crawl_time", order: str = "desc", latest: bool = False,
+                      cursor: Optional[str] = None, columns=None):
+    """构造股票列表查询（不含分页），查询计划检查脚本也使用此函数
+
+    latest=True 时查询最新行情快照表，每个股票代码只有一行；cursor 为上一页返回的游标；
+    columns 为只查询的列（字段投影），未指定时查询整行
+    """
+    model = LatestQuote if latest else StockData
+    query = db.query(*columns) if columns else db.query(model)
+
+    # 筛选条件：代码精确匹配，使用 (symbol, crawl_time) 索引或快照表主键
+    if symbol:
+        query = query.filter(model.symbol == symbol.strip())
+
+    if name_contains:
+        query = query.filter(model.name.ilike(f"%{name_contains}%"))
+
+    # 排序，给出游标时从游标之后开始
+    return stock_keyset(sort_by, order, latest).apply(query, cursor)
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+def fetch_list(request: Request, db: Session, query_builder, model, field_set: FieldSet, keyset: Keyset,
+               fields: Optional[str], limit: int, skip: int, cursor: Optional[str]) -> Response:
+    """只查询需要的列，结果直接转为字典序列化，不逐行构造Pydantic模型
+
+    先读取数据表版本号，客户端缓存仍然有效时返回304，不执行列表查询
+    """
+    names = field_set.select(fields)
+    version = DataVersion.read(db, model.__tablename__)
+    if version.matches(request):
+        return version.not_modified()
+    columns = field_set.columns(model, names, keyset.sort_column, keyset.tiebreaker)
+    rows, next_cursor = keyset.fetch_page(query_builder(columns), limit, skip, cursor)
+    response = FastJSONResponse(field_set.serialize(rows, names))
+    set_next_cursor(response, next_cursor)
+    return version.apply(response)
+
+
 @app.get("/api/stocks", response_model=List[StockDataResponse], tags=["股票数据"])
-async def get_stocks(
-        skip: int = Query(0, ge=0, description="跳过的记录数"),
+def get_stocks(
+        request: Request,
+        skip: int = Query(0, ge=0, description="跳过的记录数（建议改用cursor）"),
         limit: int = Query(20, ge=1, le=100, description="返回的记录数，最大100"),
-        symbol: Optional[str] = Query(None, description="按股票代码筛选"),
+        symbol: Optional[str] = Query(None, description="按股票代码筛选（精确匹配，与入库时一致，如 sh600036）"),
         name_contains: Optional[str] = Query(None, description="按股票名称模糊搜索"),
         sort_by: str = Query("crawl_time", description="排序字段"),
         order: str = Query("desc", description="排序方向 (asc/desc)"),
+        latest: bool = Query(False, description="只返回每个股票的最新行情"),
+        cursor: Optional[str] = Query(None, description="分页游标，取上一页响应头 X-Next-Cursor 的值"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
         db: Session = Depends(get_db)
 ):
     """获取股票数据列表"""
     try:
-        query = db.query(StockData)
+        return fetch_list(
+            request, db, lambda columns: build_stock_query(db, symbol, name_contains, sort_by, order, latest, cursor, columns),
+            LatestQuote if latest else StockData, STOCK_FIELDS, stock_keyset(sort_by, order, latest),
+            fields, limit, skip, cursor
+        )
 
-        # 筛选条件
-        if symbol:
-            query = query.filter(StockData.symbol.ilike(f"%{symbol}%"))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
 
-        if name_contains:
-            query = query.filter(StockData.name.ilike(f"%{name_contains}%"))
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # 排序
-        if hasattr(StockData, sort_by):
-            order_column = getattr(StockData, sort_by)
-            if order.lower() == "desc":
-                query = query.order_by(order_column.desc())
-            else:
-                query = query.order_by(order_column.asc())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取股票数据失败: {str(e)}")
 
-        # 分页
-        stocks = query.offset(skip).limit(limit).all()
 
-        return stocks
+# 行情推送：所有连接共享一个 latest_quotes 跟踪任务，推送内容与 /api/stocks?latest=true 的字段一致
+QUOTE_HUB = QuoteHub(
+    STOCK_FIELDS.columns(LatestQuote, STOCK_FIELDS.select(None)),
+    lambda rows: STOCK_FIELDS.serialize(rows, STOCK_FIELDS.select(None)),
+)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"获取股票数据失败: {str(e)}")
+
+@app.get("/api/stream/quotes", tags=["股票数据"])
+async def stream_quotes(
+        symbols: Optional[str] = Query(None, description="只推送这些股票代码，逗号分隔；未指定时推送全部"),
+        last_event_id: Optional[str] = Header(None, description="EventSource 重连时自动带上"),
+):
+    """Server-Sent Events 行情推送：连接后先推送当前快照，之后推送新的或变化的行情（event: quotes）
+
+    客户端来不及接收时，同一股票只保留最新一条待发送行情；连接定期结束，重连时只补发期间变化的行情
+    """
+    subscribed = {item.strip() for item in symbols.split(',') if item.strip()} if symbols else None
+    return StreamingResponse(
+        QUOTE_HUB.stream(subscribed, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # 单个股票详情
 @app.get("/api/stocks/{stock_id}", response_model=StockDataResponse, tags=["股票数据"])
-async def get_stock_detail(stock_id: int, db: Session = Depends(get_db)):
+def get_stock_detail(stock_id: int, db: Session = Depends(get_db)):
     """获取单个股票的详细信息"""
     stock = db.query(StockData).filter(StockData.id == stock_id).first()
     if not stock:
@@ -208,93 +411,160 @@ async def get_stock_detail(stock_id: int, db: Session = Depends(get_db)):
 
 
 # 研究报告API
+REPORT_KEYSET = Keyset(ResearchReport.crawl_time, ResearchReport.id, nullable=False)
+
+
+def build_report_query(db: Session, institution: Optional[str] = None, rating: Optional[str] = None,
+                       cursor: Optional[str] = None, columns=None):
+    """构造研究报告列表查询（不含分页），按爬取时间倒序"""
+    query = db.query(*columns) if columns else db.query(ResearchReport)
+
+    # 精确匹配，分别使用 (institution, crawl_time) / (rating, crawl_time) 索引；
+    # 模糊匹配只能沿 crawl_time 索引逐行过滤，条件越少见越慢
+    if institution:
+        query = query.filter(ResearchReport.institution == institution)
+
+    if rating:
+        query = query.filter(ResearchReport.rating == rating)
+
+    return REPORT_KEYSET.apply(query, cursor)
+
+
 @app.get("/api/reports", response_model=List[ResearchReportResponse], tags=["研究报告"])
-async def get_research_reports(
+def get_research_reports(
+        request: Request,
         skip: int = Query(0, ge=0),
         limit: int = Query(20, ge=1, le=100),
-        institution: Optional[str] = Query(None, description="按机构筛选"),
-        rating: Optional[str] = Query(None, description="按评级筛选"),
+        institution: Optional[str] = Query(None, description="按机构筛选（精确匹配机构全称，如 中信证券）"),
+        rating: Optional[str] = Query(None, description="按评级筛选（精确匹配，如 买入、增持）"),
+        cursor: Optional[str] = Query(None, description="分页游标，取上一页响应头 X-Next-Cursor 的值"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
         db: Session = Depends(get_db)
 ):
     """获取研究报告列表"""
     try:
-        query = db.query(ResearchReport)
-
-        if institution:
-            query = query.filter(ResearchReport.institution.ilike(f"%{institution}%"))
+        return fetch_list(
+            request, db, lambda columns: build_report_query(db, institution, rating, cursor, columns),
+            ResearchReport, REPORT_FIELDS, REPORT_KEYSET, fields, limit, skip, cursor
+        )
 
-        if rating:
-            query = query.filter(ResearchReport.rating.ilike(f"%{rating}%"))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
 
-        reports = query.order_by(ResearchReport.crawl_time.desc()).offset(skip).limit(limit).all()
-        return reports
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取研究报告失败: {str(e)}")
 
 
 # 财经新闻API
+NEWS_KEYSET = Keyset(FinancialNews.crawl_time, FinancialNews.id, nullable=False)
+
+
+def build_news_query(db: Session, category: Optional[str] = None, source: Optional[str] = None,
+                     cursor: Optional[str] = None, columns=None):
+    """构造财经新闻列表查询（不含分页），按爬取时间倒序"""
+    query = db.query(*columns) if columns else db.query(FinancialNews)
+
+    # 精确匹配，分别使用 (category, crawl_time) / (source, crawl_time) 索引
+    if category:
+        query = query.filter(FinancialNews.category == category)
+
+    if source:
+        query = query.filter(FinancialNews.source == source)
+
+    return NEWS_KEYSET.apply(query, cursor)
+
+
 @app.get("/api/news", response_model=List[FinancialNewsResponse], tags=["财经新闻"])
-async def get_financial_news(
+def get_financial_news(
+        request: Request,
         skip: int = Query(0, ge=0),
         limit: int = Query(20, ge=1, le=100),
-        category: Optional[str] = Query(None, description="按分类筛选"),
-        source: Optional[str] = Query(None, description="按来源筛选"),
+        category: Optional[str] = Query(None, description="按分类筛选（精确匹配）"),
+        source: Optional[str] = Query(None, description="按来源筛选（精确匹配，如 新浪财经）"),
+        cursor: Optional[str] = Query(None, description="分页游标，取上一页响应头 X-Next-Cursor 的值"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
         db: Session = Depends(get_db)
 ):
-    """获取财经新闻列表"""
+    """获取财经新闻列表（列表页只需要标题时可传 fields=id,title,source,crawl_time，不读取正文）"""
     try:
-        query = db.query(FinancialNews)
-
-        if category:
-            query = query.filter(FinancialNews.category.ilike(f"%{category}%"))
+        return fetch_list(
+            request, db, lambda columns: build_news_query(db, category, source, cursor, columns),
+            FinancialNews, NEWS_FIELDS, NEWS_KEYSET, fields, limit, skip, cursor
+        )
 
-        if source:
-            query = query.filter(FinancialNews.source.ilike(f"%{source}%"))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
 
-        news = query.order_by(FinancialNews.crawl_time.desc()).offset(skip).limit(limit).all()
-        return news
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取财经新闻失败: {str(e)}")
 
 
 # 搜索API
+def search_table(db: Session, model, result_model, q: str, limit: int, skip: int, like_columns):
+    """全文索引按BM25排序并返回摘要；关键词不足3个字符时退回 LIKE 查询（全表扫描）"""
+    match_query = build_match_query(q)
+    if match_query is None:
+        # 每个关键词都要在任意一列中出现
+        conditions = [or_(*[column.ilike(f"%{term}%") for column in like_columns]) for term in q.split()]
+        rows = db.query(model).filter(*conditions).order_by(model.crawl_time.desc()) \
+            .offset(skip).limit(limit).all()
+        return [result_model.model_validate(row) for row in rows]
+
+    hits = search_fulltext(db.connection(), model.__tablename__, match_query, limit, skip)
+    rows = {row.id: row for row in db.query(model).filter(model.id.in_([hit[0] for hit in hits]))}
+    results = []
+    for row_id, snippet, score in hits:
+        if row_id in rows:
+            result = result_model.model_validate(rows[row_id])
+            result.snippet = snippet
+            result.score = score
+            results.append(result)
+    return results
+
+
 @app.get("/api/search", tags=["搜索"])
-async def search_all(
-        q: str = Query(..., description="搜索关键词"),
+def search_all(
+        q: str = Query(..., min_length=1, description="搜索关键词，多个关键词用空格分隔"),
         limit: int = Query(10, ge=1, le=50),
+        skip: int = Query(0, ge=0, description="报告和新闻结果跳过的条数"),
         db: Session = Depends(get_db)
 ):
-    """全局搜索股票、报告和新闻"""
+    """全局搜索股票、报告和新闻
+
+    报告和新闻使用FTS5全文索引，按相关度排序并返回高亮摘要；股票在最新行情快照中按名称/代码匹配。
+    """
     try:
+        q = q.strip()
         results = {
             "stocks": [],
             "reports": [],
             "news": []
         }
 
-        # 搜索股票
-        stocks = db.query(StockData).filter(
-            StockData.name.ilike(f"%{q}%") |
-            StockData.symbol.ilike(f"%{q}%")
-        ).limit(limit).all()
-        results["stocks"] = [StockDataResponse.from_orm(s) for s in stocks]
+        # 搜索股票：快照表每个代码只有一行，扫描代价很小
+        stocks = db.query(LatestQuote).filter(
+            LatestQuote.name.ilike(f"%{q}%") |
+            LatestQuote.symbol.ilike(f"%{q}%")
+        ).order_by(LatestQuote.symbol).limit(limit).all()
+        results["stocks"] = [StockDataResponse.model_validate(s) for s in stocks]
 
         # 搜索报告
-        reports = db.query(ResearchReport).filter(
-            ResearchReport.title.ilike(f"%{q}%") |
-            ResearchReport.author.ilike(f"%{q}%") |
-            ResearchReport.institution.ilike(f"%{q}%")
-        ).limit(limit).all()
-        results["reports"] = [ResearchReportResponse.from_orm(r) for r in reports]
+        results["reports"] = search_table(
+            db, ResearchReport, ReportSearchResult, q, limit, skip,
+            [ResearchReport.title, ResearchReport.author, ResearchReport.institution]
+        )
 
         # 搜索新闻
-        news = db.query(FinancialNews).filter(
-            FinancialNews.title.ilike(f"%{q}%") |
-            FinancialNews.content.ilike(f"%{q}%")
-        ).limit(limit).all()
-        results["news"] = [FinancialNewsResponse.from_orm(n) for n in news]
+        results["news"] = search_table(
+            db, FinancialNews, NewsSearchResult, q, limit, skip,
+            [FinancialNews.title, FinancialNews.content]
+        )
 
         return results
 
@@ -304,19 +574,21 @@ async def search_all(
 
 # 爬虫控制API
 @app.post("/api/crawl/start", tags=["爬虫控制"])
-async def start_crawling(
+def start_crawling(
         spider_name: str = Query("sina_stock", description="爬虫名称"),
-        background_tasks: BackgroundTasks = BackgroundTasks()
+        priority: int = Query(PRIORITY_NORMAL, description="优先级，越大越先运行；实时行情用10，补数据用-10")
 ):
-    """启动爬虫任务"""
+    """提交爬虫任务；同一爬虫已在排队或运行时返回已有的任务"""
     try:
-        # 在后台启动爬虫
-        background_tasks.add_task(run_spider, spider_name)
+        job, merged = CRAWL_SERVICE.submit(spider_name, settings={'CLOSESPIDER_ITEMCOUNT': 20}, priority=priority)
 
         return {
-            "message": f"爬虫 {spider_name} 已启动",
+            "message": f"爬虫 {spider_name} 已在运行" if merged else f"爬虫 {spider_name} 已启动",
             "spider_name": spider_name,
-            "status": "started",
+            "job_id": job.job_id,
+            "log_file": job.log_file,
+            "status": job.status,
+            "merged": merged,
             "start_time": datetime.now()
         }
 
@@ -324,79 +596,159 @@ async def start_crawling(
         raise HTTPException(status_code=500, detail=f"启动爬虫失败: {str(e)}")
 
 
-def run_spider(spider_name: str):
-    """后台运行爬虫"""
-    try:
-        # 切换到项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+@app.get("/api/crawl/queue", tags=["爬虫控制"])
+def get_crawl_queue():
+    """排队中的爬取任务，按将要运行的顺序"""
+    return [
+        {"job_id": job.job_id, "spider_name": job.spider_name, "spider_args": job.spider_args,
+         "submitted_at": job.submitted_at}
+        for job in CRAWL_SERVICE.queued()
+    ]
 
-        # 运行爬虫
-        result = subprocess.run([
-            'scrapy', 'crawl', spider_name,
-            '-s', 'CLOSESPIDER_ITEMCOUNT=20'
-        ], cwd=project_root, capture_output=True, text=True)
 
-        print(f"爬虫 {spider_name} 执行完成，返回码: {result.returncode}")
-        if result.stdout:
-            print(f"输出: {result.stdout}")
-        if result.stderr:
-            print(f"错误: {result.stderr}")
+@app.get("/api/crawl/jobs", tags=["爬虫控制"])
+def get_crawl_jobs(
+        spider_name: Optional[str] = Query(None, description="爬虫名称"),
+        config_id: Optional[int] = Query(None, description="爬虫配置ID"),
+        state: Optional[str] = Query(None, description="任务状态：queued, running, finished, failed"),
+        limit: int = Query(50, ge=1, le=500),
+        db: Session = Depends(get_db)
+):
+    """爬取任务列表（最近提交的在前），运行中的任务计数每隔几秒更新一次"""
+    if state is not None and state not in JOB_STATES:
+        raise HTTPException(status_code=400, detail=f"无效的任务状态: {state}")
+    try:
+        query = db.query(CrawlJobRecord)
+        if spider_name:
+            query = query.filter(CrawlJobRecord.spider_name == spider_name)
+        if config_id is not None:
+            query = query.filter(CrawlJobRecord.config_id == config_id)
+        if state:
+            query = query.filter(CrawlJobRecord.state == state)
+        jobs = query.order_by(CrawlJobRecord.submitted_at.desc()).limit(limit).all()
+        now = datetime.utcnow()
+        return [job.to_dict(now) for job in jobs]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取爬取任务失败: {str(e)}")
+
 
+@app.get("/api/crawl/runs", tags=["爬虫控制"])
+def get_crawl_runs(
+        spider_name: str = Query(..., description="爬虫名称"),
+        since: Optional[datetime] = Query(None, description="开始时间下限（含），UTC"),
+        limit: int = Query(200, ge=1, le=5000),
+        db: Session = Depends(get_db)
+):
+    """爬虫每次运行的性能数据，按时间顺序（包括命令行直接运行的爬虫）"""
+    try:
+        return query_crawl_runs(db, since, limit, spider_name=spider_name)
     except Exception as e:
-        print(f"运行爬虫失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取运行历史失败: {str(e)}")
+
+
+@app.get("/api/crawl/jobs/{job_id}", tags=["爬虫控制"])
+def get_crawl_job(job_id: str, db: Session = Depends(get_db)):
+    """单个爬取任务的状态和统计"""
+    job = db.query(CrawlJobRecord).filter(CrawlJobRecord.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
+
+
+# 数据导出API
+@app.get("/api/export/{table}", tags=["数据导出"])
+def export_table(
+        table: str,
+        format: str = Query("ndjson", description="导出格式：ndjson 或 csv"),
+        since: Optional[datetime] = Query(None, description="爬取时间下限（含），UTC"),
+        until: Optional[datetime] = Query(None, description="爬取时间上限（不含），UTC"),
+        symbol: Optional[str] = Query(None, description="按股票代码筛选，多个用逗号分隔"),
+):
+    """流式导出整张数据表（stock_data, latest_quotes, research_reports, financial_news）
+
+    分批读取、逐批发送，内存占用与导出行数无关；导出过程使用独立的数据库会话
+    """
+    symbols = [item.strip() for item in symbol.split(',') if item.strip()] if symbol else None
+    try:
+        model = export_model(table, format, symbols)
+    except InvalidExport as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{table}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return StreamingResponse(
+        stream_export(model, format, since, until, symbols),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 # 数据统计API
-@app.get("/api/analytics/top-stocks", tags=["数据分析"])
-async def get_top_stocks(
-        limit: int = Query(10, ge=1, le=50),
-        sort_by: str = Query("change_percent", description="排序字段：change_percent, volume"),
+# 排行榜可用的排序列，latest_quotes 上均有 (列, symbol) 索引
+LEADERBOARD_COLUMNS = ("change_percent", "change", "volume", "turnover")
+
+
+@app.get("/api/analytics/top-stocks", response_model=List[StockDataResponse], tags=["数据分析"])
+def get_top_stocks(
+        request: Request,
+        response: Response,
+        limit: int = Query(10, ge=1, le=10000, description="返回条数，最大10000（覆盖全市场）"),
+        sort_by: str = Query("change_percent", description="排序字段：change_percent, change, volume, turnover"),
+        order: str = Query("desc", description="desc 为涨幅榜/成交量榜，asc 为跌幅榜"),
         db: Session = Depends(get_db)
 ):
-    """获取涨幅榜或成交量榜"""
+    """获取涨幅榜、跌幅榜、成交量榜或成交额榜（每个股票取最新行情）"""
     try:
-        query = db.query(StockData)
-
-        if sort_by == "change_percent":
-            # 按涨跌幅排序（需要处理字符串格式）
-            stocks = query.order_by(StockData.crawl_time.desc()).limit(100).all()
-            # 手动排序涨跌幅
-            sorted_stocks = sorted(stocks, key=lambda x: float(
-                x.change_percent.replace('%', '')) if x.change_percent and x.change_percent.replace('%', '').replace(
-                '+', '').replace('-', '').replace('.', '').isdigit() else 0, reverse=True)
-            return sorted_stocks[:limit]
-        elif sort_by == "volume":
-            # 按成交量排序
-            stocks = query.order_by(StockData.crawl_time.desc()).limit(100).all()
-            sorted_stocks = sorted(stocks, key=lambda x: int(x.volume) if x.volume and x.volume.isdigit() else 0,
-                                   reverse=True)
-            return sorted_stocks[:limit]
-        else:
+        model = LatestQuote if sort_by in LEADERBOARD_COLUMNS else StockData
+        version = DataVersion.read(db, model.__tablename__)
+        if version.matches(request):
+            return version.not_modified()
+        version.apply(response)
+
+        if sort_by not in LEADERBOARD_COLUMNS:
             # 默认按时间排序
-            return query.order_by(StockData.crawl_time.desc()).limit(limit).all()
+            return db.query(StockData).order_by(StockData.crawl_time.desc()).limit(limit).all()
+
+        # 直接在最新行情快照表上按索引排序，没有数值的股票（停牌等）不参与排名
+        order_column = getattr(LatestQuote, sort_by)
+        query = db.query(LatestQuote).filter(order_column.isnot(None))
+        if order.lower() == "asc":
+            query = query.order_by(order_column.asc(), LatestQuote.symbol.asc())
+        else:
+            query = query.order_by(order_column.desc(), LatestQuote.symbol.desc())
+        return query.limit(limit).all()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取排行榜失败: {str(e)}")
 
 
 # 获取所有配置的api接口
+CONFIG_KEYSET = Keyset(CrawlerConfig.id, CrawlerConfig.id, descending=False)
+
+
 @app.get("/api/configs", response_model=List[CrawlerConfigResponse], tags=["爬虫配置"])
-async def get_crawler_configs(
+def get_crawler_configs(
+        response: Response,
         skip: int = Query(0, ge=0),
         limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="分页游标，取上一页响应头 X-Next-Cursor 的值"),
         db: Session = Depends(get_db)
 ):
     """获取爬虫配置列表"""
     try:
-        configs = db.query(CrawlerConfig).offset(skip).limit(limit).all()
+        query = CONFIG_KEYSET.apply(db.query(CrawlerConfig), cursor)
+        configs, next_cursor = CONFIG_KEYSET.fetch_page(query, limit, skip, cursor)
+        set_next_cursor(response, next_cursor)
         return configs
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取配置失败: {str(e)}")
 
 
 # 创建新配置
 @app.post("/api/configs", response_model=CrawlerConfigResponse, tags=["爬虫配置"])
-async def create_crawler_config(
+def create_crawler_config(
         config_request: ConfigCreateRequest,
         db: Session = Depends(get_db)
 ):
@@ -419,6 +771,7 @@ async def create_crawler_config(
         is_valid, error_msg = new_config.validate_config()
         if not is_valid:
             raise HTTPException(status_code=400, detail=f"配置无效: {error_msg}")
+        new_config.schedule = schedule_json(config_request.schedule)
 
         db.add(new_config)
         db.commit()
@@ -433,11 +786,94 @@ async def create_crawler_config(
         raise HTTPException(status_code=500, detail=f"创建配置失败: {str(e)}")
 
 
+def schedule_json(schedule):
+    """校验运行计划，返回保存到数据库的JSON文本"""
+    if schedule is None:
+        return None
+    try:
+        return json.dumps(parse_schedule(schedule), ensure_ascii=False)
+    except InvalidSchedule as e:
+        raise HTTPException(status_code=400, detail=f"运行计划无效: {e}")
+
+
+# 设置配置的运行计划
+@app.put("/api/configs/{config_id}/schedule", response_model=CrawlerConfigResponse, tags=["爬虫配置"])
+def update_config_schedule(
+        config_id: int,
+        schedule_request: ScheduleRequest,
+        db: Session = Depends(get_db)
+):
+    """设置或取消配置的运行计划，调度器在下一次检查时按新计划推算运行时间"""
+    config = db.query(CrawlerConfig).filter(CrawlerConfig.id == config_id).first()
+    if not config:
+        raise HTTPException(status_code=404, detail="配置不存在")
+    config.schedule = schedule_json(schedule_request.schedule)
+    try:
+        db.commit()
+        db.refresh(config)
+        return config
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"更新运行计划失败: {str(e)}")
+
+
+# 运行计划概览
+@app.get("/api/schedule", tags=["爬虫配置"])
+def get_schedule(db: Session = Depends(get_db)):
+    """设置了运行计划的配置及下次运行时间（北京时间），以及当前是否为A股交易时段"""
+    now = datetime.utcnow()
+    upcoming = CRAWL_SCHEDULER.upcoming()
+    configs = db.query(CrawlerConfig).filter(CrawlerConfig.schedule.isnot(None)).order_by(CrawlerConfig.id).all()
+    return {
+        "scheduler_enabled": CRAWL_SCHEDULER_ENABLED,
+        "market_open": is_market_open(now),
+        "next_market_open": next_market_open(now),
+        "configs": [
+            {
+                "config_id": config.id,
+                "config_name": config.name,
+                "is_active": config.is_active,
+                "schedule": json.loads(config.schedule),
+                "last_run_at": config.last_run_at,
+                "next_run_at": upcoming.get(config.id),
+                "running": CRAWL_SERVICE.is_active('dynamic', config_id=config.id),
+            }
+            for config in configs
+        ],
+    }
+
+
+def query_crawl_runs(db, since, limit, **filters):
+    """运行历史按开始时间升序返回（便于直接画图），超过 limit 时保留最近的"""
+    query = db.query(CrawlRun).filter_by(**filters)
+    if since is not None:
+        query = query.filter(CrawlRun.started_at >= since)
+    runs = query.order_by(CrawlRun.started_at.desc()).limit(limit).all()
+    return [run.to_dict() for run in reversed(runs)]
+
+
+# 配置的运行历史
+@app.get("/api/configs/{config_id}/runs", tags=["爬虫配置"])
+def get_config_runs(
+        config_id: int,
+        since: Optional[datetime] = Query(None, description="开始时间下限（含），UTC"),
+        limit: int = Query(200, ge=1, le=5000),
+        db: Session = Depends(get_db)
+):
+    """配置每次运行的耗时、流量、响应延迟分位数、数据量和错误数，按时间顺序"""
+    if not db.query(CrawlerConfig.id).filter(CrawlerConfig.id == config_id).first():
+        raise HTTPException(status_code=404, detail="配置不存在")
+    try:
+        return query_crawl_runs(db, since, limit, config_id=config_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取运行历史失败: {str(e)}")
+
+
 # 运行指定配置的爬虫
 @app.post("/api/configs/{config_id}/run", tags=["爬虫配置"])
-async def run_crawler_config(
+def run_crawler_config(
         config_id: int,
-        background_tasks: BackgroundTasks,
+        priority: int = Query(PRIORITY_NORMAL, description="优先级，越大越先运行"),
         db: Session = Depends(get_db)
 ):
     """运行指定配置的爬虫"""
@@ -455,14 +891,16 @@ async def run_crawler_config(
         if not is_valid:
             raise HTTPException(status_code=400, detail=f"配置无效: {error_msg}")
 
-        # 在后台运行爬虫
-        background_tasks.add_task(run_dynamic_spider, config.name, config_id, db)
+        # 提交到爬取任务队列，任务结束时更新运行统计；同一配置已在排队或运行时不重复提交
+        job, merged = CRAWL_SERVICE.submit_config(config, priority=priority)
 
         return {
-            "message": f"爬虫配置 '{config.name}' 已启动",
+            "message": f"爬虫配置 '{config.name}' 已在运行" if merged else f"爬虫配置 '{config.name}' 已启动",
             "config_id": config_id,
             "config_name": config.name,
-            "status": "started"
+            "job_id": job.job_id,
+            "status": job.status,
+            "merged": merged
         }
 
     except HTTPException:
@@ -471,49 +909,6 @@ async def run_crawler_config(
         raise HTTPException(status_code=500, detail=f"启动爬虫失败: {str(e)}")
 
 
-def run_dynamic_spider(config_name: str, config_id: int, db: Session):
-    """运行动态爬虫的后台任务"""
-    import subprocess
-    import os
-    from datetime import datetime
-
-    try:
-        # 更新运行统计
-        config = db.query(CrawlerConfig).filter(CrawlerConfig.id == config_id).first()
-        if config:
-            config.run_count += 1
-            config.last_run_at = datetime.utcnow()
-            db.commit()
-
-        # 切换到项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-        # 运行动态爬虫
-        result = subprocess.run([
-            'scrapy', 'crawl', 'dynamic',
-            '-a', f'config_name={config_name}',
-            '-s', 'CLOSESPIDER_ITEMCOUNT=50'  # 限制数量避免过度爬取
-        ], cwd=project_root, capture_output=True, text=True)
-
-        # 更新成功统计
-        if result.returncode == 0:
-            config = db.query(CrawlerConfig).filter(CrawlerConfig.id == config_id).first()
-            if config:
-                config.success_count += 1
-                db.commit()
-
-        print(f"动态爬虫执行完成，配置: {config_name}, 返回码: {result.returncode}")
-        if result.stdout:
-            print(f"输出: {result.stdout}")
-        if result.stderr:
-            print(f"错误: {result.stderr}")
-
-    except Exception as e:
-        print(f"运行动态爬虫失败: {e}")
-    finally:
-        db.close()
-
-
 if __name__ == "__main__":
     import uvicorn
 
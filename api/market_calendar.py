@@ -0,0 +1,84 @@
+# api/market_calendar.py - A股交易时间
+# 交易日为周一至周五中除休市日以外的日期，交易时段为北京时间 9:30-11:30 和 13:00-15:00。
+# 休市日按交易所公布的年度休市安排填写，以交易所公告为准；
+# 新一年的安排公布后可以先通过环境变量 MARKET_HOLIDAYS（逗号分隔的 YYYY-MM-DD）补充。
+# 没有某一年的安排时，该年的节假日会被当作交易日，用到该年的日期时打印警告
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo('Asia/Shanghai')
+SESSIONS = ((time(9, 30), time(11, 30)), (time(13, 0), time(15, 0)))
+
+# 休市的工作日（周末本来就不交易，不需要列出）
+HOLIDAYS = {
+    # 2025
+    date(2025, 1, 1),
+    date(2025, 1, 28), date(2025, 1, 29), date(2025, 1, 30), date(2025, 1, 31), date(2025, 2, 3), date(2025, 2, 4),
+    date(2025, 4, 4),
+    date(2025, 5, 1), date(2025, 5, 2), date(2025, 5, 5),
+    date(2025, 6, 2),
+    date(2025, 10, 1), date(2025, 10, 2), date(2025, 10, 3), date(2025, 10, 6), date(2025, 10, 7), date(2025, 10, 8),
+    # 2026
+    date(2026, 1, 1), date(2026, 1, 2),
+    date(2026, 2, 16), date(2026, 2, 17), date(2026, 2, 18), date(2026, 2, 19), date(2026, 2, 20), date(2026, 2, 23),
+    date(2026, 4, 6),
+    date(2026, 5, 1), date(2026, 5, 4), date(2026, 5, 5),
+    date(2026, 6, 19),
+    date(2026, 9, 25),
+    date(2026, 10, 1), date(2026, 10, 2), date(2026, 10, 5), date(2026, 10, 6), date(2026, 10, 7),
+}
+HOLIDAYS.update(
+    date.fromisoformat(day.strip()) for day in os.environ.get('MARKET_HOLIDAYS', '').split(',') if day.strip()
+)
+# 已填写休市安排的年份
+COVERED_YEARS = frozenset(day.year for day in HOLIDAYS)
+_warned_years = set()
+
+
+def check_holiday_coverage(day):
+    """day 所在年份有休市安排时返回True；没有时返回False，并且每年只打印一次警告"""
+    if day.year in COVERED_YEARS:
+        return True
+    if day.year not in _warned_years:
+        _warned_years.add(day.year)
+        print(f"❌ 没有 {day.year} 年的A股休市安排，该年的节假日会被当作交易日；"
+              f"请在 api/market_calendar.py 的 HOLIDAYS 中补充，或设置环境变量 MARKET_HOLIDAYS")
+    return False
+
+
+def market_time(moment):
+    """转为北京时间；不带时区的时间视为UTC（数据库中的时间都是UTC）"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(MARKET_TZ)
+
+
+def is_trading_day(day):
+    check_holiday_coverage(day)
+    return day.weekday() < 5 and day not in HOLIDAYS
+
+
+def is_market_open(moment):
+    moment = market_time(moment)
+    if not is_trading_day(moment.date()):
+        return False
+    now = moment.time()
+    return any(start <= now < end for start, end in SESSIONS)
+
+
+def next_market_open(moment):
+    """moment 之后（含）最近的交易时间：正在交易时返回 moment 本身，否则返回下一个交易时段的开始"""
+    moment = market_time(moment)
+    if is_market_open(moment):
+        return moment
+    day = moment.date()
+    # 最长的休市（春节）加上周末也不超过两周
+    for _ in range(30):
+        if is_trading_day(day):
+            for start, _end in SESSIONS:
+                opening = datetime.combine(day, start, MARKET_TZ)
+                if opening > moment:
+                    return opening
+        day += timedelta(days=1)
+    raise ValueError("30天内没有交易日，请检查休市日设置")
@@ -0,0 +1,83 @@
+# api/pagination.py - 列表接口的游标（keyset）分页
+# OFFSET 分页需要先走过并丢弃前面 skip 行，页数越深越慢；
+# 游标记录上一页最后一行的 (排序值, 决胜列)，下一页直接从索引中该位置之后开始读取
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, or_, tuple_
+
+# 下一页游标通过响应头返回，响应体保持为列表
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Keyset:
+    """排序列 + 唯一的决胜列（通常是主键），两列同方向排序
+
+    nullable=True 时按SQLite的规则处理排序列中的NULL：升序时排在最前，降序时排在最后。
+    """
+
+    def __init__(self, sort_column, tiebreaker, descending=True, nullable=None):
+        self.sort_column = sort_column
+        self.tiebreaker = tiebreaker
+        self.descending = descending
+        self.nullable = sort_column.nullable if nullable is None else nullable
+
+    def order_by(self, query):
+        if self.descending:
+            return query.order_by(self.sort_column.desc(), self.tiebreaker.desc())
+        return query.order_by(self.sort_column.asc(), self.tiebreaker.asc())
+
+    def apply(self, query, cursor=None):
+        """排序，并在给出游标时只保留游标之后的行"""
+        if cursor:
+            value, last_key = self.decode(cursor)
+            query = query.filter(self._after(value, last_key))
+        return self.order_by(query)
+
+    def _after(self, value, last_key):
+        column, tiebreaker = self.sort_column, self.tiebreaker
+        if value is None:
+            if self.descending:
+                return and_(column.is_(None), tiebreaker < last_key)
+            return or_(and_(column.is_(None), tiebreaker > last_key), column.isnot(None))
+
+        # 行值比较 (a, b) < (x, y) 可以直接使用 (a) 或 (..., a) 索引定位起点
+        if self.descending:
+            condition = tuple_(column, tiebreaker) < tuple_(value, last_key)
+            return or_(condition, column.is_(None)) if self.nullable else condition
+        return tuple_(column, tiebreaker) > tuple_(value, last_key)
+
+    def encode(self, row):
+        value = getattr(row, self.sort_column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps([value, getattr(row, self.tiebreaker.key)], ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            value, last_key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if value is not None and isinstance(self.sort_column.type, DateTime):
+                value = datetime.fromisoformat(value)
+        except (ValueError, TypeError, UnicodeError):
+            raise InvalidCursor(cursor)
+        return value, last_key
+
+    def fetch_page(self, query, limit, skip=0, cursor=None):
+        """query 已经过 apply()；返回 (本页数据, 下一页游标)，没有下一页时游标为None
+
+        给出游标时忽略skip，保留skip只是为了兼容旧的调用方式。
+        """
+        if skip and not cursor:
+            query = query.offset(skip)
+        rows = query.limit(limit + 1).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode(rows[-1])
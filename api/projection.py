@@ -0,0 +1,85 @@
+# api/projection.py - 列表接口的字段投影与快速序列化
+# fields= 指定的字段只在SQL中查询对应的列；结果直接转换为字典后序列化，不再逐行构造Pydantic模型
+import json
+from datetime import datetime
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class FastJSONResponse(Response):
+    """安装了orjson时使用orjson序列化，否则退回标准库json；datetime输出为ISO格式，与Pydantic一致"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=_isoformat).encode('utf-8')
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+class FieldSet:
+    """响应字段 -> (数据库列名, 格式化函数)，字段与响应模型保持一致"""
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    @classmethod
+    def from_response_model(cls, response_model, formatters=None):
+        """按响应模型生成字段表：使用 validation_alias 的字段读取别名对应的列"""
+        formatters = formatters or {}
+        fields = {}
+        for name, info in response_model.model_fields.items():
+            column = info.validation_alias if isinstance(info.validation_alias, str) else name
+            fields[name] = (column, formatters.get(name))
+        return cls(fields)
+
+    def select(self, fields_param):
+        """解析 fields=a,b,c，未指定时返回全部字段"""
+        if not fields_param:
+            return list(self.fields)
+        names = [name.strip() for name in fields_param.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise InvalidFields(f"未知字段: {', '.join(unknown)}；可选字段: {', '.join(self.fields)}")
+        return list(dict.fromkeys(names))
+
+    def columns(self, model, names, *extra_columns):
+        """查询需要的列；extra_columns 为排序/分页需要但不一定输出的列。模型中不存在的列输出为null"""
+        keys = [self.fields[name][0] for name in names] + [column.key for column in extra_columns]
+        return [getattr(model, key) for key in dict.fromkeys(keys) if key in model.__table__.columns]
+
+    def serialize(self, rows, names):
+        """按行中的位置取值，只对需要展示格式的字段调用格式化函数；datetime交给响应序列化"""
+        if not rows:
+            return []
+        positions = {key: index for index, key in enumerate(rows[0]._fields)}
+        plain = [(name, positions.get(self.fields[name][0])) for name in names]
+        formatted = [(name, formatter) for name in names
+                     for formatter in (self.fields[name][1],) if formatter is not None]
+
+        results = []
+        for row in rows:
+            item = {name: row[index] if index is not None else None for name, index in plain}
+            for name, formatter in formatted:
+                if item[name] is not None:
+                    item[name] = formatter(item[name])
+            results.append(item)
+        return results
@@ -0,0 +1,168 @@
+# api/quote_stream.py - 行情推送（Server-Sent Events）
+# 爬虫运行在独立进程中，API进程内由一个后台任务跟踪 latest_quotes：
+# 先读 table_stats 中 latest_quotes 的版本号（主键查询），有变化时才按写入序号 change_seq 的索引读取新提交的行情。
+# 所有连接共享这一个后台任务；每个连接只保存每个股票最新的一条待发送行情，客户端来不及接收时旧行情被新行情覆盖
+import asyncio
+import os
+import uuid
+
+import anyio.to_thread
+
+from database.models import get_session, LatestQuote, TableStats
+from api.projection import dumps
+
+POLL_INTERVAL = float(os.environ.get('QUOTE_STREAM_POLL_INTERVAL', 0.5))  # 秒
+# 没有新行情时定期发送注释行，保持代理连接并及时发现已断开的客户端
+HEARTBEAT_INTERVAL = 15  # 秒
+# 断线后浏览器 EventSource 的重连间隔
+RETRY_MILLISECONDS = 3000
+# 单个连接的最长时间。uvicorn 关闭时会等待所有连接结束，推送连接定期结束才不会让关闭一直等下去；
+# 浏览器带着 Last-Event-ID 自动重连，只补发断开期间变化的行情
+MAX_STREAM_SECONDS = float(os.environ.get('QUOTE_STREAM_MAX_SECONDS', 60))
+
+
+class Subscriber:
+    """一个推送连接：symbols 为 None 时接收全部股票"""
+
+    def __init__(self, symbols=None):
+        self.symbols = symbols
+        self.pending = {}
+        self.event = asyncio.Event()
+        self.sequence = 0  # 已取走的行情对应的发布序号
+
+    def offer(self, quotes):
+        """quotes: {symbol: 行情}；同一股票未发送的旧行情直接被覆盖"""
+        if self.symbols is not None:
+            quotes = {symbol: quote for symbol, quote in quotes.items() if symbol in self.symbols}
+        if quotes:
+            self.pending.update(quotes)
+            self.event.set()
+
+    async def next_batch(self, timeout, sequence):
+        """等待并取走待发送的行情，超时返回空列表；sequence 为取走时发布方的最新序号"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.event.clear()
+        quotes, self.pending = list(self.pending.values()), {}
+        self.sequence = sequence()
+        return quotes
+
+
+class QuoteHub:
+    """共享的 latest_quotes 跟踪任务，有连接时运行，最后一个连接断开后停止
+
+    订阅、发布都在事件循环线程中进行；数据库查询放到线程池执行。
+    serialize(rows) 把查询结果转为推送给前端的字典列表，字典中需要有 symbol。
+    水位线是已读取到的最大写入序号：序号按提交顺序递增，晚提交的行情即使 crawl_time 较早也不会漏读。
+    每次发布的行情带有递增序号，事件id为 "<实例标识>-<序号>"，重连时据此只补发之后变化的行情。
+    """
+
+    def __init__(self, columns, serialize, poll_interval=POLL_INTERVAL):
+        self.columns = columns
+        self.serialize = serialize
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self.quotes = {}  # symbol -> 最近推送的行情
+        self.sequences = {}  # symbol -> 该行情的发布序号
+        self.sequence = 0
+        # API重启后序号从头计数，旧的事件id不能用于补发
+        self.generation = uuid.uuid4().hex[:8]
+        self.loaded = False
+        self.version = None
+        self.watermark = None  # 已读取到的最大写入序号
+        self._task = None
+
+    def subscribe(self, symbols=None, last_event_id=None):
+        subscriber = Subscriber(symbols)
+        self.subscribers.add(subscriber)
+        # 先推送当前快照（重连时只推送断开后变化的行情）；首次加载完成前不需要，加载结果本身就是全部行情
+        if self.loaded:
+            since = self._parse_event_id(last_event_id)
+            subscriber.offer({symbol: quote for symbol, quote in self.quotes.items()
+                              if self.sequences[symbol] > since})
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _parse_event_id(self, last_event_id):
+        """返回客户端已收到的序号；不是本实例发出的事件id时返回0，即推送完整快照"""
+        generation, _, sequence = (last_event_id or '').partition('-')
+        if generation != self.generation or not sequence.isdigit():
+            return 0
+        return int(sequence)
+
+    async def stream(self, symbols=None, last_event_id=None, max_seconds=MAX_STREAM_SECONDS):
+        """一个SSE连接的响应内容，超过 max_seconds 后结束，由客户端重连"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        subscriber = self.subscribe(symbols, last_event_id)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+            while loop.time() < deadline:
+                timeout = min(HEARTBEAT_INTERVAL, deadline - loop.time())
+                quotes = await subscriber.next_batch(timeout, lambda: self.sequence)
+                if quotes:
+                    event_id = f"{self.generation}-{subscriber.sequence}"
+                    yield f"id: {event_id}\nevent: quotes\ndata: ".encode() + dumps(quotes) + b"\n\n"
+                elif loop.time() < deadline:
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                version, watermark, items = await anyio.to_thread.run_sync(
+                    self._poll, self.version, self.watermark)
+                self._publish(version, watermark, items)
+            except Exception as e:
+                # 数据库暂时不可用时保持连接，下一轮重试
+                print(f"行情推送读取失败: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _poll(self, version, watermark):
+        """在线程池中执行：版本号未变化时不查询行情表，返回 (版本号, 水位线, 行情列表)"""
+        session = get_session()
+        try:
+            current = session.query(TableStats.version).filter(
+                TableStats.table_name == LatestQuote.__tablename__).scalar()
+            if current is not None and current == version:
+                return version, watermark, []
+
+            # 首次加载读取全部行情（迁移前写入的行情没有序号）
+            query = session.query(*self.columns, LatestQuote.change_seq)
+            if watermark is not None:
+                query = query.filter(LatestQuote.change_seq > watermark)
+            rows = query.order_by(LatestQuote.change_seq).all()
+            watermark = max((row.change_seq for row in rows if row.change_seq is not None), default=watermark or 0)
+            return current, watermark, self.serialize(rows)
+        finally:
+            session.close()
+
+    def _publish(self, version, watermark, items):
+        self.version = version
+        self.watermark = watermark
+        self.loaded = True
+        # 每行只在写入序号变化后读到一次，读到的都是新行情
+        changed = {item['symbol']: item for item in items}
+        if not changed:
+            return
+        self.sequence += 1
+        self.quotes.update(changed)
+        self.sequences.update(dict.fromkeys(changed, self.sequence))
+        for subscriber in self.subscribers:
+            subscriber.offer(changed)
@@ -0,0 +1,147 @@
+# benchmarks/bench_api_compression.py - 响应压缩的传输大小和服务端CPU耗时
+# 运行命令：python benchmarks/bench_api_compression.py [每项请求数]
+# 直接调用ASGI应用，不经过HTTP客户端，CPU耗时只包含服务端处理（查询、序列化、压缩）
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(WORKDIR, 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+
+from database import models
+from database.migrate import upgrade_database
+from database.table_stats import rebuild_table_stats
+from api.compression import CompressionMiddleware
+import api.main as api_main
+
+ENDPOINTS = [
+    "/api/news?limit=100",
+    "/api/reports?limit=20",
+    "/api/stocks?limit=20",
+    "/api/stats",
+]
+
+# (说明, Accept-Encoding, 是否缓存压缩结果)
+MODES = [
+    ("不压缩", "identity", False),
+    ("gzip", "gzip", False),
+    ("br", "br", False),
+    ("gzip + 缓存", "gzip", True),
+    ("br + 缓存", "br", True),
+]
+
+
+# 每行从中随机抽取句子组成正文，避免重复文本让压缩率虚高
+SENTENCES = [
+    "央行今日开展逆回购操作，市场流动性保持合理充裕。", "机构预计后续仍有降准空间，债市情绪偏暖。",
+    "沪深两市成交额较上一交易日放大，北向资金小幅净流入。", "半导体板块午后拉升，多只个股涨停。",
+    "公司三季度营收同比增长，毛利率持续改善。", "维持买入评级，目标价上调至每股二十八元。",
+    "新能源汽车销量环比回升，产业链景气度修复。", "银行板块估值处于历史低位，股息率具备吸引力。",
+    "海外市场波动加大，美元指数走强压制风险偏好。", "地产政策持续优化，一线城市成交有所回暖。",
+    "消费电子需求复苏不及预期，库存去化仍需时间。", "券商板块受益于交易活跃度提升，业绩弹性较大。",
+]
+
+
+def text(rng, sentences):
+    return "".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+
+def seed(rows):
+    upgrade_database()
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany(
+        "INSERT INTO financial_news (title, content, author, source, category, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"财经新闻标题{i}", text(rng, 60), "记者", "新浪财经", "股市", f"https://finance.sina.com.cn/{i}.html",
+          str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.executemany(
+        "INSERT INTO research_reports (title, author, institution, rating, summary, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"研究报告{i}", "分析师", "中信证券", "买入", text(rng, 10), f"https://example.com/report/{i}",
+          str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.executemany(
+        "INSERT INTO stock_data (symbol, name, price, change, change_percent, volume, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"sh{600000 + i}", "浦发银行", 10.5, 0.12, 1.16, 1234567, "https://hq.sinajs.cn",
+          str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+    with models.get_engine().begin() as conn:
+        rebuild_table_stats(conn)
+
+
+async def request(app, url, accept_encoding):
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'bench'), (b'accept-encoding', accept_encoding.encode())],
+        'client': ('127.0.0.1', 1), 'server': ('bench', 80),
+    }
+    size = 0
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal size
+        if message['type'] == 'http.response.body':
+            size += len(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def measure(app, url, accept_encoding, count):
+    await request(app, url, accept_encoding)  # 预热（缓存模式下同时填充缓存）
+    cpu = time.process_time()
+    for _ in range(count):
+        size = await request(app, url, accept_encoding)
+    return size, (time.process_time() - cpu) / count * 1000
+
+
+def uncompressed_app():
+    """应用自身的中间件栈中压缩中间件以内的部分，各模式分别套上不同配置的压缩中间件"""
+    app = api_main.app.build_middleware_stack()
+    while not isinstance(app, CompressionMiddleware):
+        app = app.app
+    return app.app
+
+
+async def run(count):
+    inner = uncompressed_app()
+    for url in ENDPOINTS:
+        print(url)
+        for label, accept_encoding, cached in MODES:
+            app = CompressionMiddleware(inner, cache_max_bytes=32 * 1024 * 1024 if cached else 0)
+            size, cpu = await measure(app, url, accept_encoding, count)
+            print(f"  {label:<12} 传输 {size / 1024:8.1f} KB  CPU {cpu:6.2f} ms/请求")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seed(1000)
+    try:
+        asyncio.run(run(count))
+    finally:
+        models.dispose_engines()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/bench_api_concurrency.py - 慢搜索进行时 /api/stats 的延迟分布
+# 运行命令：python benchmarks/bench_api_concurrency.py [新闻行数] [每轮秒数]
+# 对比旧实现（async def 接口中直接调用同步Session，查询期间阻塞事件循环）与线程池实现
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(WORKDIR, 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from database import models
+from database.migrate import upgrade_database
+from database.table_stats import rebuild_table_stats
+import api.main as api_main
+
+# 两个字符的关键词无法使用trigram全文索引，会退回 LIKE 全表扫描
+SLOW_QUERY = "降准"
+STATS_CLIENTS = 4
+
+
+def seed(rows):
+    upgrade_database()
+    now = datetime.utcnow()
+    filler = "上证指数早盘震荡，两市成交额较上一交易日有所放大，北向资金小幅净流入。" * 4
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany(
+        "INSERT INTO financial_news (title, content, source, category, crawl_time) VALUES (?, ?, ?, ?, ?)",
+        ((f"财经新闻{i}", f"{filler}{i}", "新浪财经", "股市", str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+    with models.get_engine().begin() as conn:
+        rebuild_table_stats(conn)
+
+
+def legacy_app():
+    """重现旧实现：async def 接口中调用同步查询"""
+    app = FastAPI()
+
+    @app.get("/api/stats")
+    async def stats():
+        db = models.get_session()
+        try:
+            return api_main.get_system_stats(db=db)
+        finally:
+            db.close()
+
+    @app.get("/api/search")
+    async def search(q: str):
+        db = models.get_session()
+        try:
+            return api_main.search_all(q=q, limit=10, skip=0, db=db)
+        finally:
+            db.close()
+
+    return app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(app):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_load(base_url, seconds):
+    """一个客户端持续执行慢搜索，其余客户端持续请求 /api/stats，返回 (stats延迟列表, 搜索延迟列表)"""
+    deadline = time.monotonic() + seconds
+    stats_latencies, search_latencies = [], []
+    lock = threading.Lock()
+
+    def searcher():
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                assert client.get('/api/search', params={'q': SLOW_QUERY}).status_code == 200
+                with lock:
+                    search_latencies.append(time.perf_counter() - start)
+
+    def stats_client():
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                assert client.get('/api/stats').status_code == 200
+                with lock:
+                    stats_latencies.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=searcher)] + [threading.Thread(target=stats_client) for _ in range(STATS_CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats_latencies, search_latencies
+
+
+def report(label, stats_latencies, search_latencies):
+    print(f"{label:<24} /api/stats {len(stats_latencies):5d} 次  "
+          f"p50 {percentile(stats_latencies, 0.50) * 1000:8.1f} ms  "
+          f"p99 {percentile(stats_latencies, 0.99) * 1000:8.1f} ms  "
+          f"max {max(stats_latencies) * 1000:8.1f} ms  | "
+          f"慢搜索 {len(search_latencies)} 次, 平均 {sum(search_latencies) / len(search_latencies) * 1000:.0f} ms")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"灌入 {rows} 条新闻 ({DB_PATH})")
+    seed(rows)
+
+    try:
+        for label, app in [("async def + 同步Session", legacy_app()),
+                           (f"def + 线程池({api_main.API_THREADPOOL_SIZE})", api_main.app)]:
+            server, thread, base_url = serve(app)
+            try:
+                report(label, *run_load(base_url, seconds))
+            finally:
+                server.should_exit = True
+                thread.join()
+    finally:
+        models.dispose_engines()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
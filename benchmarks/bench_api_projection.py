@@ -0,0 +1,90 @@
+# benchmarks/bench_api_projection.py - /api/news?limit=100 的响应大小和单次请求CPU耗时
+# 运行命令：python benchmarks/bench_api_projection.py [请求数]
+# 对比旧实现（整行ORM对象 + 逐行Pydantic校验）、快速序列化全部字段、只取列表页字段
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(WORKDIR, 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from database import models
+from database.migrate import upgrade_database
+import api.main as api_main
+
+LIST_FIELDS = "id,title,source,category,crawl_time"
+
+
+def seed(rows):
+    upgrade_database()
+    now = datetime.utcnow()
+    content = "央行今日开展逆回购操作，市场流动性保持合理充裕，机构预计后续仍有降准空间。" * 40
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany(
+        "INSERT INTO financial_news (title, content, author, source, category, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"财经新闻标题{i}", content, "记者", "新浪财经", "股市", f"https://finance.sina.com.cn/{i}.html",
+          str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_app():
+    """重现旧实现：查询整行并按 response_model 逐行校验"""
+    app = FastAPI()
+
+    @app.get("/api/news", response_model=List[api_main.FinancialNewsResponse])
+    def news(limit: int = 20, db=Depends(api_main.get_db)):
+        return api_main.build_news_query(db).limit(limit).all()
+
+    return app
+
+
+def measure(client, url, count):
+    client.get(url)  # 预热
+    size = 0
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(count):
+        response = client.get(url)
+        assert response.status_code == 200, response.text
+        size = len(response.content)
+    cpu = (time.process_time() - cpu) / count * 1000
+    wall = (time.perf_counter() - wall) / count * 1000
+    return size, cpu, wall
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seed(1000)
+
+    cases = [
+        ("旧实现(ORM+Pydantic)", TestClient(legacy_app()), "/api/news?limit=100"),
+        ("快速序列化(全部字段)", TestClient(api_main.app), "/api/news?limit=100"),
+        ("fields=列表页字段", TestClient(api_main.app), f"/api/news?limit=100&fields={LIST_FIELDS}"),
+    ]
+    print(f"/api/news?limit=100 x {count} (正文约 {len('央行今日开展逆回购操作，市场流动性保持合理充裕，机构预计后续仍有降准空间。') * 40} 字)")
+    try:
+        for label, client, url in cases:
+            size, cpu, wall = measure(client, url, count)
+            print(f"{label:<20} 响应 {size / 1024:8.1f} KB  CPU {cpu:6.2f} ms/请求  耗时 {wall:6.2f} ms/请求")
+    finally:
+        models.dispose_engines()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
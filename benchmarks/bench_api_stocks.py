@@ -0,0 +1,85 @@
+# benchmarks/bench_api_stocks.py - 对比每次请求新建引擎与共享引擎时 /api/stocks 的吞吐量
+# 运行命令：python benchmarks/bench_api_stocks.py [请求数]
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import models
+from database.models import Base, StockData
+import api.main as api_main
+
+
+def seed(rows):
+    engine = models.get_engine()
+    Base.metadata.create_all(bind=engine)
+    session = models.get_session()
+    now = datetime.utcnow()
+    session.execute(StockData.__table__.insert(), [
+        {
+            'symbol': f"sh{600000 + i % 5000}",
+            'name': f"股票{i % 5000}",
+            'price': 10.0 + i % 100 / 10,
+            'change': 0.1,
+            'change_percent': 1.0,
+            'volume': 100000 + i,
+            'source_url': "https://hq.sinajs.cn/list=bench",
+            'crawl_time': now - timedelta(seconds=i),
+        }
+        for i in range(rows)
+    ])
+    session.commit()
+    session.close()
+
+
+def legacy_get_session():
+    """重现旧实现：每次调用都新建 echo=True 的引擎"""
+    engine = create_engine(models.DATABASE_URL, echo=True)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def measure(client, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get('/api/stocks?limit=20')
+        assert response.status_code == 200, response.text
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed(10000)
+    client = TestClient(api_main.app)
+
+    shared_get_session = api_main.get_session
+    api_main.get_session = legacy_get_session
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        legacy_rps = measure(client, count)
+    api_main.get_session = shared_get_session
+
+    measure(client, 20)  # 预热连接池
+    shared_rps = measure(client, count)
+
+    print(f"/api/stocks x {count} (10000 行, SQLite: {WORKDIR})")
+    print(f"每次新建引擎(echo=True)  {legacy_rps:8.0f} req/s")
+    print(f"共享引擎+连接池+PRAGMA   {shared_rps:8.0f} req/s")
+
+    models.dispose_engines()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
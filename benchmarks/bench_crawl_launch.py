@@ -0,0 +1,65 @@
+# benchmarks/bench_crawl_launch.py - 启动一次爬取的延迟：每次一个 scrapy crawl 子进程 vs 常驻工作进程
+# 运行命令：python benchmarks/bench_crawl_launch.py [每种方式的任务数]
+# 延迟从提交任务算到任务日志中出现 "Spider opened"（爬虫开始调度请求）
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from scrapy_project.worker_pool import CrawlWorkerPool
+
+SPIDER = 'sina_stock'
+# 只关心启动开销，爬虫打开后尽快结束
+JOB_SETTINGS = {'CLOSESPIDER_ITEMCOUNT': 1, 'DOWNLOAD_TIMEOUT': 5, 'RETRY_ENABLED': False}
+
+
+def opened(log_file):
+    try:
+        with open(log_file, encoding='utf-8', errors='ignore') as f:
+            return 'Spider opened' in f.read()
+    except FileNotFoundError:
+        return False
+
+
+def launch_latencies(pool, jobs):
+    latencies = []
+    for _ in range(jobs):
+        start = time.perf_counter()
+        job = pool.submit(SPIDER, settings=JOB_SETTINGS)
+        while not opened(job.log_file) and not job.future.done():
+            time.sleep(0.001)
+        latencies.append(time.perf_counter() - start)
+        job.wait()
+    return latencies
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    log_dir = tempfile.mkdtemp()
+    try:
+        results = []
+        subprocess_pool = CrawlWorkerPool(0, log_dir)
+        results.append(("scrapy crawl 子进程", launch_latencies(subprocess_pool, jobs)))
+
+        pool = CrawlWorkerPool(2, log_dir)
+        pool.start()
+        pool.wait_ready()
+        try:
+            results.append(("常驻工作进程", launch_latencies(pool, jobs)))
+        finally:
+            pool.shutdown()
+
+        for label, latencies in results:
+            print(f"{label:<16} 启动延迟 中位数 {statistics.median(latencies) * 1000:8.1f} ms  "
+                  f"最大 {max(latencies) * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_export.py - 导出 stock_data 时的Python内存峰值
+# 运行命令：python benchmarks/bench_export.py [行数,行数,...]
+# 对比旧实现（.all() 读出全部ORM对象后组装整份文档）与 /api/export/stock_data 流式导出
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(WORKDIR, 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+
+import json
+
+import httpx
+import uvicorn
+
+from database import models
+from database.migrate import upgrade_database
+import api.main as api_main
+
+
+def seed(total):
+    """补足到 total 行"""
+    conn = sqlite3.connect(DB_PATH)
+    existing = conn.execute("SELECT COUNT(*) FROM stock_data").fetchone()[0]
+    now = datetime.utcnow()
+    conn.executemany(
+        "INSERT INTO stock_data (symbol, name, price, change, change_percent, volume, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"sh{600000 + i % 5000}", "浦发银行", 10.5, 0.12, 1.16, 1234567, "https://hq.sinajs.cn",
+          str(now - timedelta(seconds=i))) for i in range(existing, total))
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_export():
+    """重现 database/test_query.py 中 export_to_json 的做法"""
+    session = models.get_session()
+    try:
+        stocks = session.query(models.StockData).all()
+        data = [{"symbol": stock.symbol, "name": stock.name, "price": stock.price, "change": stock.change,
+                 "change_percent": stock.change_percent, "volume": stock.volume, "source_url": stock.source_url,
+                 "crawl_time": stock.crawl_time.isoformat() if stock.crawl_time else None} for stock in stocks]
+        return len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+    finally:
+        session.close()
+
+
+def serve(app):
+    """TestClient会把整个响应体读入内存，流式导出需要在真实服务器上测量"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def streaming_export(client, fmt):
+    size = 0
+    with client.stream("GET", "/api/export/stock_data", params={"format": fmt}) as response:
+        assert response.status_code == 200
+        for chunk in response.iter_bytes():
+            size += len(chunk)
+    return size
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [50000, 200000]
+    upgrade_database()
+    server, thread, base_url = serve(api_main.app)
+    client = httpx.Client(base_url=base_url, timeout=600)
+
+    try:
+        for total in sizes:
+            seed(total)
+            print(f"stock_data {total} 行")
+            for label, func, args in [("旧实现 .all() + JSON文档", legacy_export, ()),
+                                      ("流式导出 NDJSON", streaming_export, (client, "ndjson")),
+                                      ("流式导出 CSV", streaming_export, (client, "csv"))]:
+                size, peak, elapsed = measure(func, *args)
+                print(f"  {label:<20} 输出 {size / 1024 / 1024:7.1f} MB  内存峰值 {peak / 1024 / 1024:7.1f} MB  "
+                      f"耗时 {elapsed:6.2f} s")
+    finally:
+        client.close()
+        server.should_exit = True
+        thread.join()
+        models.dispose_engines()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_pipeline_batching.py - 对比逐条提交与批量写入的入库吞吐量
+# 运行命令：python benchmarks/bench_pipeline_batching.py [条数]
+import logging
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base
+from scrapy_project import pipelines
+from scrapy_project.items import StockDataItem
+
+
+class BenchSpider:
+    name = 'bench'
+    logger = logging.getLogger('bench')
+
+
+def make_items(count):
+    for i in range(count):
+        item = StockDataItem()
+        item['symbol'] = f"sh{600000 + i % 5000}"
+        item['name'] = f"股票{i % 5000}"
+        item['price'] = f"{10 + i % 100 / 10:.2f}"
+        item['change'] = "+0.12"
+        item['change_percent'] = "+1.20%"
+        item['volume'] = str(100000 + i)
+        item['source_url'] = "https://hq.sinajs.cn/list=bench"
+        yield item
+
+
+def run(batch_size, count, workdir):
+    db_path = os.path.join(workdir, f"bench_{batch_size}.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    pipelines.get_session = sessionmaker(bind=engine)
+
+    pipeline = pipelines.FinancialDataPipeline(batch_size=batch_size, batch_interval=0)
+    spider = BenchSpider()
+    pipeline.open_spider(spider)
+
+    items = list(make_items(count))
+    start = time.perf_counter()
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+    elapsed = time.perf_counter() - start
+
+    engine.dispose()
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        print(f"写入 {count} 条股票数据 (SQLite: {workdir})")
+        for label, batch_size in (("逐条提交", 0), ("批量写入(500)", 500)):
+            elapsed = run(batch_size, count, workdir)
+            print(f"{label:<14} 耗时 {elapsed:8.2f}s  吞吐 {count / elapsed:10.0f} items/sec")
+        os.chdir(PROJECT_ROOT)
+
+
+if __name__ == "__main__":
+    main()
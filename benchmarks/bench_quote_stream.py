@@ -0,0 +1,157 @@
+# benchmarks/bench_quote_stream.py - 多个看板同时在线时的数据库查询次数与行情延迟
+# 运行命令：python benchmarks/bench_quote_stream.py [看板数] [秒数]
+# 对比每个看板每秒轮询 /api/stocks?latest=true 与订阅 /api/stream/quotes（共享一个跟踪任务）
+import asyncio
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORKDIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(WORKDIR, 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+
+import json
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import models
+from database.migrate import upgrade_database
+import api.main as api_main
+
+SYMBOLS = [f"sh{600000 + i}" for i in range(500)]
+WRITE_INTERVAL = 0.5  # 秒，每次更新50只股票
+POLL_INTERVAL = 1.0  # 秒，轮询看板的刷新间隔
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def serve(app):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def write_quotes(stop, engine):
+    """模拟pipeline：每次更新一批股票的最新行情，price 中记录写入时间用于计算延迟"""
+    table = models.LatestQuote.__table__
+    index = 0
+    while not stop.is_set():
+        now = datetime.utcnow()
+        rows = [dict(symbol=SYMBOLS[(index + i) % len(SYMBOLS)], name="股票", price=time.time(), crawl_time=now)
+                for i in range(50)]
+        index += 50
+        stmt = sqlite_insert(table)
+        with engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=['symbol'],
+                set_={'price': stmt.excluded.price, 'crawl_time': stmt.excluded.crawl_time}
+            ), rows)
+        stop.wait(WRITE_INTERVAL)
+
+
+async def polling_dashboard(client, deadline, latencies):
+    seen = {}
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get('/api/stocks', params={'latest': 'true', 'limit': 100})
+        except httpx.TransportError as e:
+            print(f"  请求失败: {e!r}")
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        now = time.time()
+        for quote in response.json():
+            if seen.get(quote['symbol']) != quote['price_value']:
+                seen[quote['symbol']] = quote['price_value']
+                latencies.append(now - quote['price_value'])
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def streaming_dashboard(client, deadline, latencies):
+    try:
+        async with client.stream('GET', '/api/stream/quotes', timeout=None) as response:
+            snapshot = True
+            async for line in response.aiter_lines():
+                if line.startswith('data:'):
+                    now = time.time()
+                    if not snapshot:
+                        latencies.extend(now - quote['price_value'] for quote in json.loads(line[5:]))
+                    snapshot = False
+                if time.monotonic() >= deadline:
+                    return
+    except httpx.ReadError:
+        pass
+
+
+async def run_dashboards(base_url, dashboard, clients, seconds):
+    latencies = []
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(dashboard(client, deadline, latencies) for _ in range(clients)))
+    return latencies
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float('nan')
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    upgrade_database()
+    engine = models.get_engine()
+    counter = StatementCounter(engine)
+    server, thread, base_url = serve(api_main.app)
+
+    try:
+        print(f"{clients} 个看板，{seconds:.0f} 秒，每 {WRITE_INTERVAL} 秒更新50只股票")
+        for label, dashboard in [(f"轮询 /api/stocks (每{POLL_INTERVAL:.0f}秒)", polling_dashboard),
+                                 ("订阅 /api/stream/quotes", streaming_dashboard)]:
+            stop = threading.Event()
+            writer = threading.Thread(target=write_quotes, args=(stop, engine))
+            writer.start()
+            before = counter.count
+            try:
+                latencies = asyncio.run(run_dashboards(base_url, dashboard, clients, seconds))
+            finally:
+                stop.set()
+                writer.join()
+            # 写入线程每批执行一条语句，不计入API的查询次数
+            writes = int(seconds / WRITE_INTERVAL) + 1
+            queries = counter.count - before - writes
+            print(f"  {label:<28} API查询 {queries / seconds:8.1f} 次/秒  "
+                  f"行情延迟 p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms")
+    finally:
+        server.should_exit = True
+        thread.join()
+        models.dispose_engines()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
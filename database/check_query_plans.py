@@ -0,0 +1,182 @@
+# database/check_query_plans.py - 检查API列表查询是否都能走索引
+# 运行命令：python database/check_query_plans.py [每张表的行数，默认1000000]
+# 在临时数据库中灌入数据后，对每个接口的查询执行 EXPLAIN QUERY PLAN，
+# 出现全表扫描、对全部结果临时排序，或带筛选条件却沿索引逐行扫描时以非0状态码退出。
+# database/test_query_plans.py 用较少的数据在测试中执行同样的检查
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from database.migrate import upgrade_database
+from database.models import get_engine, get_session, LatestQuote, StockData, ResearchReport, FinancialNews
+import api.main as api_main
+
+# 全表扫描（没有 USING INDEX）或对结果做临时排序都视为不合格
+FULL_SCAN = re.compile(r'^SCAN \w+$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+# 沿索引逐行扫描：没有筛选条件时取满一页即停止，带筛选条件时命中越少扫得越多，同样视为不合格
+INDEX_SCAN = re.compile(r'^SCAN \w+ USING (COVERING )?INDEX')
+
+# 已知无法走索引定位的查询，只提示不算失败
+KNOWN_SCANS = {
+    "/api/stocks?name_contains": "名称模糊搜索无法使用索引，沿 crawl_time 索引倒序过滤",
+}
+
+INSTITUTIONS = ['中信证券', '华泰证券', '国泰君安', '招商证券', '海通证券', '广发证券', '中金公司', '申万宏源']
+RATINGS = ['买入', '增持', '中性', '减持', '卖出']
+CATEGORIES = ['股市', '宏观', '基金', '债券', '期货', '外汇']
+SOURCES = ['新浪财经', '东方财富', '财联社', '证券时报', '第一财经']
+
+
+def seed(db_path, rows):
+    """用sqlite3直接批量灌数据，比ORM快得多"""
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO stock_data (symbol, name, price, change, change_percent, volume, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"sh{600000 + i % 5000}", f"股票{i % 5000}", 10.0 + i % 100, 0.1, (i % 21 - 10) / 2, 100000 + i,
+          "https://hq.sinajs.cn", str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.executemany(
+        "INSERT INTO research_reports (title, author, institution, rating, summary, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"研究报告{i}", f"分析师{i % 300}", INSTITUTIONS[i % len(INSTITUTIONS)], RATINGS[i % len(RATINGS)],
+          "摘要", f"https://example.com/report/{i}", str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.executemany(
+        "INSERT INTO financial_news (title, content, author, source, category, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"财经新闻{i}", "正文", f"记者{i % 200}", SOURCES[i % len(SOURCES)], CATEGORIES[i % len(CATEGORIES)],
+          f"https://example.com/news/{i}", str(now - timedelta(seconds=i))) for i in range(rows))
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO latest_quotes "
+        "(symbol, name, price, change, change_percent, volume, quote_time, source_url, crawl_time) "
+        "SELECT symbol, name, price, change, change_percent, volume, quote_time, source_url, MAX(crawl_time) "
+        "FROM stock_data GROUP BY symbol"
+    )
+    conn.execute("UPDATE latest_quotes SET turnover = price * volume")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def top_stocks_query(db, sort_by, order, limit):
+    """与 get_top_stocks 相同的排行榜查询"""
+    column = getattr(LatestQuote, sort_by)
+    direction = (lambda c: c.asc()) if order == "asc" else (lambda c: c.desc())
+    return db.query(LatestQuote).filter(column.isnot(None)) \
+        .order_by(direction(column), direction(LatestQuote.symbol)).limit(limit)
+
+
+def endpoint_queries(db):
+    """(名称, 查询) 列表，与各接口默认分页参数一致"""
+    # 指向表中间位置的游标，检查深翻页时是否仍从索引定位
+    middle = db.query(StockData).order_by(StockData.id).offset(db.query(StockData).count() // 2).first()
+    stock_cursor = api_main.stock_keyset().encode(middle)
+    report_cursor = api_main.REPORT_KEYSET.encode(db.query(ResearchReport).order_by(ResearchReport.id).first())
+    news_cursor = api_main.NEWS_KEYSET.encode(db.query(FinancialNews).order_by(FinancialNews.id).first())
+    return [
+        ("/api/stocks", api_main.build_stock_query(db).limit(20)),
+        ("/api/stocks?symbol", api_main.build_stock_query(db, symbol="sh600036").limit(20)),
+        ("/api/stocks?name_contains", api_main.build_stock_query(db, name_contains="股票12").limit(20)),
+        ("/api/stocks?cursor", api_main.build_stock_query(db, cursor=stock_cursor).limit(20)),
+        ("/api/stocks?symbol&cursor",
+         api_main.build_stock_query(db, symbol=middle.symbol, cursor=stock_cursor).limit(20)),
+        ("/api/stocks?latest", api_main.build_stock_query(db, latest=True).limit(20)),
+        ("/api/stocks?latest&symbol", api_main.build_stock_query(db, symbol="sh600036", latest=True).limit(20)),
+        ("/api/analytics/top-stocks", top_stocks_query(db, "change_percent", "desc", 20)),
+        ("/api/analytics/top-stocks?asc", top_stocks_query(db, "change_percent", "asc", 20)),
+        ("/api/analytics/top-stocks?turnover", top_stocks_query(db, "turnover", "desc", 5000)),
+        ("/api/reports", api_main.build_report_query(db).limit(20)),
+        ("/api/reports?institution", api_main.build_report_query(db, institution="中信证券").limit(20)),
+        ("/api/reports?rating", api_main.build_report_query(db, rating="买入").limit(20)),
+        ("/api/reports?institution&rating",
+         api_main.build_report_query(db, institution="中信证券", rating="买入").limit(20)),
+        ("/api/reports?cursor", api_main.build_report_query(db, cursor=report_cursor).limit(20)),
+        ("/api/reports?institution&cursor",
+         api_main.build_report_query(db, institution="中信证券", cursor=report_cursor).limit(20)),
+        ("/api/news", api_main.build_news_query(db).limit(20)),
+        ("/api/news?category", api_main.build_news_query(db, category="股市").limit(20)),
+        ("/api/news?source", api_main.build_news_query(db, source="财联社").limit(20)),
+        ("/api/news?cursor", api_main.build_news_query(db, cursor=news_cursor).limit(20)),
+    ]
+
+
+def create_database(db_path, rows):
+    """在 db_path 建立最新结构的数据库并灌入数据，返回数据库URL"""
+    url = f"sqlite:///{db_path}"
+    upgrade_database(get_engine(url))
+    seed(db_path, rows)
+    return url
+
+
+def query_plans(url):
+    """对每个接口的查询执行 EXPLAIN QUERY PLAN，返回 [(名称, 查询计划, 耗时毫秒, 不合格的计划行)]"""
+    engine = get_engine(url)
+    db = get_session(url)
+    results = []
+    try:
+        with engine.connect() as conn:
+            for name, query in endpoint_queries(db):
+                sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+                plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+                start = time.perf_counter()
+                conn.exec_driver_sql(sql).fetchall()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                filtered = query.whereclause is not None
+                bad = [line for line in plan
+                       if FULL_SCAN.match(line) or TEMP_SORT.search(line) or (filtered and INDEX_SCAN.match(line))]
+                results.append((name, plan, elapsed_ms, bad))
+    finally:
+        db.close()
+    return results
+
+
+def check(db_path, rows):
+    print(f"灌入测试数据: 每张表 {rows} 行 ({db_path})")
+    url = create_database(db_path, rows)
+
+    failures = []
+    for name, plan, elapsed_ms, bad in query_plans(url):
+        known = bad and name in KNOWN_SCANS
+        status = "WARN" if known else "FAIL" if bad else "OK"
+        print(f"[{status}] {name:<32} {elapsed_ms:8.2f} ms  {' | '.join(plan)}")
+        if known:
+            print(f"       {KNOWN_SCANS[name]}")
+        elif bad:
+            failures.append(name)
+
+    if failures:
+        print(f"❌ {len(failures)} 个查询未使用索引: {', '.join(failures)}")
+        return False
+    print("✅ 所有列表查询均使用索引")
+    return True
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'query_plans.db')
+    try:
+        ok = check(db_path, rows)
+    finally:
+        get_engine(f"sqlite:///{db_path}").dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# database/crawl_jobs.py - 爬取任务记录
+# API提交任务时写入一行（queued），爬虫进程中的 CrawlJobStats 扩展在运行期间定期写入 Scrapy 统计数据，
+# 任务结束后API按工作进程返回的结果写入最终状态
+import json
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Index, func
+
+sys.path.append(os.path.dirname(__file__))
+try:
+    from database.models import Base, get_session
+except ImportError:
+    from models import Base, get_session
+
+JOB_STATES = ('queued', 'running', 'finished', 'failed')
+UNFINISHED_STATES = ('queued', 'running')
+
+# 运行中的任务超过这么久没有新的请求或数据，视为停滞
+STALL_SECONDS = int(os.environ.get('CRAWL_JOB_STALL_SECONDS', 300))
+
+
+class CrawlJobRecord(Base):
+    """爬取任务：状态、起止时间和运行中不断更新的计数"""
+    __tablename__ = 'crawl_jobs'
+
+    job_id = Column(String(32), primary_key=True)
+    spider_name = Column(String(100), nullable=False)
+    spider_args = Column(Text)  # JSON
+    config_id = Column(Integer)  # 动态爬虫对应的 crawler_configs.id
+    state = Column(String(20), nullable=False, default='queued')
+    finish_reason = Column(String(100))
+    error = Column(Text)
+    log_file = Column(String(500))
+
+    submitted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime)  # 最近一次写入统计的时间
+    progress_at = Column(DateTime)  # 最近一次请求数或数据条数增长的时间
+
+    item_count = Column(BigInteger, nullable=False, default=0)
+    dropped_count = Column(BigInteger, nullable=False, default=0)
+    request_count = Column(BigInteger, nullable=False, default=0)
+    response_count = Column(BigInteger, nullable=False, default=0)
+    error_count = Column(BigInteger, nullable=False, default=0)  # 日志中的ERROR条数
+    http_error_count = Column(BigInteger, nullable=False, default=0)  # 4xx/5xx响应
+    exception_count = Column(BigInteger, nullable=False, default=0)  # 下载异常（超时、连接失败等）
+    stats_json = Column(Text)  # 最近一次的完整统计数据
+
+    __table_args__ = (
+        Index('ix_crawl_jobs_submitted_at', 'submitted_at'),
+        Index('ix_crawl_jobs_spider_name_submitted_at', 'spider_name', 'submitted_at'),
+    )
+
+    def to_dict(self, now=None):
+        now = now or datetime.utcnow()
+        end = self.finished_at or (now if self.started_at else None)
+        elapsed = (end - self.started_at).total_seconds() if self.started_at and end else None
+        stalled = (self.state == 'running' and
+                   (now - (self.progress_at or self.started_at or self.submitted_at)).total_seconds() > STALL_SECONDS)
+        return {
+            'job_id': self.job_id,
+            'spider_name': self.spider_name,
+            'spider_args': json.loads(self.spider_args) if self.spider_args else {},
+            'config_id': self.config_id,
+            'state': self.state,
+            'finish_reason': self.finish_reason,
+            'error': self.error,
+            'log_file': self.log_file,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'updated_at': self.updated_at,
+            'elapsed_seconds': round(elapsed, 1) if elapsed is not None else None,
+            'item_count': self.item_count,
+            'dropped_count': self.dropped_count,
+            'request_count': self.request_count,
+            'response_count': self.response_count,
+            'error_count': self.error_count,
+            'http_error_count': self.http_error_count,
+            'exception_count': self.exception_count,
+            'items_per_second': round(self.item_count / elapsed, 2) if elapsed else None,
+            'stalled': stalled,
+        }
+
+
+def http_error_count(stats):
+    """Scrapy统计数据中 4xx/5xx 响应的数量"""
+    return sum(
+        value for key, value in stats.items()
+        if key.startswith('downloader/response_status_count/') and key.rsplit('/', 1)[1][:1] in ('4', '5')
+    )
+
+
+def stats_values(stats):
+    """Scrapy统计数据 -> crawl_jobs 的计数列"""
+    return {
+        'item_count': stats.get('item_scraped_count', 0),
+        'dropped_count': stats.get('item_dropped_count', 0),
+        'request_count': stats.get('downloader/request_count', 0),
+        'response_count': stats.get('response_received_count', 0),
+        'error_count': stats.get('log_count/ERROR', 0),
+        'http_error_count': http_error_count(stats),
+        'exception_count': stats.get('downloader/exception_count', 0),
+        'stats_json': json.dumps(stats, ensure_ascii=False, default=str),
+    }
+
+
+def create_job(job_id, spider_name, spider_args=None, config_id=None, log_file=None):
+    session = get_session()
+    try:
+        session.add(CrawlJobRecord(
+            job_id=job_id, spider_name=spider_name, config_id=config_id, log_file=log_file,
+            spider_args=json.dumps(spider_args or {}, ensure_ascii=False), state='queued',
+        ))
+        session.commit()
+    finally:
+        session.close()
+
+
+def update_job(job_id, **values):
+    """按任务id更新记录，没有这条记录（不是通过API提交的任务）时不做任何事"""
+    session = get_session()
+    try:
+        session.query(CrawlJobRecord).filter(CrawlJobRecord.job_id == job_id).update(
+            values, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
+def finish_job(job_id, state, error=None):
+    """写入最终状态；结束时间已由爬虫进程写入时保留原值"""
+    update_job(job_id, state=state, error=error,
+               finished_at=func.coalesce(CrawlJobRecord.finished_at, datetime.utcnow()))
+
+
+def interrupt_unfinished_jobs():
+    """API启动时调用：上次运行中遗留的未结束任务已随工作进程退出，标记为失败"""
+    session = get_session()
+    try:
+        count = session.query(CrawlJobRecord).filter(CrawlJobRecord.state.in_(UNFINISHED_STATES)).update(
+            {'state': 'failed', 'error': "API重启时任务中断",
+             'finished_at': func.coalesce(CrawlJobRecord.finished_at, datetime.utcnow())},
+            synchronize_session=False)
+        session.commit()
+        return count
+    finally:
+        session.close()
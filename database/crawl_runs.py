@@ -0,0 +1,103 @@
+# database/crawl_runs.py - 爬虫运行历史
+# 每次爬虫结束时由 CrawlRunRecorder 扩展写入一行性能数据（包括命令行直接运行的爬虫），
+# 按配置或爬虫查看随时间的变化，网站改版导致的吞吐下降、错误增多可以直接从曲线上看出
+import os
+import sys
+
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, Index
+
+sys.path.append(os.path.dirname(__file__))
+try:
+    from database.models import Base, get_session
+    from database.crawl_jobs import http_error_count
+except ImportError:
+    from models import Base, get_session
+    from crawl_jobs import http_error_count
+
+
+class CrawlRun(Base):
+    """一次爬虫运行的耗时、流量、响应延迟和数据量"""
+    __tablename__ = 'crawl_runs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(32))  # 通过API提交时对应 crawl_jobs.job_id
+    spider_name = Column(String(100), nullable=False)
+    config_id = Column(Integer)  # 动态爬虫对应的 crawler_configs.id
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    finish_reason = Column(String(100))
+
+    request_count = Column(BigInteger, nullable=False, default=0)
+    response_count = Column(BigInteger, nullable=False, default=0)
+    bytes_downloaded = Column(BigInteger, nullable=False, default=0)
+    item_count = Column(BigInteger, nullable=False, default=0)
+    dropped_count = Column(BigInteger, nullable=False, default=0)
+    retry_count = Column(BigInteger, nullable=False, default=0)
+    http_error_count = Column(BigInteger, nullable=False, default=0)  # 4xx/5xx响应
+    exception_count = Column(BigInteger, nullable=False, default=0)  # 下载异常（超时、连接失败等）
+
+    # 响应延迟（毫秒），从发出请求到收到响应头
+    latency_p50_ms = Column(Float)
+    latency_p90_ms = Column(Float)
+    latency_p99_ms = Column(Float)
+    latency_max_ms = Column(Float)
+
+    pipeline_seconds = Column(Float)  # pipeline 在reactor线程中处理item的总时间
+    db_write_seconds = Column(Float)  # 数据库批量写入的总时间
+    items_per_second = Column(Float)
+
+    __table_args__ = (
+        Index('ix_crawl_runs_config_id_started_at', 'config_id', 'started_at'),
+        Index('ix_crawl_runs_spider_name_started_at', 'spider_name', 'started_at'),
+    )
+
+    def to_dict(self):
+        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+
+
+def percentile(sorted_values, q):
+    """已排序数据的分位数（最近秩法），没有数据时返回None"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run_values(stats, latencies, started_at, finished_at):
+    """Scrapy统计数据和响应延迟样本（秒） -> crawl_runs 的一行"""
+    latencies = sorted(latencies)
+    duration = (finished_at - started_at).total_seconds()
+    items = stats.get('item_scraped_count', 0)
+
+    def milliseconds(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'duration_seconds': round(duration, 3),
+        'request_count': stats.get('downloader/request_count', 0),
+        'response_count': stats.get('response_received_count', 0),
+        'bytes_downloaded': stats.get('downloader/response_bytes', 0),
+        'item_count': items,
+        'dropped_count': stats.get('item_dropped_count', 0),
+        'retry_count': stats.get('retry/count', 0),
+        'http_error_count': http_error_count(stats),
+        'exception_count': stats.get('downloader/exception_count', 0),
+        'latency_p50_ms': milliseconds(percentile(latencies, 0.5)),
+        'latency_p90_ms': milliseconds(percentile(latencies, 0.9)),
+        'latency_p99_ms': milliseconds(percentile(latencies, 0.99)),
+        'latency_max_ms': milliseconds(latencies[-1] if latencies else None),
+        'pipeline_seconds': round(stats.get('pipeline/process_seconds', 0.0), 3),
+        'db_write_seconds': round(stats.get('pipeline/db_write_seconds', 0.0), 3),
+        'items_per_second': round(items / duration, 3) if duration > 0 else None,
+    }
+
+
+def record_run(**values):
+    session = get_session()
+    try:
+        session.add(CrawlRun(**values))
+        session.commit()
+    finally:
+        session.close()
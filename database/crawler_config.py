@@ -1,5 +1,5 @@
 # database/crawler_config.py - 爬虫配置数据库模型
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, func
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import json
@@ -9,7 +9,11 @@ import sys
 import os
 
 sys.path.append(os.path.dirname(__file__))
-from models import Base, get_session
+# 优先按包路径导入，保证与api/pipeline共用同一个Base和引擎缓存
+try:
+    from database.models import Base, get_session, get_engine
+except ImportError:
+    from models import Base, get_session, get_engine
 
 
 class CrawlerConfig(Base):
@@ -35,6 +39,9 @@ class CrawlerConfig(Base):
     run_count = Column(Integer, default=0)  # 运行次数
     success_count = Column(Integer, default=0)  # 成功次数
 
+    # 运行计划 (JSON格式，为空时只能手动运行)，格式见 api/crawl_scheduler.py
+    schedule = Column(Text)
+
     def get_config(self):
         """获取解析后的配置对象"""
         try:
@@ -120,7 +127,6 @@ DEFAULT_CONFIG_TEMPLATE = {
 
 def create_config_table():
     """创建配置表"""
-    from models import get_engine
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
     print("爬虫配置表创建完成")
@@ -168,6 +174,31 @@ def create_default_config():
         session.close()
 
 
+def record_run_started(config_id):
+    """配置的一次运行已提交：运行次数加一并记录运行时间"""
+    session = get_session()
+    try:
+        session.query(CrawlerConfig).filter(CrawlerConfig.id == config_id).update(
+            {'run_count': func.coalesce(CrawlerConfig.run_count, 0) + 1, 'last_run_at': datetime.utcnow()},
+            synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
+def record_run_finished(config_id, succeeded):
+    """配置的一次运行结束：成功时成功次数加一"""
+    if not succeeded:
+        return
+    session = get_session()
+    try:
+        session.query(CrawlerConfig).filter(CrawlerConfig.id == config_id).update(
+            {'success_count': func.coalesce(CrawlerConfig.success_count, 0) + 1}, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
 if __name__ == "__main__":
     create_config_table()
-    create_default_config()
\ No newline at end of file
+    create_default_config()
@@ -0,0 +1,25 @@
+# database/data_version.py - 数据表版本号
+# 数据表上的触发器在同一事务中递增 table_stats.version 并记录修改时间（Unix秒），
+# 任何写入方式（pipeline、清理脚本、手工修改）都会改变版本号；
+# API 只读这张小表即可生成 ETag / Last-Modified，数据未变时不必执行列表查询
+
+# 记录版本号的数据表；latest_quotes 只记录版本，不参与计数
+VERSIONED_TABLES = ('stock_data', 'research_reports', 'financial_news', 'latest_quotes')
+
+
+def version_trigger_ddl(table_name):
+    """在 table_name 上建立插入/更新/删除后递增版本号的触发器"""
+    bump = (
+        f"INSERT INTO table_stats (table_name, row_count, version, changed_at) "
+        f"VALUES ('{table_name}', 0, 1, CAST(strftime('%s', 'now') AS INTEGER)) "
+        f"ON CONFLICT(table_name) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;"
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table_name}_version_{suffix} AFTER {event} ON {table_name} BEGIN {bump} END"
+        for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+    ]
+
+
+def create_version_triggers(conn, table_name):
+    for statement in version_trigger_ddl(table_name):
+        conn.exec_driver_sql(statement)
@@ -0,0 +1,46 @@
+# database/dedupe.py - 数据去重键
+# 同一条数据重复抓取时得到相同的键，入库时依靠唯一索引 + ON CONFLICT 跳过
+import hashlib
+import uuid
+
+from sqlalchemy import text
+
+# 去重纪元：新建数据库或清空数据时更换的随机标识，保存在 database_info 中。
+# 布隆过滤器文件记录创建时的纪元，与数据库不一致时说明文件描述的是另一份数据，加载时丢弃
+DEDUPE_EPOCH_KEY = 'dedupe_epoch'
+
+
+def _digest(*parts):
+    text = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def quote_key(symbol, quote_time=None, price=None, change=None, change_percent=None, volume=None):
+    """行情：优先使用 代码+行情时间；没有行情时间时退化为行情内容的哈希"""
+    if quote_time is not None:
+        return _digest('quote', symbol, quote_time.isoformat(sep=' '))
+    return _digest('quote', symbol, price, change, change_percent, volume)
+
+
+def report_key(source_url, title):
+    """研报：来源链接+标题（列表页抓取时多条研报共用同一个source_url）"""
+    return _digest('report', source_url, title)
+
+
+def news_key(source_url, title):
+    return _digest('news', source_url, title)
+
+
+def get_dedupe_epoch(session):
+    """当前数据库的去重纪元，还没有时生成一个（会提交事务）"""
+    session.execute(text("INSERT OR IGNORE INTO database_info (key, value) VALUES (:key, :value)"),
+                    {'key': DEDUPE_EPOCH_KEY, 'value': uuid.uuid4().hex})
+    session.commit()
+    return session.execute(text("SELECT value FROM database_info WHERE key = :key"),
+                           {'key': DEDUPE_EPOCH_KEY}).scalar()
+
+
+def reset_dedupe_epoch(session):
+    """清空数据后调用，使已有的布隆过滤器文件全部失效；不提交事务"""
+    session.execute(text("INSERT OR REPLACE INTO database_info (key, value) VALUES (:key, :value)"),
+                    {'key': DEDUPE_EPOCH_KEY, 'value': uuid.uuid4().hex})
@@ -0,0 +1,152 @@
+# database/export.py - 流式导出数据表（NDJSON / CSV）
+# 运行命令：python database/export.py <表名> [ndjson|csv] [股票代码,...] > 导出文件
+# 按索引顺序分批读取（yield_per），每批编码后立即输出，内存占用与表的大小无关
+import csv
+import io
+import json
+import sys
+import os
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(__file__))
+try:
+    from database.models import get_session, StockData, LatestQuote, ResearchReport, FinancialNews
+except ImportError:
+    from models import get_session, StockData, LatestQuote, ResearchReport, FinancialNews
+
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EXPORT_TABLES = {model.__tablename__: model for model in (StockData, LatestQuote, ResearchReport, FinancialNews)}
+
+# 导出格式 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+# 去重键只在入库时使用，写入序号只供行情推送使用，不导出
+EXCLUDED_COLUMNS = ('dedupe_key', 'change_seq')
+
+BATCH_SIZE = 1000
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+def export_model(table_name, fmt='ndjson', symbols=None):
+    """检查导出参数并返回对应的模型，参数无效时抛出 InvalidExport"""
+    model = EXPORT_TABLES.get(table_name)
+    if model is None:
+        raise InvalidExport(f"不支持导出的数据表: {table_name}；可选: {', '.join(EXPORT_TABLES)}")
+    if fmt not in EXPORT_FORMATS:
+        raise InvalidExport(f"不支持的导出格式: {fmt}；可选: {', '.join(EXPORT_FORMATS)}")
+    if symbols and 'symbol' not in model.__table__.columns:
+        raise InvalidExport(f"{table_name} 没有股票代码列，不能按股票代码筛选")
+    return model
+
+
+def export_columns(model):
+    return [column for column in model.__table__.columns if column.key not in EXCLUDED_COLUMNS]
+
+
+def _naive_utc(value):
+    """crawl_time 按不带时区的UTC时间存储"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def export_query(model, since=None, until=None, symbols=None):
+    """导出查询：排序与所用索引一致，SQLite不需要建临时排序表
+
+    没有股票代码筛选时按 (crawl_time, 主键) 读取；按股票代码筛选时按 (symbol, crawl_time, 主键) 读取
+    """
+    table = model.__table__
+    primary_key = list(table.primary_key.columns)
+    query = select(*export_columns(model))
+
+    since, until = _naive_utc(since), _naive_utc(until)
+    if since is not None:
+        query = query.where(table.c.crawl_time >= since)
+    if until is not None:
+        query = query.where(table.c.crawl_time < until)
+    if symbols:
+        query = query.where(table.c.symbol.in_(symbols))
+        if model is LatestQuote:
+            return query.order_by(table.c.symbol)
+        return query.order_by(table.c.symbol, table.c.crawl_time, *primary_key)
+    return query.order_by(table.c.crawl_time, *primary_key)
+
+
+def iter_batches(session, query, batch_size=BATCH_SIZE):
+    """逐批读取查询结果，每批最多 batch_size 行"""
+    result = session.execute(query.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _dumps(record):
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=datetime.isoformat).encode('utf-8')
+
+
+def ndjson_chunks(batches, keys):
+    for rows in batches:
+        yield b''.join(_dumps(dict(zip(keys, row))) + b'\n' for row in rows)
+
+
+def csv_chunks(batches, keys):
+    """带BOM的UTF-8，Excel可以直接打开；空值输出为空字符串"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_export(model, fmt='ndjson', since=None, until=None, symbols=None, batch_size=BATCH_SIZE):
+    """生成导出内容的字节块；自行打开和关闭数据库会话，可以在请求处理结束后继续读取"""
+    keys = [column.key for column in export_columns(model)]
+    encode = csv_chunks if fmt == 'csv' else ndjson_chunks
+    session = get_session()
+    try:
+        batches = iter_batches(session, export_query(model, since, until, symbols), batch_size)
+        yield from encode(batches, keys)
+    finally:
+        session.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f"用法: python database/export.py <{'|'.join(EXPORT_TABLES)}> [ndjson|csv] [股票代码,...]",
+              file=sys.stderr)
+        sys.exit(1)
+
+    table_name = sys.argv[1]
+    fmt = sys.argv[2] if len(sys.argv) > 2 else 'ndjson'
+    symbols = sys.argv[3].split(',') if len(sys.argv) > 3 else None
+    try:
+        model = export_model(table_name, fmt, symbols)
+    except InvalidExport as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for chunk in stream_export(model, fmt, symbols=symbols):
+        sys.stdout.buffer.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
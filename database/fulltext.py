@@ -0,0 +1,88 @@
+# database/fulltext.py - 新闻和研报的 SQLite FTS5 全文索引
+# 运行命令：python database/fulltext.py    为已有数据重建全文索引
+# 使用 trigram 分词器，中文不需要分词即可做子串匹配；索引表为外部内容表，
+# 由数据表上的触发器在同一事务中同步，不重复存储正文
+import sys
+import os
+
+# 数据表 -> (全文索引表, 建索引的列)
+FTS_TABLES = {
+    'financial_news': ('financial_news_fts', ('title', 'content')),
+    'research_reports': ('research_reports_fts', ('title', 'author', 'institution', 'summary')),
+}
+
+# trigram 分词器只能匹配不少于3个字符的关键词
+MIN_QUERY_LENGTH = 3
+
+
+def fulltext_ddl(table_name):
+    """建立全文索引表和同步触发器的语句"""
+    fts_name, columns = FTS_TABLES[table_name]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+    delete_old = (f"INSERT INTO {fts_name}({fts_name}, rowid, {column_list}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f"INSERT INTO {fts_name}(rowid, {column_list}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_name} USING fts5("
+        f"{column_list}, content='{table_name}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ai AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ad AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_au AFTER UPDATE ON {table_name} BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def create_fulltext(conn, table_name):
+    for statement in fulltext_ddl(table_name):
+        conn.exec_driver_sql(statement)
+
+
+def rebuild_fulltext(conn):
+    """按数据表内容重建全部全文索引"""
+    for table_name, (fts_name, _) in FTS_TABLES.items():
+        create_fulltext(conn, table_name)
+        conn.exec_driver_sql(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')")
+
+
+def build_match_query(q):
+    """把用户输入转为FTS5查询：按空白拆成多个短语，全部命中才算匹配
+
+    任意一个短语不足3个字符时返回None，调用方应退回 LIKE 查询。
+    """
+    terms = q.split()
+    if not terms or any(len(term) < MIN_QUERY_LENGTH for term in terms):
+        return None
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_fulltext(conn, table_name, match_query, limit, offset=0):
+    """按BM25相关度返回 [(id, 高亮摘要, 得分)]，得分越小越相关"""
+    fts_name, _ = FTS_TABLES[table_name]
+    rows = conn.exec_driver_sql(
+        f"SELECT rowid, snippet({fts_name}, -1, '<mark>', '</mark>', '…', 48), bm25({fts_name}) "
+        f"FROM {fts_name} WHERE {fts_name} MATCH ? ORDER BY bm25({fts_name}) LIMIT ? OFFSET ?",
+        (match_query, limit, offset)
+    )
+    return rows.all()
+
+
+def main():
+    sys.path.append(os.path.dirname(__file__))
+    try:
+        from database.models import get_engine
+    except ImportError:
+        from models import get_engine
+
+    with get_engine().begin() as conn:
+        rebuild_fulltext(conn)
+        counts = {fts_name: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table_name}").scalar()
+                  for table_name, (fts_name, _) in FTS_TABLES.items()}
+
+    print("✅ 全文索引已重建")
+    for fts_name, count in counts.items():
+        print(f"  - {fts_name}: {count} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from models import create_tables
+from migrate import upgrade_database
 
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    upgrade_database()
\ No newline at end of file
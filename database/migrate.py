@@ -0,0 +1,301 @@
+# database/migrate.py - 数据库结构升级
+# 运行命令：python database/migrate.py
+# 当前结构版本记录在 SQLite 的 PRAGMA user_version 中，只执行尚未执行过的迁移
+# 迁移中的建表/建索引语句写死为当时的结构，不引用会继续变化的模型定义
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+try:
+    from database.models import Base, StockData, get_engine
+    from database.normalize import parse_number, parse_volume, parse_datetime
+    from database.dedupe import quote_key, report_key, news_key
+    from database.table_stats import COUNTED_TABLES
+    from database.fulltext import rebuild_fulltext
+    from database.data_version import VERSIONED_TABLES, create_version_triggers
+    from database import crawler_config  # noqa: F401  注册crawler_configs表
+    from database import crawl_jobs  # noqa: F401  注册crawl_jobs表
+    from database import crawl_runs  # noqa: F401  注册crawl_runs表
+except ImportError:
+    from models import Base, StockData, get_engine
+    from normalize import parse_number, parse_volume, parse_datetime
+    from dedupe import quote_key, report_key, news_key
+    from table_stats import COUNTED_TABLES
+    from fulltext import rebuild_fulltext
+    from data_version import VERSIONED_TABLES, create_version_triggers
+    import crawler_config  # noqa: F401
+    import crawl_jobs  # noqa: F401
+    import crawl_runs  # noqa: F401
+
+from sqlalchemy import inspect
+
+
+def _table_exists(conn, table_name):
+    return inspect(conn).has_table(table_name)
+
+
+def migrate_numeric_quotes(conn):
+    """stock_data 的价格/涨跌/成交量由字符串改为数值类型，并回填历史数据"""
+    # SQLite无法修改列类型，需要重建表再把数据解析后写回
+    conn.exec_driver_sql("ALTER TABLE stock_data RENAME TO stock_data_old")
+    conn.exec_driver_sql(
+        "CREATE TABLE stock_data ("
+        "id INTEGER NOT NULL, symbol VARCHAR(20) NOT NULL, name VARCHAR(100) NOT NULL, "
+        "price FLOAT, change FLOAT, change_percent FLOAT, volume BIGINT, "
+        "source_url VARCHAR(500), crawl_time DATETIME, PRIMARY KEY (id))"
+    )
+
+    rows = conn.exec_driver_sql(
+        "SELECT id, symbol, name, price, change, change_percent, volume, source_url, crawl_time "
+        "FROM stock_data_old ORDER BY id"
+    )
+    # crawl_time等列按原始值拷贝，只对数值列做解析
+    insert = (
+        "INSERT INTO stock_data (id, symbol, name, price, change, change_percent, volume, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    batch = []
+    for row in rows:
+        batch.append((
+            row.id, row.symbol, row.name,
+            parse_number(row.price),
+            parse_number(row.change),
+            parse_number(row.change_percent),
+            parse_volume(row.volume),
+            row.source_url, row.crawl_time,
+        ))
+        if len(batch) >= 1000:
+            conn.exec_driver_sql(insert, batch)
+            batch = []
+    if batch:
+        conn.exec_driver_sql(insert, batch)
+
+    conn.exec_driver_sql("DROP TABLE stock_data_old")
+
+
+def create_query_indexes(conn):
+    """为已有的数据表补建查询索引（create_all不会给已存在的表加索引）"""
+    indexes = [
+        ('ix_stock_data_crawl_time', 'stock_data', 'crawl_time'),
+        ('ix_stock_data_symbol_crawl_time', 'stock_data', 'symbol, crawl_time'),
+        ('ix_research_reports_crawl_time', 'research_reports', 'crawl_time'),
+        ('ix_research_reports_institution_crawl_time', 'research_reports', 'institution, crawl_time'),
+        ('ix_research_reports_rating_crawl_time', 'research_reports', 'rating, crawl_time'),
+        ('ix_financial_news_crawl_time', 'financial_news', 'crawl_time'),
+        ('ix_financial_news_category_crawl_time', 'financial_news', 'category, crawl_time'),
+        ('ix_financial_news_source_crawl_time', 'financial_news', 'source, crawl_time'),
+    ]
+    for name, table, columns in indexes:
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    conn.exec_driver_sql("ANALYZE")
+
+
+def add_dedupe_keys(conn):
+    """增加去重键并回填，然后建唯一索引
+
+    历史数据全部保留：键相同的多行只有最早一条写入去重键，其余的去重键留空（唯一索引允许多个NULL）。
+    没有行情时间的旧行情按价格等字段计算键，不同时间爬取的数据也可能相同，不能当作重复删除
+    """
+    conn.exec_driver_sql("ALTER TABLE stock_data ADD COLUMN quote_time DATETIME")
+    for table in ('stock_data', 'research_reports', 'financial_news'):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN dedupe_key VARCHAR(40)")
+
+    key_builders = {
+        'stock_data': (
+            "SELECT id, symbol, quote_time, price, change, change_percent, volume FROM stock_data ORDER BY id",
+            lambda row: quote_key(row.symbol, parse_datetime(row.quote_time), row.price,
+                                  row.change, row.change_percent, row.volume),
+        ),
+        'research_reports': (
+            "SELECT id, source_url, title FROM research_reports ORDER BY id",
+            lambda row: report_key(row.source_url, row.title),
+        ),
+        'financial_news': (
+            "SELECT id, source_url, title FROM financial_news ORDER BY id",
+            lambda row: news_key(row.source_url, row.title),
+        ),
+    }
+    for table, (select_sql, build_key) in key_builders.items():
+        seen = set()
+        updates = []
+        duplicates = 0
+        for row in conn.exec_driver_sql(select_sql).fetchall():
+            key = build_key(row)
+            if key in seen:
+                duplicates += 1
+            else:
+                seen.add(key)
+                updates.append((key, row.id))
+
+        if updates:
+            conn.exec_driver_sql(f"UPDATE {table} SET dedupe_key = ? WHERE id = ?", updates)
+        if duplicates:
+            print(f"  {table}: {duplicates} 条数据与更早的数据去重键相同，已保留，去重键留空")
+        conn.exec_driver_sql(f"CREATE UNIQUE INDEX uq_{table}_dedupe_key ON {table} (dedupe_key)")
+
+
+def create_latest_quotes(conn):
+    """新增最新行情快照表，并用历史数据中每个代码的最新一条回填"""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS latest_quotes ("
+        "symbol VARCHAR(20) NOT NULL, name VARCHAR(100) NOT NULL, "
+        "price FLOAT, change FLOAT, change_percent FLOAT, volume BIGINT, quote_time DATETIME, "
+        "source_url VARCHAR(500), crawl_time DATETIME, PRIMARY KEY (symbol))"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_latest_quotes_crawl_time ON latest_quotes (crawl_time)")
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO latest_quotes "
+        "(symbol, name, price, change, change_percent, volume, quote_time, source_url, crawl_time) "
+        "SELECT symbol, name, price, change, change_percent, volume, quote_time, source_url, crawl_time FROM ("
+        "  SELECT *, ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY crawl_time DESC, id DESC) AS rn"
+        "  FROM stock_data"
+        ") WHERE rn = 1"
+    )
+
+
+def create_table_stats(conn):
+    """新增数据表计数器，并按现有数据初始化"""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS table_stats ("
+        "table_name VARCHAR(50) NOT NULL, row_count BIGINT NOT NULL, last_update DATETIME, "
+        "PRIMARY KEY (table_name))"
+    )
+    # 不调用 rebuild_table_stats：它按最新结构写入（迁移8新增的 version 列），这里只能用当时的列
+    for table_name in COUNTED_TABLES:
+        conn.exec_driver_sql(
+            f"INSERT OR REPLACE INTO table_stats (table_name, row_count, last_update) "
+            f"SELECT '{table_name}', COUNT(*), MAX(crawl_time) FROM {table_name}"
+        )
+
+
+def add_turnover_and_leaderboard_indexes(conn):
+    """新增成交额列，并为排行榜的各排序列建立索引"""
+    conn.exec_driver_sql("ALTER TABLE stock_data ADD COLUMN turnover FLOAT")
+    conn.exec_driver_sql("ALTER TABLE latest_quotes ADD COLUMN turnover FLOAT")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_latest_quotes_crawl_time")
+    for name, columns in [
+        ('ix_latest_quotes_crawl_time', 'crawl_time, symbol'),
+        ('ix_latest_quotes_change_percent', 'change_percent, symbol'),
+        ('ix_latest_quotes_change', 'change, symbol'),
+        ('ix_latest_quotes_volume', 'volume, symbol'),
+        ('ix_latest_quotes_turnover', 'turnover, symbol'),
+    ]:
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON latest_quotes ({columns})")
+    conn.exec_driver_sql("ANALYZE latest_quotes")
+
+
+def create_fulltext_indexes(conn):
+    """新闻和研报的FTS5全文索引及同步触发器，并为已有数据建立索引"""
+    rebuild_fulltext(conn)
+
+
+def add_data_versions(conn):
+    """table_stats 新增版本号和修改时间，并在数据表上建立维护版本号的触发器"""
+    conn.exec_driver_sql("ALTER TABLE table_stats ADD COLUMN version BIGINT DEFAULT '0' NOT NULL")
+    conn.exec_driver_sql("ALTER TABLE table_stats ADD COLUMN changed_at BIGINT")
+    for table_name in VERSIONED_TABLES:
+        create_version_triggers(conn, table_name)
+
+
+def create_crawl_jobs(conn):
+    """新增爬取任务记录表"""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS crawl_jobs ("
+        "job_id VARCHAR(32) NOT NULL, spider_name VARCHAR(100) NOT NULL, spider_args TEXT, config_id INTEGER, "
+        "state VARCHAR(20) NOT NULL, finish_reason VARCHAR(100), error TEXT, log_file VARCHAR(500), "
+        "submitted_at DATETIME NOT NULL, started_at DATETIME, finished_at DATETIME, "
+        "updated_at DATETIME, progress_at DATETIME, "
+        "item_count BIGINT NOT NULL, dropped_count BIGINT NOT NULL, "
+        "request_count BIGINT NOT NULL, response_count BIGINT NOT NULL, "
+        "error_count BIGINT NOT NULL, http_error_count BIGINT NOT NULL, exception_count BIGINT NOT NULL, "
+        "stats_json TEXT, PRIMARY KEY (job_id))"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_crawl_jobs_submitted_at ON crawl_jobs (submitted_at)")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_crawl_jobs_spider_name_submitted_at ON crawl_jobs (spider_name, submitted_at)"
+    )
+
+
+def add_config_schedules(conn):
+    """爬虫配置新增运行计划"""
+    # crawler_configs 由 create_all 创建，迁移在建表之前执行，旧数据库中可能还没有这张表
+    if _table_exists(conn, 'crawler_configs'):
+        conn.exec_driver_sql("ALTER TABLE crawler_configs ADD COLUMN schedule TEXT")
+
+
+def create_crawl_runs(conn):
+    """新增爬虫运行历史表"""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS crawl_runs ("
+        "id INTEGER NOT NULL, job_id VARCHAR(32), spider_name VARCHAR(100) NOT NULL, config_id INTEGER, "
+        "started_at DATETIME NOT NULL, finished_at DATETIME, duration_seconds FLOAT, finish_reason VARCHAR(100), "
+        "request_count BIGINT NOT NULL, response_count BIGINT NOT NULL, bytes_downloaded BIGINT NOT NULL, "
+        "item_count BIGINT NOT NULL, dropped_count BIGINT NOT NULL, retry_count BIGINT NOT NULL, "
+        "http_error_count BIGINT NOT NULL, exception_count BIGINT NOT NULL, "
+        "latency_p50_ms FLOAT, latency_p90_ms FLOAT, latency_p99_ms FLOAT, latency_max_ms FLOAT, "
+        "pipeline_seconds FLOAT, db_write_seconds FLOAT, items_per_second FLOAT, PRIMARY KEY (id))"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_crawl_runs_config_id_started_at ON crawl_runs (config_id, started_at)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_crawl_runs_spider_name_started_at ON crawl_runs (spider_name, started_at)"
+    )
+
+
+def create_database_info(conn):
+    """新增数据库信息表（去重纪元等）"""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS database_info (key VARCHAR(50) NOT NULL, value VARCHAR(200), PRIMARY KEY (key))"
+    )
+
+
+def add_quote_change_seq(conn):
+    """最新行情快照新增写入序号，已有行情留空，首次推送时全部读取"""
+    conn.exec_driver_sql("ALTER TABLE latest_quotes ADD COLUMN change_seq BIGINT")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_latest_quotes_change_seq ON latest_quotes (change_seq)")
+
+
+# (版本号, 说明, 迁移函数)，按版本号顺序执行
+MIGRATIONS = [
+    (1, "stock_data 数值列类型化", migrate_numeric_quotes),
+    (2, "列表查询索引", create_query_indexes),
+    (3, "去重键与唯一索引", add_dedupe_keys),
+    (4, "最新行情快照表", create_latest_quotes),
+    (5, "数据表计数器", create_table_stats),
+    (6, "成交额与排行榜索引", add_turnover_and_leaderboard_indexes),
+    (7, "新闻和研报全文索引", create_fulltext_indexes),
+    (8, "数据表版本号", add_data_versions),
+    (9, "爬取任务记录表", create_crawl_jobs),
+    (10, "爬虫配置运行计划", add_config_schedules),
+    (11, "爬虫运行历史表", create_crawl_runs),
+    (12, "数据库信息表", create_database_info),
+    (13, "最新行情写入序号", add_quote_change_seq),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def upgrade_database(engine=None):
+    """执行未完成的迁移并创建缺失的表，返回升级后的版本号"""
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+        # 全新数据库直接按最新模型建表，无需迁移
+        if version == 0 and not _table_exists(conn, StockData.__tablename__):
+            version = LATEST_VERSION
+
+        for target, description, migration in MIGRATIONS:
+            if target > version:
+                print(f"执行迁移 {target}: {description}")
+                migration(conn)
+
+        Base.metadata.create_all(bind=conn)
+        conn.exec_driver_sql(f"PRAGMA user_version={LATEST_VERSION}")
+
+    print(f"数据库结构已是最新版本: {LATEST_VERSION}")
+    return LATEST_VERSION
+
+
+if __name__ == "__main__":
+    upgrade_database()
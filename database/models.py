@@ -1,8 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float
+from sqlalchemy import create_engine, event, Column, Index, Integer, BigInteger, String, Text, DateTime, Float
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
 import os
+import threading
+
+try:
+    from database.fulltext import FTS_TABLES, create_fulltext
+    from database.data_version import VERSIONED_TABLES, create_version_triggers
+except ImportError:
+    from fulltext import FTS_TABLES, create_fulltext
+    from data_version import VERSIONED_TABLES, create_version_triggers
 
 Base = declarative_base()
 
@@ -13,12 +23,51 @@ class StockData(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     symbol = Column(String(20), nullable=False)
     name = Column(String(100), nullable=False)
-    price = Column(String(20))
-    change = Column(String(20))
-    change_percent = Column(String(20))
-    volume = Column(String(50))
+    price = Column(Float)
+    change = Column(Float)
+    change_percent = Column(Float)  # 百分数，1.45 表示 +1.45%
+    volume = Column(BigInteger)
+    turnover = Column(Float)  # 成交额（元）
+    quote_time = Column(DateTime)  # 行情时间（交易所本地时间）
+    source_url = Column(String(500))
+    crawl_time = Column(DateTime, default=datetime.utcnow)
+    dedupe_key = Column(String(40))  # 去重键，见 database/dedupe.py
+
+    # 与API的查询路径对应：按时间倒序列表、按代码筛选后按时间排序
+    __table_args__ = (
+        Index('uq_stock_data_dedupe_key', 'dedupe_key', unique=True),
+        Index('ix_stock_data_crawl_time', 'crawl_time'),
+        Index('ix_stock_data_symbol_crawl_time', 'symbol', 'crawl_time'),
+    )
+
+
+class LatestQuote(Base):
+    """每个股票代码的最新行情快照，pipeline写入行情时在同一事务中更新"""
+    __tablename__ = 'latest_quotes'
+
+    symbol = Column(String(20), primary_key=True)
+    name = Column(String(100), nullable=False)
+    price = Column(Float)
+    change = Column(Float)
+    change_percent = Column(Float)
+    volume = Column(BigInteger)
+    turnover = Column(Float)
+    quote_time = Column(DateTime)
     source_url = Column(String(500))
     crawl_time = Column(DateTime, default=datetime.utcnow)
+    # 写入序号：pipeline每次插入或更新快照时取当前最大值加一。写事务串行执行，序号按提交顺序递增，
+    # 行情推送据此读取上次之后提交的行情，不受 crawl_time 早于提交时间的影响
+    change_seq = Column(BigInteger)
+
+    # 列表按时间排序（symbol为分页决胜列），排行榜按各数值列排序，行情推送按写入序号读取
+    __table_args__ = (
+        Index('ix_latest_quotes_crawl_time', 'crawl_time', 'symbol'),
+        Index('ix_latest_quotes_change_seq', 'change_seq'),
+        Index('ix_latest_quotes_change_percent', 'change_percent', 'symbol'),
+        Index('ix_latest_quotes_change', 'change', 'symbol'),
+        Index('ix_latest_quotes_volume', 'volume', 'symbol'),
+        Index('ix_latest_quotes_turnover', 'turnover', 'symbol'),
+    )
 
 
 class ResearchReport(Base):
@@ -35,6 +84,14 @@ class ResearchReport(Base):
     summary = Column(Text)
     source_url = Column(String(500))
     crawl_time = Column(DateTime, default=datetime.utcnow)
+    dedupe_key = Column(String(40))
+
+    __table_args__ = (
+        Index('uq_research_reports_dedupe_key', 'dedupe_key', unique=True),
+        Index('ix_research_reports_crawl_time', 'crawl_time'),
+        Index('ix_research_reports_institution_crawl_time', 'institution', 'crawl_time'),
+        Index('ix_research_reports_rating_crawl_time', 'rating', 'crawl_time'),
+    )
 
 
 class FinancialNews(Base):
@@ -50,23 +107,190 @@ class FinancialNews(Base):
     keywords = Column(Text)  # 存储为字符串，用逗号分隔
     source_url = Column(String(500))
     crawl_time = Column(DateTime, default=datetime.utcnow)
+    dedupe_key = Column(String(40))
+
+    __table_args__ = (
+        Index('uq_financial_news_dedupe_key', 'dedupe_key', unique=True),
+        Index('ix_financial_news_crawl_time', 'crawl_time'),
+        Index('ix_financial_news_category_crawl_time', 'category', 'crawl_time'),
+        Index('ix_financial_news_source_crawl_time', 'source', 'crawl_time'),
+    )
+
+
+def _create_fulltext_after_table(target, connection, **kw):
+    create_fulltext(connection, target.name)
+
+
+# 新建数据库时随数据表一起创建全文索引表和同步触发器，已有数据库由迁移创建
+for _model in (ResearchReport, FinancialNews):
+    assert _model.__tablename__ in FTS_TABLES
+    event.listen(_model.__table__, 'after_create', _create_fulltext_after_table)
+
+
+class TickSymbol(Base):
+    """逐笔行情存储中的股票代码编号，行情文件里只记录定长的symbol_id"""
+    __tablename__ = 'tick_symbols'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String(20), nullable=False, unique=True)
+    name = Column(String(100))
+
+
+class TickFile(Base):
+    """逐笔行情文件的元数据：每天每个代码一个文件，row_count 之后的字节视为无效"""
+    __tablename__ = 'tick_files'
+
+    day = Column(String(10), primary_key=True)  # 行情日期 YYYY-MM-DD
+    symbol_id = Column(Integer, primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    first_ts = Column(BigInteger)  # 微秒时间戳，见 database/tick_store.py
+    last_ts = Column(BigInteger)
+
+
+class TableStats(Base):
+    """各数据表的行数和最后写入时间，由pipeline在插入数据的同一事务中累加，/api/stats 直接读取
+
+    version / changed_at 由数据表上的触发器维护，API 据此生成 ETag 和 Last-Modified
+    """
+    __tablename__ = 'table_stats'
+
+    table_name = Column(String(50), primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    last_update = Column(DateTime)
+    version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    changed_at = Column(BigInteger)  # 最后一次修改的Unix时间（秒）
+
+
+class DatabaseInfo(Base):
+    """数据库级别的键值信息，如去重纪元（见 database/dedupe.py）"""
+    __tablename__ = 'database_info'
+
+    key = Column(String(50), primary_key=True)
+    value = Column(String(200))
+
+
+def _create_version_triggers_after_table(target, connection, **kw):
+    create_version_triggers(connection, target.name)
+
+
+# 新建数据库时随数据表一起创建版本号触发器，已有数据库由迁移创建
+for _model in (StockData, LatestQuote, ResearchReport, FinancialNews):
+    assert _model.__tablename__ in VERSIONED_TABLES
+    event.listen(_model.__table__, 'after_create', _create_version_triggers_after_table)
 
 
 # 获取项目根目录的绝对路径
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'financial_data.db')}"
+# 可通过环境变量 DATABASE_URL 指向其他数据库
+DATABASE_URL = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(BASE_DIR, 'financial_data.db')}"
+)
 # 数据库连接配置，避免文件夹问题
 #DATABASE_URL = "sqlite:///./financial_data.db"
 
 
-def get_engine():
-    return create_engine(DATABASE_URL, echo=True)
+def get_data_dir():
+    """SQLite数据库文件所在目录，布隆过滤器等附属文件与数据库放在一起"""
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        return os.path.dirname(os.path.abspath(url.database))
+    return BASE_DIR
 
 
-def get_session():
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return SessionLocal()
+def get_database_stem():
+    """数据库文件名（不含扩展名），用作附属文件的前缀"""
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        return os.path.splitext(os.path.basename(url.database))[0]
+    return 'financial_data'
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+# 连接池与SQLite调优参数，均可通过环境变量覆盖
+ENGINE_SETTINGS = {
+    'echo': _env_bool('DATABASE_ECHO', False),
+    'pool_size': _env_int('DATABASE_POOL_SIZE', 5),
+    'max_overflow': _env_int('DATABASE_MAX_OVERFLOW', 10),
+    'pool_timeout': _env_int('DATABASE_POOL_TIMEOUT', 30),
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    'cache_size': _env_int('SQLITE_CACHE_SIZE', -64 * 1024),  # 负数表示KB，即64MB
+    'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT', 5000),  # 毫秒
+}
+
+# 进程内的引擎和会话工厂缓存，按数据库URL区分
+_engines = {}
+_session_factories = {}
+_registry_lock = threading.Lock()
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _create_engine(url):
+    if not url.startswith('sqlite'):
+        return create_engine(url, **ENGINE_SETTINGS)
+
+    is_memory = url in ('sqlite://', 'sqlite:///:memory:')
+    if is_memory:
+        engine = create_engine(url, echo=ENGINE_SETTINGS['echo'],
+                               connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            connect_args={'check_same_thread': False},
+            **ENGINE_SETTINGS
+        )
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    return engine
+
+
+def get_engine(url=None):
+    """返回进程内共享的数据库引擎，首次调用时创建"""
+    url = url or DATABASE_URL
+    engine = _engines.get(url)
+    if engine is None:
+        with _registry_lock:
+            engine = _engines.get(url)
+            if engine is None:
+                engine = _engines[url] = _create_engine(url)
+    return engine
+
+
+def get_session(url=None):
+    url = url or DATABASE_URL
+    factory = _session_factories.get(url)
+    if factory is None:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine(url))
+        _session_factories[url] = factory
+    return factory()
+
+
+def dispose_engines():
+    """释放所有缓存的引擎（进程fork后或测试切换数据库时调用）"""
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
 
 
 def create_tables():
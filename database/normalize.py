@@ -0,0 +1,67 @@
+# database/normalize.py - 行情数值的解析与展示格式化
+# 入库时统一解析为数值，API输出时再格式化为展示字符串
+
+from datetime import datetime
+
+_EMPTY_VALUES = {'', '-', '--', 'N/A', 'None', 'null'}
+
+# 中文数量单位
+_UNIT_MULTIPLIERS = {
+    '万': 10 ** 4,
+    '亿': 10 ** 8,
+}
+
+
+def parse_number(value):
+    """把 "+1.45%"、"37.72"、"1,234"、"1.2万" 等解析为float，无法解析时返回None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = str(value).strip().replace(',', '').replace('%', '').replace('+', '')
+    if text in _EMPTY_VALUES:
+        return None
+
+    multiplier = 1
+    if text and text[-1] in _UNIT_MULTIPLIERS:
+        multiplier = _UNIT_MULTIPLIERS[text[-1]]
+        text = text[:-1]
+
+    try:
+        return float(text) * multiplier
+    except ValueError:
+        return None
+
+
+def parse_volume(value):
+    """成交量解析为整数"""
+    number = parse_number(value)
+    return int(round(number)) if number is not None else None
+
+
+def parse_datetime(value):
+    """解析 "YYYY-MM-DD HH:MM:SS" 或ISO格式的时间，无法解析时返回None"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+def format_price(value):
+    return f"{value:.2f}" if value is not None else None
+
+
+def format_change(value):
+    return f"{value:+.2f}" if value is not None else None
+
+
+def format_percent(value):
+    """change_percent 以百分数存储，例如 1.45 表示 +1.45%"""
+    return f"{value:+.2f}%" if value is not None else None
+
+
+def format_volume(value):
+    return str(int(value)) if value is not None else None
@@ -0,0 +1,60 @@
+# database/table_stats.py - 数据表计数器
+# 运行命令：python database/table_stats.py    按实际数据重新统计，计数器与数据不一致时使用
+# pipeline每次插入数据时在同一事务中累加 table_stats，/api/stats 只需读取这张小表
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+try:
+    from database.models import TableStats, get_engine
+except ImportError:
+    from models import TableStats, get_engine
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# 计数的数据表（按 crawl_time 统计最后写入时间）
+COUNTED_TABLES = ('stock_data', 'research_reports', 'financial_news')
+
+
+def record_inserts(session, table_name, count, last_update=None):
+    """累加某张表的行数，不提交事务"""
+    if not count:
+        return
+    stmt = sqlite_insert(TableStats.__table__).values(
+        table_name=table_name, row_count=count, last_update=last_update or datetime.utcnow()
+    )
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=['table_name'],
+        set_={
+            'row_count': TableStats.__table__.c.row_count + stmt.excluded.row_count,
+            'last_update': stmt.excluded.last_update,
+        },
+    ))
+
+
+def rebuild_table_stats(conn):
+    """按实际数据重新统计全部计数器（会扫描整张表）"""
+    for table_name in COUNTED_TABLES:
+        # 在触发器维护的版本号上递增而不是重置：计数变了 /api/stats 的内容也变了，
+        # 版本号回退则会让客户端缓存的旧ETag重新生效
+        conn.exec_driver_sql(
+            f"INSERT INTO table_stats (table_name, row_count, last_update) "
+            f"SELECT '{table_name}', COUNT(*), MAX(crawl_time) FROM {table_name} WHERE true "
+            f"ON CONFLICT(table_name) DO UPDATE SET "
+            f"row_count = excluded.row_count, last_update = excluded.last_update, version = version + 1"
+        )
+
+
+def main():
+    with get_engine().begin() as conn:
+        rebuild_table_stats(conn)
+        rows = conn.exec_driver_sql("SELECT table_name, row_count, last_update FROM table_stats").all()
+
+    print("✅ 计数器已重建")
+    for table_name, row_count, last_update in rows:
+        print(f"  - {table_name}: {row_count} 条，最后写入 {last_update}")
+
+
+if __name__ == "__main__":
+    main()
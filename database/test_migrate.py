@@ -0,0 +1,79 @@
+# database/test_migrate.py - 旧数据库结构升级测试
+# 运行命令：python -m pytest database/test_migrate.py
+import sqlite3
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from models import get_engine
+from migrate import LATEST_VERSION, upgrade_database
+
+# 加入结构版本号之前的数据库结构（user_version 为 0）
+BASELINE_SCHEMA = [
+    "CREATE TABLE stock_data (id INTEGER NOT NULL, symbol VARCHAR(20) NOT NULL, name VARCHAR(100) NOT NULL, "
+    "price VARCHAR(20), change VARCHAR(20), change_percent VARCHAR(20), volume VARCHAR(50), "
+    "source_url VARCHAR(500), crawl_time DATETIME, PRIMARY KEY (id))",
+    "CREATE TABLE research_reports (id INTEGER NOT NULL, title VARCHAR(300) NOT NULL, author VARCHAR(100), "
+    "institution VARCHAR(100), publish_date VARCHAR(50), report_type VARCHAR(50), rating VARCHAR(20), "
+    "target_price VARCHAR(20), summary TEXT, source_url VARCHAR(500), crawl_time DATETIME, PRIMARY KEY (id))",
+    "CREATE TABLE financial_news (id INTEGER NOT NULL, title VARCHAR(300) NOT NULL, content TEXT, "
+    "author VARCHAR(100), publish_time VARCHAR(50), source VARCHAR(100), category VARCHAR(50), keywords TEXT, "
+    "source_url VARCHAR(500), crawl_time DATETIME, PRIMARY KEY (id))",
+    "CREATE TABLE crawler_configs (id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, description TEXT, "
+    "website_name VARCHAR(100) NOT NULL, config_json TEXT NOT NULL, is_active BOOLEAN, created_at DATETIME, "
+    "updated_at DATETIME, last_run_at DATETIME, run_count INTEGER, success_count INTEGER, "
+    "PRIMARY KEY (id), UNIQUE (name))",
+]
+
+QUOTE_URL = 'https://hq.sinajs.cn/list=sh600036'
+
+
+def _baseline_database(path):
+    conn = sqlite3.connect(path)
+    for sql in BASELINE_SCHEMA:
+        conn.execute(sql)
+    conn.executemany(
+        "INSERT INTO stock_data (symbol, name, price, change, change_percent, volume, source_url, crawl_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            ('sh600036', '招商银行', '46.670', '+0.42', '+0.91%', '54179835', QUOTE_URL, '2025-06-24 05:49:25.609462'),
+            ('sh600036', '招商银行', '46.810', '+0.56', '+1.21%', '60012345', QUOTE_URL, '2025-06-24 06:10:02.120000'),
+            # 没有行情时间、数值与上一条相同的行情，去重键相同但属于不同时间的爬取
+            ('sh600036', '招商银行', '46.810', '+0.56', '+1.21%', '60012345', QUOTE_URL, '2025-06-24 06:15:00.000000'),
+            ('sh600519', '贵州茅台', '1420.00', '-3.50', '-0.25%', '2101234', QUOTE_URL, '2025-06-24 05:49:25.700000'),
+        ],
+    )
+    conn.execute(
+        "INSERT INTO financial_news (title, content, source, category, source_url, crawl_time) "
+        "VALUES ('央行开展逆回购操作', '央行今日开展逆回购操作', '新浪财经', '宏观', "
+        "'https://finance.sina.com.cn/news/1.html', '2025-06-24 05:50:00.000000')"
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_upgrade_baseline_database(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    _baseline_database(path)
+    engine = get_engine(f"sqlite:///{path}")
+    try:
+        assert upgrade_database(engine) == LATEST_VERSION
+    finally:
+        engine.dispose()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION
+        counts = dict(conn.execute("SELECT table_name, row_count FROM table_stats"))
+        for table_name in ('stock_data', 'research_reports', 'financial_news'):
+            assert counts[table_name] == conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        assert conn.execute(
+            "SELECT price, volume FROM stock_data WHERE symbol = 'sh600519'").fetchone() == (1420.0, 2101234)
+        assert conn.execute("SELECT COUNT(*) FROM latest_quotes").fetchone()[0] == 2
+        # 迁移不删除历史数据，去重键相同的较晚一条去重键留空
+        assert conn.execute("SELECT COUNT(*) FROM stock_data").fetchone()[0] == 4
+        assert conn.execute(
+            "SELECT crawl_time FROM stock_data WHERE dedupe_key IS NULL").fetchall() == [('2025-06-24 06:15:00.000000',)]
+    finally:
+        conn.close()
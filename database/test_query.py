@@ -87,37 +87,54 @@ import sys
 import os
 
 sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from models import get_session, StockData, ResearchReport, FinancialNews
+from scrapy_project.sinks import iter_jsonl
+
+OUTPUT_EXTENSIONS = ('.jsonl', '.jsonl.gz', '.jsonl.zst', '.json')
+
+
+def find_output_files():
+    """查找爬虫输出文件：output目录中的JSONL文件，以及项目根目录中旧版本留下的JSON文件"""
+    candidates = []
+    for directory in ('../output', '..'):
+        if not os.path.isdir(directory):
+            continue
+        for file in os.listdir(directory):
+            if file.endswith(OUTPUT_EXTENSIONS) and any(keyword in file for keyword in ['sina', 'stock', 'test']):
+                candidates.append(os.path.join(directory, file))
+    return candidates
 
 
 def compare_file_and_database():
-    """对比JSON文件和数据库中的数据"""
+    """对比JSONL文件和数据库中的数据"""
 
-    # 查找JSON文件
-    json_files = []
-    for file in os.listdir('..'):
-        if file.endswith('.json') and any(keyword in file for keyword in ['sina', 'stock', 'test']):
-            json_files.append(file)
+    # 查找输出文件
+    json_files = find_output_files()
 
     if not json_files:
-        print("❌ 未找到相关的JSON文件")
+        print("❌ 未找到相关的JSONL文件")
         return
 
-    print("📁 找到以下JSON文件:")
+    print("📁 找到以下输出文件:")
     for i, file in enumerate(json_files):
         print(f"  {i + 1}. {file}")
 
     # 使用最新的文件
-    latest_file = max(json_files, key=lambda x: os.path.getmtime(f"../{x}"))
+    latest_file = max(json_files, key=os.path.getmtime)
     print(f"\n🔍 分析最新文件: {latest_file}")
 
     try:
-        # 读取JSON文件数据
-        with open(f'../{latest_file}', 'r', encoding='utf-8') as f:
-            file_data = json.load(f)
+        # 逐行读取，只保留第一条作为样本（旧版本输出的 .json 文件同样是每行一条记录）
+        record_count = 0
+        sample = None
+        for record in iter_jsonl(latest_file):
+            if sample is None:
+                sample = record
+            record_count += 1
 
-        print(f"📄 JSON文件记录数: {len(file_data)}")
+        print(f"📄 文件记录数: {record_count}")
 
         # 查询数据库数据
         session = get_session()
@@ -133,15 +150,14 @@ def compare_file_and_database():
             print(f"  - 新闻: {db_news_count}")
 
             # 验证数据一致性
-            if len(file_data) <= db_total:
-                print("✅ 数据库包含了JSON文件的所有数据（可能有历史数据）")
+            if record_count <= db_total:
+                print("✅ 数据库包含了文件中的所有数据（可能有历史数据）")
             else:
-                print("❌ JSON文件记录数大于数据库记录数")
+                print("❌ 文件记录数大于数据库记录数")
 
             # 显示数据样本
-            if file_data:
-                print(f"\n🔍 JSON文件数据样本:")
-                sample = file_data[0]
+            if sample:
+                print(f"\n🔍 文件数据样本:")
                 for key, value in sample.items():
                     print(f"  {key}: {value}")
 
@@ -163,7 +179,9 @@ import os
 
 sys.path.append(os.path.dirname(__file__))
 
-from models import get_session, StockData, ResearchReport, FinancialNews
+from models import get_session, get_data_dir, get_database_stem, StockData, ResearchReport, FinancialNews
+from table_stats import rebuild_table_stats
+from dedupe import reset_dedupe_epoch
 
 
 def clean_database():
@@ -197,7 +215,14 @@ def clean_database():
         session.query(StockData).delete()
         session.query(ResearchReport).delete()
         session.query(FinancialNews).delete()
+        rebuild_table_stats(session.connection())
+        # 布隆过滤器记录的是清空前的数据，更换去重纪元使其失效并删除默认位置的过滤器文件
+        reset_dedupe_epoch(session)
         session.commit()
+        for table in (StockData, ResearchReport, FinancialNews):
+            bloom_path = os.path.join(get_data_dir(), f"{get_database_stem()}.{table.__tablename__}.bloom")
+            if os.path.exists(bloom_path):
+                os.remove(bloom_path)
 
         print("✅ 数据库已清空")
 
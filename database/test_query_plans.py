@@ -0,0 +1,49 @@
+# database/test_query_plans.py - 列表接口查询计划测试
+# 运行命令：python -m pytest database/test_query_plans.py
+# 与 check_query_plans.py 相同的检查，数据量较小；大数据量下的耗时用 check_query_plans.py 查看
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+
+from check_query_plans import KNOWN_SCANS, create_database, query_plans
+from database.models import get_engine, get_session, StockData
+import api.main as api_main
+
+ROWS = 5000
+
+
+def test_list_queries_use_indexes(tmp_path):
+    url = create_database(str(tmp_path / 'query_plans.db'), ROWS)
+    try:
+        results = query_plans(url)
+        failures = {name: plan for name, plan, _, bad in results if bad and name not in KNOWN_SCANS}
+        assert not failures
+
+        plans = {name: ' | '.join(plan) for name, plan, _, _ in results}
+        # 精确匹配的筛选条件都走 (列, crawl_time) 复合索引
+        assert 'ix_stock_data_symbol_crawl_time' in plans['/api/stocks?symbol']
+        assert 'ix_research_reports_institution_crawl_time' in plans['/api/reports?institution']
+        assert 'ix_research_reports_rating_crawl_time' in plans['/api/reports?rating']
+        assert 'ix_financial_news_category_crawl_time' in plans['/api/news?category']
+        assert 'ix_financial_news_source_crawl_time' in plans['/api/news?source']
+    finally:
+        get_engine(url).dispose()
+
+
+def test_filters_match_exact_values(tmp_path):
+    url = create_database(str(tmp_path / 'query_plans.db'), 100)
+    db = get_session(url)
+    try:
+        assert [row.symbol for row in api_main.build_stock_query(db, symbol=" sh600036 ").limit(5)] == ["sh600036"]
+        assert api_main.build_stock_query(db, symbol="60003").count() == 0
+        assert {row.institution for row in api_main.build_report_query(db, institution="中信证券").limit(100)} == {"中信证券"}
+        assert api_main.build_report_query(db, institution="中信").count() == 0
+        assert {row.source for row in api_main.build_news_query(db, source="新浪财经").limit(100)} == {"新浪财经"}
+        # 名称仍是模糊搜索
+        assert {row.name for row in api_main.build_stock_query(db, name_contains="股票3").limit(100)} \
+            == {"股票3"} | {f"股票{30 + i}" for i in range(10)}
+        assert api_main.build_stock_query(db).count() == db.query(StockData).count()
+    finally:
+        db.close()
+        get_engine(url).dispose()
@@ -0,0 +1,212 @@
+# database/tick_store.py - 基于内存映射文件的逐笔行情存储
+# 高频轮询时每条行情都作为 stock_data 行写入 SQLite 开销很大，
+# 这里把行情按 "日期/代码" 追加到定长记录的二进制文件中，读取时用 numpy.memmap 映射，
+# 按代码和时间范围取出的切片是映射文件上的视图，不复制数据。
+# SQLite 中只保存元数据：代码编号(tick_symbols)和每个文件的有效行数、时间范围(tick_files)。
+#
+# 目录结构：<数据库目录>/<数据库文件名>_ticks/<YYYY-MM-DD>/<symbol_id>.ticks
+# 时间戳为交易所本地时间（北京时间）的行情时间距 1970-01-01 的微秒数，不带时区；
+# 没有行情时间时用抓取时间（数据库中为UTC）换算为北京时间，保证记录落在正确日期的文件中
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+sys.path.append(os.path.dirname(__file__))
+try:
+    from database.models import TickSymbol, TickFile, get_session, get_data_dir, get_database_stem
+except ImportError:
+    from models import TickSymbol, TickFile, get_session, get_data_dir, get_database_stem
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+try:
+    import numpy as np
+
+    # 定长记录，文件内按时间戳递增排列；缺失的价格为NaN，缺失的成交量为-1
+    TICK_DTYPE = np.dtype([
+        ('symbol_id', '<u4'),
+        ('ts', '<i8'),
+        ('price', '<f8'),
+        ('change', '<f8'),
+        ('change_percent', '<f8'),
+        ('volume', '<i8'),
+    ])
+    TICK_STORE_AVAILABLE = True
+except ImportError:
+    np = None
+    TICK_DTYPE = None
+    TICK_STORE_AVAILABLE = False
+
+# 逐笔文件写入条数在 table_stats 中的行名（不是真实的数据表）
+TICK_STATS_NAME = 'ticks'
+
+_EPOCH = datetime(1970, 1, 1)
+MARKET_TZ = ZoneInfo('Asia/Shanghai')
+_NAN = float('nan')
+
+
+def to_timestamp(value):
+    """datetime -> 微秒时间戳"""
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_timestamp(ts):
+    """微秒时间戳 -> datetime"""
+    return _EPOCH + timedelta(microseconds=int(ts))
+
+
+def tick_time(row):
+    """行情记录的时间（北京时间，不带时区）：行情时间，没有时为换算后的抓取时间"""
+    if row.get('quote_time') is not None:
+        return row['quote_time']
+    crawl_time = row.get('crawl_time')
+    if crawl_time is None:
+        return None
+    return crawl_time.replace(tzinfo=timezone.utc).astimezone(MARKET_TZ).replace(tzinfo=None)
+
+
+def default_tick_dir():
+    return os.path.join(get_data_dir(), f"{get_database_stem()}_ticks")
+
+
+class TickStore:
+    """逐笔行情的追加写入与零拷贝读取
+
+    写入使用调用方的session，元数据与同一事务中的其他写入一起提交；
+    数据文件在 row_count 之后的字节视为无效，事务回滚留下的多余数据会在下次追加时被覆盖。
+    """
+
+    def __init__(self, root=None):
+        if not TICK_STORE_AVAILABLE:
+            raise RuntimeError("逐笔行情存储需要安装 numpy")
+        self.root = root or default_tick_dir()
+
+    def _path(self, day, symbol_id):
+        return os.path.join(self.root, day, f"{symbol_id}.ticks")
+
+    def append(self, session, rows):
+        """追加行情记录（字段与 StockData 相同的字典），返回实际写入的条数，不提交事务
+
+        同一代码的时间戳不晚于已写入的最后一条时视为重复抓取，直接跳过。
+        """
+        ticks = []
+        for row in rows:
+            moment = tick_time(row)
+            if row.get('symbol') and moment is not None:
+                ticks.append((row, moment))
+        if not ticks:
+            return 0
+
+        # 先写 tick_symbols 拿到SQLite写锁，多个进程同时写入时文件偏移量不会冲突
+        symbol_ids = self._symbol_ids(session, {row['symbol']: row.get('name') for row, _ in ticks})
+
+        grouped = {}
+        for row, moment in ticks:
+            key = (moment.strftime('%Y-%m-%d'), symbol_ids[row['symbol']])
+            grouped.setdefault(key, []).append((to_timestamp(moment), row))
+        files = self._load_files(session, grouped)
+
+        appended = 0
+        for (day, symbol_id), entries in grouped.items():
+            meta = files.get((day, symbol_id))
+            last_ts = meta.last_ts if meta else None
+
+            records = []
+            for ts, row in sorted(entries, key=lambda entry: entry[0]):
+                if last_ts is not None and ts <= last_ts:
+                    continue
+                records.append((
+                    symbol_id, ts,
+                    _float_or_nan(row.get('price')),
+                    _float_or_nan(row.get('change')),
+                    _float_or_nan(row.get('change_percent')),
+                    row.get('volume') if row.get('volume') is not None else -1,
+                ))
+                last_ts = ts
+            if not records:
+                continue
+
+            array = np.array(records, dtype=TICK_DTYPE)
+            if meta is None:
+                meta = TickFile(day=day, symbol_id=symbol_id, row_count=0, first_ts=int(array['ts'][0]))
+                session.add(meta)
+            self._write(self._path(day, symbol_id), meta.row_count, array)
+            meta.row_count += len(array)
+            meta.last_ts = last_ts
+            appended += len(array)
+
+        session.flush()
+        return appended
+
+    def _symbol_ids(self, session, names):
+        table = TickSymbol.__table__
+        session.execute(
+            sqlite_insert(table).on_conflict_do_nothing(index_elements=['symbol']),
+            [{'symbol': symbol, 'name': name} for symbol, name in names.items()]
+        )
+        rows = session.execute(select(table.c.symbol, table.c.id).where(table.c.symbol.in_(list(names))))
+        return dict(rows.all())
+
+    @staticmethod
+    def _load_files(session, keys):
+        days = {day for day, _ in keys}
+        symbol_ids = {symbol_id for _, symbol_id in keys}
+        metas = session.query(TickFile).filter(TickFile.day.in_(days), TickFile.symbol_id.in_(symbol_ids))
+        return {(meta.day, meta.symbol_id): meta for meta in metas}
+
+    @staticmethod
+    def _write(path, row_count, array):
+        """从第 row_count 条记录处写入并截断，覆盖上次回滚留下的无效数据"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        offset = row_count * TICK_DTYPE.itemsize
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < offset:
+                raise IOError(f"逐笔行情文件长度小于元数据记录的 {row_count} 条: {path}")
+            f.seek(offset)
+            f.write(array.tobytes())
+            f.truncate()
+
+    def read(self, symbol, start=None, end=None):
+        """读取 [start, end] 范围内的行情
+
+        范围在同一天内时返回内存映射文件上的视图（不复制）；跨多天时拼接为新数组。
+        """
+        slices = list(self.iter_slices(symbol, start, end))
+        if len(slices) == 1:
+            return slices[0]
+        if not slices:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.concatenate(slices)
+
+    def iter_slices(self, symbol, start=None, end=None):
+        """按日期顺序逐个返回每天的行情视图"""
+        session = get_session()
+        try:
+            symbol_id = session.query(TickSymbol.id).filter(TickSymbol.symbol == symbol).scalar()
+            if symbol_id is None:
+                return
+            query = session.query(TickFile.day, TickFile.row_count).filter(TickFile.symbol_id == symbol_id)
+            if start is not None:
+                query = query.filter(TickFile.day >= start.strftime('%Y-%m-%d'))
+            if end is not None:
+                query = query.filter(TickFile.day <= end.strftime('%Y-%m-%d'))
+            files = query.order_by(TickFile.day).all()
+        finally:
+            session.close()
+
+        for day, row_count in files:
+            if not row_count:
+                continue
+            view = np.memmap(self._path(day, symbol_id), dtype=TICK_DTYPE, mode='r', shape=(row_count,))
+            timestamps = view['ts']
+            lo = int(np.searchsorted(timestamps, to_timestamp(start), 'left')) if start is not None else 0
+            hi = int(np.searchsorted(timestamps, to_timestamp(end), 'right')) if end is not None else row_count
+            if hi > lo:
+                yield view[lo:hi]
+
+
+def _float_or_nan(value):
+    return float(value) if value is not None else _NAN
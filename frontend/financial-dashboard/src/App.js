@@ -264,6 +264,17 @@ useEffect(() => {
   fetchConfigs(); // 获取规则
 }, []);
 
+// 订阅行情推送，新的或变化的行情插入到表格顶部，不再需要重新请求列表
+useEffect(() => {
+  const source = new EventSource(`${API_BASE_URL}/api/stream/quotes`);
+  source.addEventListener('quotes', (event) => {
+    const quotes = JSON.parse(event.data)
+      .sort((a, b) => (b.crawl_time || '').localeCompare(a.crawl_time || ''));
+    setStockData((rows) => [...quotes, ...rows].slice(0, Math.max(rows.length, 20)));
+  });
+  return () => source.close();
+}, []);
+
 // 股票数据表格列配置
 const stockColumns = [
   {
@@ -532,7 +543,7 @@ const renderStocks = () => (
     <Table
       columns={stockColumns}
       dataSource={stockData}
-      rowKey="id"
+      rowKey={(record) => record.id ?? `${record.symbol}-${record.crawl_time}`}
       loading={loading}
       pagination={{
         total: stockData.length,
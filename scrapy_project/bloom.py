@@ -0,0 +1,91 @@
+# scrapy_project/bloom.py - 可持久化的布隆过滤器
+# 位数组大小只由容量和误判率决定，记录数百万个key也只占用几MB内存
+import hashlib
+import math
+import os
+import struct
+
+# 文件头：魔数、容量、误判率、位数、哈希函数个数、已加入的key数、所描述数据的标识（如数据库的去重纪元）
+_HEADER = struct.Struct('<4sQdQIQ32s')
+_MAGIC = b'BLM2'
+
+
+class BloomFilter:
+    """定长位数组的布隆过滤器，key为字符串"""
+
+    def __init__(self, capacity, error_rate, identity=''):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.identity = identity
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # 双重哈希：用一次blake2b的两半模拟k个独立哈希函数
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key):
+        added = False
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_saturated(self):
+        """超过设计容量后误判率会快速上升"""
+        return self.count > self.capacity
+
+    def save(self, path):
+        """先写临时文件再替换，避免写到一半时进程退出导致文件损坏"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.capacity, self.error_rate,
+                                 self.num_bits, self.num_hashes, self.count, self._identity_bytes()))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    def _identity_bytes(self):
+        return self.identity.encode('utf-8')[:32]
+
+    @classmethod
+    def load(cls, path, capacity, error_rate, identity=''):
+        """从文件加载；文件不存在、损坏、参数与配置不一致或标识不同时返回空过滤器"""
+        bloom = cls(capacity, error_rate, identity)
+        if not os.path.exists(path):
+            return bloom
+
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return bloom
+            magic, saved_capacity, saved_error_rate, num_bits, num_hashes, count, saved_identity = \
+                _HEADER.unpack(header)
+            if (magic != _MAGIC or saved_capacity != capacity or saved_error_rate != error_rate
+                    or num_bits != bloom.num_bits or num_hashes != bloom.num_hashes
+                    or saved_identity.rstrip(b'\0') != bloom._identity_bytes()):
+                return bloom
+            bits = f.read()
+
+        if len(bits) != len(bloom.bits):
+            return bloom
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        return bloom
@@ -0,0 +1,148 @@
+# scrapy_project/extensions.py - 爬虫扩展
+import logging
+import random
+import sys
+import os
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import task, threads
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    from database.crawl_jobs import stats_values, update_job
+    from database.crawl_runs import record_run, run_values
+
+    DATABASE_AVAILABLE = True
+except ImportError:
+    DATABASE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlJobStats:
+    """运行期间定期把 Scrapy 统计数据写入 crawl_jobs 中对应的任务记录
+
+    只在设置了 CRAWL_JOB_ID（由爬虫工作进程池按任务设置）时启用；
+    写库放在线程池中执行，不阻塞 reactor。上一次写入还没完成时跳过本次。
+    """
+
+    def __init__(self, crawler, job_id, interval):
+        self.crawler = crawler
+        self.job_id = job_id
+        self.interval = interval
+        self.loop = None
+        self.writing = None
+        self.progress = (0, 0)  # (请求数, 数据条数)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        job_id = crawler.settings.get('CRAWL_JOB_ID')
+        if not job_id or not DATABASE_AVAILABLE:
+            raise NotConfigured
+        extension = cls(crawler, job_id, crawler.settings.getfloat('CRAWL_JOB_STATS_INTERVAL', 5))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        now = datetime.utcnow()
+        self._write(state='running', started_at=now, updated_at=now, progress_at=now)
+        self.loop = task.LoopingCall(self._write_stats)
+        self.loop.start(self.interval, now=False)
+
+    async def spider_closed(self, spider, reason):
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+        # 等上一次写入完成再写最终统计，Scrapy等这里返回后才结束爬虫
+        if self.writing is not None:
+            await maybe_deferred_to_future(self.writing)
+        now = datetime.utcnow()
+        values = self._stats_values(now)
+        values.update(finish_reason=reason, finished_at=now)
+        await maybe_deferred_to_future(self._write(**values))
+
+    def _write_stats(self):
+        if self.writing is None:
+            self._write(**self._stats_values(datetime.utcnow()))
+
+    def _stats_values(self, now):
+        stats = self.crawler.stats.get_stats()
+        values = stats_values(stats)
+        values['updated_at'] = now
+        progress = (values['request_count'], values['item_count'])
+        if progress != self.progress:
+            self.progress = progress
+            values['progress_at'] = now
+        return values
+
+    def _write(self, **values):
+        deferred = threads.deferToThread(update_job, self.job_id, **values)
+        self.writing = deferred
+
+        def done(result):
+            if self.writing is deferred:
+                self.writing = None
+            return result
+
+        def failed(failure):
+            logger.warning(f"写入任务统计失败: {failure.getErrorMessage()}")
+
+        return deferred.addBoth(done).addErrback(failed)
+
+
+class CrawlRunRecorder:
+    """爬虫结束时把本次运行的性能数据写入 crawl_runs
+
+    响应延迟取自 Scrapy 记录在 request.meta 中的 download_latency；
+    超过 CRAWL_RUNS_LATENCY_SAMPLES 个响应后改为蓄水池抽样，内存占用固定
+    """
+
+    def __init__(self, crawler, job_id, sample_size):
+        self.crawler = crawler
+        self.job_id = job_id
+        self.sample_size = sample_size
+        self.latencies = []
+        self.seen = 0
+        self.started_at = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('CRAWL_RUNS_ENABLED', True) or not DATABASE_AVAILABLE:
+            raise NotConfigured
+        extension = cls(crawler, crawler.settings.get('CRAWL_JOB_ID'),
+                        crawler.settings.getint('CRAWL_RUNS_LATENCY_SAMPLES', 10000))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.started_at = datetime.utcnow()
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return
+        self.seen += 1
+        if len(self.latencies) < self.sample_size:
+            self.latencies.append(latency)
+        else:
+            index = random.randrange(self.seen)
+            if index < self.sample_size:
+                self.latencies[index] = latency
+
+    async def spider_closed(self, spider, reason):
+        if self.started_at is None:
+            return
+        values = run_values(self.crawler.stats.get_stats(), self.latencies, self.started_at, datetime.utcnow())
+        config = getattr(spider, 'config_obj', None)  # 动态爬虫
+        values.update(job_id=self.job_id, spider_name=spider.name, finish_reason=reason,
+                      config_id=config.id if config is not None else None)
+        try:
+            await maybe_deferred_to_future(threads.deferToThread(record_run, **values))
+        except Exception as e:
+            logger.warning(f"写入运行历史失败: {e}")
@@ -15,6 +15,8 @@ class StockDataItem(scrapy.Item):
     change = scrapy.Field()      # 涨跌额
     change_percent = scrapy.Field()  # 涨跌幅
     volume = scrapy.Field()      # 成交量
+    turnover = scrapy.Field()    # 成交额（元）
+    quote_time = scrapy.Field()  # 行情时间，格式 "YYYY-MM-DD HH:MM:SS"
     source_url = scrapy.Field()  # 数据来源
     crawl_time = scrapy.Field()  # 爬取时间
 
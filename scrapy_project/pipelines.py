@@ -6,81 +6,496 @@
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem
 
-import json
+import queue
 import sys
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
 # 添加database目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 
 try:
-    from database.models import get_session, StockData, ResearchReport, FinancialNews
+    from database.models import (get_session, get_data_dir, get_database_stem,
+                                 StockData, LatestQuote, ResearchReport, FinancialNews)
+    from database.normalize import parse_number, parse_volume, parse_datetime
+    from database.dedupe import quote_key, report_key, news_key, get_dedupe_epoch
+    from database.tick_store import TickStore, TICK_STORE_AVAILABLE, TICK_STATS_NAME
+    from database.table_stats import record_inserts
+    from sqlalchemy import func, select
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
     DATABASE_AVAILABLE = True
 except ImportError:
     DATABASE_AVAILABLE = False
     print("Warning: 数据库模块未找到，将只使用文件存储")
 
+from scrapy_project.bloom import BloomFilter
+from scrapy_project.sinks import RotatingJsonlSink
+
+# 写线程的停止信号
+_STOP = object()
+
+
+class DatabaseWriter(threading.Thread):
+    """独立的数据库写线程：从有界队列中取出记录，按批量配置写入数据库"""
+
+    def __init__(self, pipeline, spider, queue_size):
+        super().__init__(name=f"db-writer-{spider.name}", daemon=True)
+        self.pipeline = pipeline
+        self.spider = spider
+        self.queue = queue.Queue(maxsize=queue_size)
+
+    def run(self):
+        from twisted.internet import reactor
+
+        pipeline = self.pipeline
+        batch_size = max(pipeline.batch_size, 1)
+        interval = pipeline.batch_interval
+        timeout = min(interval, 1.0) if interval > 0 else 1.0
+
+        session = get_session()
+        records = []
+        last_flush = time.monotonic()
+        stopping = False
+        try:
+            while not stopping:
+                try:
+                    record = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    record = None
+
+                if record is _STOP:
+                    stopping = True
+                elif record is not None:
+                    records.append(record)
+
+                # 队列腾出空间后，唤醒在reactor线程中等待入队的item
+                if pipeline.waiting:
+                    reactor.callFromThread(pipeline._release_waiting)
+
+                if records and (stopping or len(records) >= batch_size
+                                or time.monotonic() - last_flush >= interval):
+                    started = time.perf_counter()
+                    inserted, failures = pipeline._write_records(session, records)
+                    reactor.callFromThread(pipeline._report_write_result, self.spider,
+                                           len(records), inserted, failures, time.perf_counter() - started)
+                    records = []
+                    last_flush = time.monotonic()
+        finally:
+            session.close()
+
+    def stop(self):
+        """发送停止信号并等待队列写完（会阻塞，应在线程池中调用）"""
+        self.queue.put(_STOP)
+        self.join()
+
+
 class FinancialDataPipeline:
-    def __init__(self):
+    def __init__(self, stats=None, batch_size=0, batch_interval=5.0,
+                 writer_enabled=False, writer_queue_size=1000,
+                 bloom_enabled=False, bloom_capacity=1000000, bloom_error_rate=0.001, bloom_dir=None,
+                 tick_store_enabled=False, tick_store_dir=None, keep_quote_history=False, sink_options=None):
         self.file = None
         self.session = None
+        self.stats = stats
+
+        # 批量写入配置：batch_size<=1 时退化为逐条提交
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.buffers = []
+        self.flush_task = None
+
+        # 写线程模式：数据库写入在独立线程中完成，不阻塞reactor
+        self.writer_enabled = writer_enabled
+        self.writer_queue_size = writer_queue_size
+        self.writer = None
+        self.waiting = deque()
+
+        # 布隆过滤器预去重：按表各维护一个，已知重复的item在写库前直接丢弃
+        self.bloom_enabled = bloom_enabled
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom_dir = bloom_dir
+        self.blooms = {}
+
+        # 逐笔行情存储：行情写入内存映射文件；keep_quote_history=False 时不再写 stock_data
+        self.tick_store_enabled = tick_store_enabled
+        self.tick_store_dir = tick_store_dir
+        self.keep_quote_history = keep_quote_history
+        self.tick_store = None
+
+        # 文件输出：RotatingJsonlSink 的参数
+        self.sink_options = sink_options or {}
+        self.sink_task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            stats=crawler.stats,
+            batch_size=settings.getint('DATABASE_BATCH_SIZE', 0),
+            batch_interval=settings.getfloat('DATABASE_BATCH_INTERVAL', 5.0),
+            writer_enabled=settings.getbool('DATABASE_WRITER_ENABLED', False),
+            writer_queue_size=settings.getint('DATABASE_WRITER_QUEUE_SIZE', 1000),
+            bloom_enabled=settings.getbool('BLOOM_FILTER_ENABLED', False),
+            bloom_capacity=settings.getint('BLOOM_FILTER_CAPACITY', 1000000),
+            bloom_error_rate=settings.getfloat('BLOOM_FILTER_ERROR_RATE', 0.001),
+            bloom_dir=settings.get('BLOOM_FILTER_DIR'),
+            tick_store_enabled=settings.getbool('TICK_STORE_ENABLED', False),
+            tick_store_dir=settings.get('TICK_STORE_DIR'),
+            keep_quote_history=settings.getbool('TICK_STORE_KEEP_HISTORY', False),
+            sink_options=dict(
+                directory=settings.get('JSONL_SINK_DIR', 'output'),
+                max_bytes=settings.getint('JSONL_SINK_MAX_BYTES', 64 * 1024 * 1024),
+                max_seconds=settings.getfloat('JSONL_SINK_MAX_SECONDS', 3600),
+                compression=settings.get('JSONL_SINK_COMPRESSION', 'gzip'),
+                buffer_size=settings.getint('JSONL_SINK_BUFFER_SIZE', 1024 * 1024),
+                flush_interval=settings.getfloat('JSONL_SINK_FLUSH_INTERVAL', 5.0),
+                fsync=settings.get('JSONL_SINK_FSYNC', 'rotate'),
+            ),
+        )
+
+    @property
+    def batch_enabled(self):
+        return self.batch_size > 1
 
     def open_spider(self, spider):
-        # 文件存储
-        filename = f"{spider.name}_data.json"
-        self.file = open(filename, 'w', encoding='utf-8')
+        # 文件存储：每次运行写入新的带时间戳的文件，不覆盖上次的输出
+        options = dict(self.sink_options)
+        options.setdefault('directory', 'output')
+        self.file = RotatingJsonlSink(prefix=f"{spider.name}_data", **options)
+        # 没有新数据时也按刷新间隔写出缓冲区、按时间滚动文件
+        from twisted.internet import task
+        self.sink_task = task.LoopingCall(self.file.flush_due)
+        self.sink_task.start(min(self.file.flush_interval, 1.0) or 1.0, now=False)
+
+        if not DATABASE_AVAILABLE:
+            return
+
+        if self.bloom_enabled:
+            self._load_blooms(spider)
+
+        if self.tick_store_enabled:
+            if TICK_STORE_AVAILABLE:
+                self.tick_store = TickStore(self.tick_store_dir)
+                spider.logger.info(f"逐笔行情存储目录: {self.tick_store.root}")
+            else:
+                spider.logger.warning("未安装 numpy，逐笔行情存储已禁用")
+
+        # 写线程模式下由写线程自己持有session
+        if self.writer_enabled:
+            self.writer = DatabaseWriter(self, spider, self.writer_queue_size)
+            self.writer.start()
+            spider.logger.info(f"数据库写线程已启动，队列容量: {self.writer_queue_size}")
+            return
 
         # 数据库存储
-        if DATABASE_AVAILABLE:
-            try:
-                self.session = get_session()
-                spider.logger.info("数据库连接成功")
-            except Exception as e:
-                spider.logger.error(f"数据库连接失败: {e}")
-                self.session = None
+        try:
+            self.session = get_session()
+            spider.logger.info("数据库连接成功")
+        except Exception as e:
+            spider.logger.error(f"数据库连接失败: {e}")
+            self.session = None
+
+        # 按时间间隔定期刷新缓冲区，避免低流量时数据长时间停留在内存中
+        if self.session and self.batch_enabled and self.batch_interval > 0:
+            from twisted.internet import task
+            self.flush_task = task.LoopingCall(self._flush_buffers, spider)
+            self.flush_task.start(self.batch_interval, now=False)
 
     def close_spider(self, spider):
+        if self.sink_task and self.sink_task.running:
+            self.sink_task.stop()
+
+        if self.writer:
+            # 在线程池中等待写线程清空队列，完成后再关闭文件
+            from twisted.internet import threads
+            d = threads.deferToThread(self.writer.stop)
+            d.addBoth(lambda _: self._close_storage(spider))
+            return d
+
+        if self.flush_task and self.flush_task.running:
+            self.flush_task.stop()
+        if self.session:
+            self._flush_buffers(spider)
+        self._close_storage(spider)
+
+    def _close_storage(self, spider):
         if self.file:
             self.file.close()
         if self.session:
             self.session.close()
+        if self.blooms:
+            self._save_blooms(spider)
+
+    def _bloom_path(self, table):
+        bloom_dir = self.bloom_dir or get_data_dir()
+        return os.path.join(bloom_dir, f"{get_database_stem()}.{table}.bloom")
+
+    def _load_blooms(self, spider):
+        # 过滤器文件与数据库的去重纪元绑定：数据库重建或清空后旧文件不再适用，加载时丢弃
+        session = get_session()
+        try:
+            epoch = get_dedupe_epoch(session)
+        except Exception as e:
+            spider.logger.warning(f"读取去重纪元失败，布隆过滤器已禁用: {e}")
+            return
+        finally:
+            session.close()
+
+        for model in (StockData, ResearchReport, FinancialNews):
+            table = model.__tablename__
+            bloom = BloomFilter.load(self._bloom_path(table), self.bloom_capacity, self.bloom_error_rate, epoch)
+            self.blooms[table] = bloom
+            spider.logger.info(f"布隆过滤器已加载: {table}, 已记录 {len(bloom)} 个key")
+
+    def _save_blooms(self, spider):
+        for table, bloom in self.blooms.items():
+            try:
+                bloom.save(self._bloom_path(table))
+            except OSError as e:
+                spider.logger.error(f"布隆过滤器保存失败: {table} - {e}")
+                continue
+            if bloom.is_saturated:
+                spider.logger.warning(
+                    f"布隆过滤器 {table} 已记录 {len(bloom)} 个key，超过容量 {bloom.capacity}，"
+                    f"误判率会升高，请调大 BLOOM_FILTER_CAPACITY"
+                )
+
+    def _is_known_duplicate(self, record):
+        model, values, _ = record
+        bloom = self.blooms.get(model.__tablename__)
+        key = values.get('dedupe_key')
+        return bloom is not None and key is not None and key in bloom
+
+    def _remember(self, records, failures):
+        """写库成功（包括因重复被跳过）的key加入布隆过滤器"""
+        if not self.blooms:
+            return
+        failed = {id(record) for record, _ in failures}
+        for record in records:
+            model, values, _ = record
+            key = values.get('dedupe_key')
+            if key is not None and id(record) not in failed:
+                self.blooms[model.__tablename__].add(key)
 
     def process_item(self, item, spider):
+        # 在reactor线程中的处理时间计入统计 pipeline/process_seconds（写线程的写库时间另计）
+        started = time.perf_counter()
+        try:
+            return self._process_item(item, spider)
+        finally:
+            if self.stats:
+                self.stats.inc_value('pipeline/process_seconds', time.perf_counter() - started)
+
+    def _process_item(self, item, spider):
         # 添加爬取时间
         item['crawl_time'] = datetime.now().isoformat()
 
+        record = None
+        if self.writer or self.session:
+            record = self._build_record(item, spider)
+
+        # 布隆过滤器判定为已入库的数据，不再写文件和数据库
+        if record is not None and self._is_known_duplicate(record):
+            if self.stats:
+                self.stats.inc_value(f'bloom/dropped/{record[0].__tablename__}')
+            raise DropItem(f"重复数据（布隆过滤器）: {record[2]}")
+
         # 文件存储
-        line = json.dumps(dict(item), ensure_ascii=False) + "\n"
-        self.file.write(line)
+        self.file.write(dict(item))
+
+        if record is None:
+            return item
 
         # 数据库存储
-        if self.session:
+        if self.writer:
+            return self._enqueue(record, item)
+
+        try:
+            self._save_to_database(record, spider)
+        except Exception as e:
+            spider.logger.error(f"数据库保存失败: {e}")
+
+        return item
+
+    def _enqueue(self, record, item):
+        """将记录交给写线程；队列已满时返回Deferred，由Scrapy暂停后续item处理"""
+        if not self.waiting:
+            try:
+                self.writer.queue.put_nowait(record)
+                return item
+            except queue.Full:
+                pass
+
+        from twisted.internet import defer
+        if self.stats:
+            self.stats.inc_value('pipeline/db_queue_full')
+        d = defer.Deferred()
+        self.waiting.append((record, item, d))
+        return d
+
+    def _release_waiting(self):
+        """在reactor线程中把等待的记录放入队列，并恢复对应item的处理"""
+        while self.waiting:
+            record, item, d = self.waiting[0]
+            try:
+                self.writer.queue.put_nowait(record)
+            except queue.Full:
+                return
+            self.waiting.popleft()
+            d.callback(item)
+
+    def _save_to_database(self, record, spider):
+        if self.batch_enabled:
+            self.buffers.append(record)
+            if len(self.buffers) >= self.batch_size:
+                self._flush_buffers(spider)
+            return
+
+        model, values, label = record
+        inserted = self._execute_rows(self.session, model, [values])
+        self.session.commit()
+        self._remember([record], [])
+        if inserted:
+            spider.logger.info(f"数据已保存到数据库: {label}")
+        else:
+            if self.stats:
+                self.stats.inc_value('pipeline/db_duplicates')
+            spider.logger.debug(f"重复数据，已跳过: {label}")
+
+    def _flush_buffers(self, spider):
+        """将缓冲区中的数据按模型批量插入，并只提交一次"""
+        if not self.buffers:
+            return
+
+        records, self.buffers = self.buffers, []
+        started = time.perf_counter()
+        inserted, failures = self._write_records(self.session, records)
+        self._report_write_result(spider, len(records), inserted, failures, time.perf_counter() - started)
+
+    @staticmethod
+    def _insert_statement(model):
+        """INSERT ... ON CONFLICT(dedupe_key) DO NOTHING，重复数据只消耗一次唯一索引查找"""
+        return sqlite_insert(model.__table__).on_conflict_do_nothing(index_elements=['dedupe_key'])
+
+    @staticmethod
+    def _latest_quote_statement():
+        """INSERT ... ON CONFLICT(symbol) DO UPDATE，只有更新的行情才覆盖快照
+
+        写入序号在语句中取当前最大值加一（索引上的一次查找）：语句执行时持有写锁，
+        序号按提交顺序递增，多个爬虫进程同时写入也不会重复
+        """
+        table = LatestQuote.__table__
+        next_seq = select(func.coalesce(func.max(table.c.change_seq), 0) + 1).scalar_subquery()
+        stmt = sqlite_insert(table).values(change_seq=next_seq)
+        columns = [column.name for column in table.columns if column.name != 'symbol']
+        return stmt.on_conflict_do_update(
+            index_elements=['symbol'],
+            set_={name: stmt.excluded[name] for name in columns},
+            where=stmt.excluded.crawl_time >= table.c.crawl_time,
+        )
+
+    def _execute_rows(self, session, model, rows):
+        """插入一组同类型记录，行情记录同时写入逐笔行情存储并更新最新行情快照；返回新插入条数（不提交）"""
+        if model is not StockData:
+            inserted = session.execute(self._insert_statement(model), rows).rowcount
+            record_inserts(session, model.__tablename__, inserted)
+            return inserted
+
+        inserted = 0
+        last_update = max(row['crawl_time'] for row in rows)
+        if self.tick_store is not None:
+            inserted = self.tick_store.append(session, rows)
+            record_inserts(session, TICK_STATS_NAME, inserted, last_update)
+        if self.keep_quote_history or self.tick_store is None:
+            inserted = session.execute(self._insert_statement(model), rows).rowcount
+            record_inserts(session, model.__tablename__, inserted, last_update)
+
+        snapshot_columns = [name for name in LatestQuote.__table__.columns.keys() if name != 'change_seq']
+        session.execute(self._latest_quote_statement(),
+                        [{name: row.get(name) for name in snapshot_columns} for row in rows])
+        return inserted
+
+    def _write_records(self, session, records):
+        """批量写入记录，返回 (新插入条数, 写入失败的 [(record, exception)] 列表)"""
+        grouped = {}
+        for model, values, _ in records:
+            grouped.setdefault(model, []).append(values)
+
+        try:
+            inserted = 0
+            for model, rows in grouped.items():
+                inserted += self._execute_rows(session, model, rows)
+            session.commit()
+            self._remember(records, [])
+            return inserted, []
+        except Exception:
+            session.rollback()
+
+        # 整批失败时逐条重试，定位具体失败的item
+        inserted = 0
+        failures = []
+        for record in records:
+            model, values, _ = record
             try:
-                self._save_to_database(item, spider)
+                inserted += self._execute_rows(session, model, [values])
+                session.commit()
             except Exception as e:
-                spider.logger.error(f"数据库保存失败: {e}")
+                session.rollback()
+                failures.append((record, e))
+        self._remember(records, failures)
+        return inserted, failures
 
-        return item
+    def _report_write_result(self, spider, count, inserted, failures, seconds=0.0):
+        for (_, _, label), e in failures:
+            spider.logger.error(f"数据库保存失败: {label} - {e}")
+
+        duplicates = count - inserted - len(failures)
+        if self.stats:
+            self.stats.inc_value('pipeline/db_batches')
+            self.stats.inc_value('pipeline/db_write_seconds', seconds)
+            self.stats.inc_value('pipeline/db_items_saved', inserted)
+            if duplicates:
+                self.stats.inc_value('pipeline/db_duplicates', duplicates)
+            if failures:
+                self.stats.inc_value('pipeline/db_write_errors', len(failures))
+        spider.logger.info(f"批量写入数据库完成: 新增 {inserted} 条，重复 {duplicates} 条，失败 {len(failures)} 条")
 
-    def _save_to_database(self, item, spider):
+    def _build_record(self, item, spider):
+        """根据item类型返回 (模型类, 字段字典, 日志标签)，未知类型返回None"""
         item_dict = dict(item)
+        label = item_dict.get('title', item_dict.get('name', 'Unknown'))
+        # 动态爬虫可通过 data_processing.remove_duplicates=false 关闭去重
+        dedupe = getattr(spider, 'remove_duplicates', True)
 
         # 根据item类型创建对应的数据库记录
         if 'symbol' in item_dict:  # 股票数据
-            db_item = StockData(
+            values = dict(
                 symbol=item_dict.get('symbol'),
                 name=item_dict.get('name'),
-                price=item_dict.get('price'),
-                change=item_dict.get('change'),
-                change_percent=item_dict.get('change_percent'),
-                volume=item_dict.get('volume'),
-                source_url=item_dict.get('source_url')
+                price=parse_number(item_dict.get('price')),
+                change=parse_number(item_dict.get('change')),
+                change_percent=parse_number(item_dict.get('change_percent')),
+                volume=parse_volume(item_dict.get('volume')),
+                turnover=parse_number(item_dict.get('turnover')),
+                quote_time=parse_datetime(item_dict.get('quote_time')),
+                source_url=item_dict.get('source_url'),
+                # 显式赋值，保证历史记录与最新行情快照的抓取时间一致
+                crawl_time=datetime.utcnow()
             )
+            values['dedupe_key'] = quote_key(
+                values['symbol'], values['quote_time'], values['price'],
+                values['change'], values['change_percent'], values['volume']
+            ) if dedupe else None
+            return StockData, values, label
         elif 'institution' in item_dict:  # 研究报告
-            db_item = ResearchReport(
+            return ResearchReport, dict(
                 title=item_dict.get('title'),
                 author=item_dict.get('author'),
                 institution=item_dict.get('institution'),
@@ -89,14 +504,15 @@ class FinancialDataPipeline:
                 rating=item_dict.get('rating'),
                 target_price=item_dict.get('target_price'),
                 summary=item_dict.get('summary'),
-                source_url=item_dict.get('source_url')
-            )
+                source_url=item_dict.get('source_url'),
+                dedupe_key=report_key(item_dict.get('source_url'), item_dict.get('title')) if dedupe else None
+            ), label
         elif 'category' in item_dict:  # 财经新闻
             keywords = item_dict.get('keywords', [])
             if isinstance(keywords, list):
                 keywords = ','.join(keywords)
 
-            db_item = FinancialNews(
+            return FinancialNews, dict(
                 title=item_dict.get('title'),
                 content=item_dict.get('content'),
                 author=item_dict.get('author'),
@@ -104,19 +520,16 @@ class FinancialDataPipeline:
                 source=item_dict.get('source'),
                 category=item_dict.get('category'),
                 keywords=keywords,
-                source_url=item_dict.get('source_url')
-            )
-        else:
-            spider.logger.warning("未知的item类型，跳过数据库存储")
+                source_url=item_dict.get('source_url'),
+                dedupe_key=news_key(item_dict.get('source_url'), item_dict.get('title')) if dedupe else None
+            ), label
 
-            spider.logger.info(f"=== 调试信息 ===")
-            spider.logger.info(f"Item字段: {list(item.fields.keys())}")
-            spider.logger.info(f"Item类型: {type(item)}")
-            spider.logger.info(f"Item_dict: {item_dict}")
-            spider.logger.info(f"Item_dict.keys(): {list(item_dict.keys())}")
+        spider.logger.warning("未知的item类型，跳过数据库存储")
 
-            return
+        spider.logger.info(f"=== 调试信息 ===")
+        spider.logger.info(f"Item字段: {list(item.fields.keys())}")
+        spider.logger.info(f"Item类型: {type(item)}")
+        spider.logger.info(f"Item_dict: {item_dict}")
+        spider.logger.info(f"Item_dict.keys(): {list(item_dict.keys())}")
 
-        self.session.add(db_item)
-        self.session.commit()
-        spider.logger.info(f"数据已保存到数据库: {item_dict.get('title', item_dict.get('name', 'Unknown'))}")
\ No newline at end of file
+        return None
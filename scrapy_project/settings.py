@@ -18,6 +18,50 @@ ITEM_PIPELINES = {
     'scrapy_project.pipelines.FinancialDataPipeline': 300,
 }
 
+# 数据库批量写入：缓冲达到条数上限或超过时间间隔(秒)时批量插入并提交一次
+# DATABASE_BATCH_SIZE 设为 0 或 1 时恢复逐条提交
+DATABASE_BATCH_SIZE = 500
+DATABASE_BATCH_INTERVAL = 5
+
+# 数据库写线程：item经有界队列交给独立线程写入，队列满时对Scrapy形成背压
+DATABASE_WRITER_ENABLED = True
+DATABASE_WRITER_QUEUE_SIZE = 1000
+
+# 布隆过滤器预去重：已入库过的item在写库前直接丢弃，过滤器文件保存在数据库文件旁边
+# 容量为预计的key数量，超过后误判率（误把新数据当作重复）会上升
+BLOOM_FILTER_ENABLED = True
+BLOOM_FILTER_CAPACITY = 1000000
+BLOOM_FILTER_ERROR_RATE = 0.001
+#BLOOM_FILTER_DIR = None  # 默认与数据库文件同目录
+
+# 逐笔行情存储（需要numpy）：行情追加到按 日期/代码 划分的定长记录文件，可用 numpy.memmap 零拷贝读取
+# 默认关闭：启用后行情历史只写入逐笔文件，stock_data 不再增长（latest_quotes 快照照常更新），
+# 读取 stock_data 的接口（/api/stats 的行情计数、/api/stocks 历史行情、/api/stocks/{id}、/api/export/stock_data）
+# 都不会再有新数据；逐笔文件的写入条数记在 table_stats 的 ticks 行。
+# TICK_STORE_KEEP_HISTORY = True 时同时写入 stock_data（写入量翻倍，上述接口照常更新）
+TICK_STORE_ENABLED = False
+TICK_STORE_KEEP_HISTORY = False
+#TICK_STORE_DIR = None  # 默认为数据库文件旁的 <数据库文件名>_ticks 目录
+
+# JSONL文件输出：写入 <目录>/<爬虫名>_data_<时间戳>.jsonl[.gz|.zst]，超过大小(未压缩字节)或时间(秒)后滚动到新文件
+JSONL_SINK_DIR = 'output'
+JSONL_SINK_MAX_BYTES = 64 * 1024 * 1024
+JSONL_SINK_MAX_SECONDS = 3600
+JSONL_SINK_COMPRESSION = 'gzip'  # none / gzip / zstd（需要安装zstandard）
+JSONL_SINK_BUFFER_SIZE = 1024 * 1024
+JSONL_SINK_FLUSH_INTERVAL = 5
+JSONL_SINK_FSYNC = 'rotate'  # never / rotate（文件关闭时）/ flush（每次写出缓冲区时）
+
+# 爬取任务统计：通过API提交的任务（设置了 CRAWL_JOB_ID）运行期间每隔这么多秒把统计数据写入 crawl_jobs
+# 运行历史：每次爬虫结束时把耗时、流量、响应延迟分位数、数据量等写入 crawl_runs
+EXTENSIONS = {
+    'scrapy_project.extensions.CrawlJobStats': 500,
+    'scrapy_project.extensions.CrawlRunRecorder': 510,
+}
+CRAWL_JOB_STATS_INTERVAL = 5
+CRAWL_RUNS_ENABLED = True
+CRAWL_RUNS_LATENCY_SAMPLES = 10000
+
 # 添加一些金融爬虫的基础配置
 DOWNLOAD_DELAY = 2  # 增加延迟，避免被封
 RANDOMIZE_DOWNLOAD_DELAY = 0.5
@@ -0,0 +1,175 @@
+# scrapy_project/sinks.py - 按大小/时间滚动、带缓冲和压缩的JSONL文件输出
+# 文件名形如 <前缀>_<YYYYmmdd_HHMMSS>.jsonl[.gz|.zst]，每次运行和每次滚动都写新文件，不会覆盖历史输出
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_SUFFIXES = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# fsync策略：never 交给操作系统；rotate 每个文件关闭时；flush 每次缓冲区写出时
+FSYNC_POLICIES = ('never', 'rotate', 'flush')
+
+
+class RotatingJsonlSink:
+    """JSONL输出：写入先进入内存缓冲区，文件超过大小或时间上限后切换到新文件
+
+    write() 只在写入时检查刷新间隔；没有新数据时需要调用方定期调用 flush_due()（如pipeline中的LoopingCall），
+    缓冲区才会按 flush_interval 写出、到时间的文件才会关闭
+    """
+
+    def __init__(self, directory, prefix, max_bytes=64 * 1024 * 1024, max_seconds=3600,
+                 compression='gzip', buffer_size=1024 * 1024, flush_interval=5.0, fsync='rotate'):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"不支持的fsync策略: {fsync}")
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("未安装 zstandard，JSONL输出改用gzip压缩")
+            compression = 'gzip'
+
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.path = None
+        self._raw = None
+        self._stream = None
+        self._opened_at = 0.0
+        self._file_bytes = 0  # 当前文件已写入的未压缩字节数
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, record):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        self._buffer.append(data)
+        self._buffered_bytes += len(data)
+
+        if (self._buffered_bytes >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓冲区写入当前文件，必要时先滚动到新文件"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        if self._stream is None or self._should_rotate():
+            self._rotate()
+
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._stream.write(data)
+        self._file_bytes += len(data)
+
+        if self.fsync == 'flush':
+            self._sync()
+
+    def flush_due(self):
+        """定时调用：缓冲区到了刷新间隔就写出；当前文件到了时间上限就关闭，下次有数据时写入新文件"""
+        if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        if self._stream is not None and self.max_seconds and time.monotonic() - self._opened_at >= self.max_seconds:
+            self._close_file()
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file_bytes >= self.max_bytes:
+            return True
+        return bool(self.max_seconds) and time.monotonic() - self._opened_at >= self.max_seconds
+
+    def _rotate(self):
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        suffix = f".jsonl{COMPRESSION_SUFFIXES[self.compression]}"
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}{suffix}")
+        sequence = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{sequence}{suffix}")
+            sequence += 1
+
+        self._raw = open(path, 'wb')
+        if self.compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+        elif self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor(level=3).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self.path = path
+        self._opened_at = time.monotonic()
+        self._file_bytes = 0
+        logger.info(f"JSONL输出文件: {path}")
+
+    def _sync(self):
+        # 压缩流需要先把已压缩的数据刷到文件，否则fsync不到最新内容
+        if self._stream is not self._raw:
+            self._stream.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def _close_file(self):
+        if self._stream is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        if self.fsync != 'never':
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+        self._raw.close()
+        self._raw = self._stream = None
+
+
+def open_jsonl(path):
+    """按扩展名打开（可能压缩的）JSONL文件，返回文本流"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"读取 {path} 需要安装 zstandard")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True),
+                                encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_jsonl(path):
+    """逐行读取JSONL文件，不把整个文件读入内存；忽略空行和最后一行未写完整的数据"""
+    with open_jsonl(path) as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+        except EOFError:
+            # 正在写入的压缩文件还没有结束标记
+            return
@@ -41,6 +41,10 @@ class DynamicSpider(scrapy.Spider):
         if 'allowed_domains' in self.config:
             self.allowed_domains = self.config['allowed_domains']
 
+        # 数据处理选项：remove_duplicates 由pipeline读取，决定是否按去重键跳过重复数据
+        data_processing = self.config.get('data_processing', {})
+        self.remove_duplicates = data_processing.get('remove_duplicates', True)
+
         # 应用爬虫设置
         spider_settings = self.config.get('spider_settings', {})
         for key, value in spider_settings.items():
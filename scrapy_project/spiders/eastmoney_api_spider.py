@@ -1,7 +1,10 @@
 import scrapy
 import json
 import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
 from scrapy_project.items import StockDataItem
+from database.normalize import parse_number, parse_volume
 
 
 class EastmoneyApiSpider(scrapy.Spider):
@@ -39,7 +42,7 @@ class EastmoneyApiSpider(scrapy.Spider):
             'invt': '2',  # 投资类型
             'fid': 'f3',  # 排序字段(f3=涨跌幅)
             'fs': 'm:0+t:6,m:0+t:80,m:1+t:2,m:1+t:23',  # 股票类型筛选
-            'fields': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f115,f152'
+            'fields': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f115,f152,f124'
         }
 
         # 构造完整URL
@@ -112,33 +115,19 @@ class EastmoneyApiSpider(scrapy.Spider):
         try:
             stock_item = StockDataItem()
 
-            # 根据东方财富API字段映射（常见字段）
+            # 根据东方财富API字段映射（常见字段），停牌等无数据时返回 "-"
             stock_item['symbol'] = stock_data.get('f12', '')  # 股票代码
             stock_item['name'] = stock_data.get('f14', '')  # 股票名称
-            stock_item['price'] = str(stock_data.get('f2', 0))  # 当前价
-            stock_item['change'] = str(stock_data.get('f4', 0))  # 涨跌额
-            stock_item['change_percent'] = str(stock_data.get('f3', 0))  # 涨跌幅
-            stock_item['volume'] = str(stock_data.get('f5', 0))  # 成交量
+            stock_item['price'] = parse_number(stock_data.get('f2'))  # 当前价
+            stock_item['change'] = parse_number(stock_data.get('f4'))  # 涨跌额
+            stock_item['change_percent'] = parse_number(stock_data.get('f3'))  # 涨跌幅
+            stock_item['volume'] = parse_volume(stock_data.get('f5'))  # 成交量
+            stock_item['turnover'] = parse_number(stock_data.get('f6'))  # 成交额
+            stock_item['quote_time'] = self.parse_quote_time(stock_data.get('f124'))  # 行情更新时间
             stock_item['source_url'] = response.url
 
             # 数据清洗和验证
             if stock_item['symbol'] and stock_item['name']:
-                # 格式化涨跌幅（添加%符号）
-                if stock_item['change_percent'] and stock_item['change_percent'] != '0':
-                    try:
-                        percent_val = float(stock_item['change_percent'])
-                        stock_item['change_percent'] = f"{percent_val:.2f}%"
-                    except:
-                        pass
-
-                # 格式化价格（保留两位小数）
-                if stock_item['price'] and stock_item['price'] != '0':
-                    try:
-                        price_val = float(stock_item['price'])
-                        stock_item['price'] = f"{price_val:.2f}"
-                    except:
-                        pass
-
                 self.logger.info(f"解析股票: {stock_item['symbol']} - {stock_item['name']}")
                 return stock_item
             else:
@@ -149,6 +138,12 @@ class EastmoneyApiSpider(scrapy.Spider):
             self.logger.error(f"解析股票数据失败: {e}")
             return None
 
+    def parse_quote_time(self, timestamp):
+        """f124 为行情更新时间的Unix时间戳，转换为北京时间字符串"""
+        if not isinstance(timestamp, (int, float)) or timestamp <= 0:
+            return None
+        return datetime.fromtimestamp(timestamp, ZoneInfo('Asia/Shanghai')).strftime('%Y-%m-%d %H:%M:%S')
+
     def get_next_page(self, page_num):
         """获取下一页数据"""
         api_url = "https://push2.eastmoney.com/api/qt/clist/get"
@@ -164,7 +159,7 @@ class EastmoneyApiSpider(scrapy.Spider):
             'invt': '2',
             'fid': 'f3',
             'fs': 'm:0+t:6,m:0+t:80,m:1+t:2,m:1+t:23',
-            'fields': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f115,f152'
+            'fields': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f115,f152,f124'
         }
 
         param_str = '&'.join([f"{k}={v}" for k, v in params.items()])
@@ -2,6 +2,7 @@ import scrapy
 import json
 import re
 from scrapy_project.items import StockDataItem
+from database.normalize import parse_number
 
 
 class SinaStockSpider(scrapy.Spider):
@@ -97,9 +98,8 @@ class SinaStockSpider(scrapy.Spider):
 
             stock_item['symbol'] = stock_code
             stock_item['name'] = data_parts[0]  # 股票名称
-            stock_item['price'] = data_parts[3]  # 当前价
 
-            # 计算涨跌额和涨跌幅
+            # 计算涨跌额和涨跌幅，统一输出数值，展示格式由API负责
             try:
                 current_price = float(data_parts[3])  # 当前价
                 prev_close = float(data_parts[2])  # 昨收价
@@ -107,15 +107,25 @@ class SinaStockSpider(scrapy.Spider):
                 change = current_price - prev_close  # 涨跌额
                 change_percent = (change / prev_close) * 100 if prev_close > 0 else 0  # 涨跌幅
 
-                stock_item['change'] = f"{change:+.2f}"  # 带正负号
-                stock_item['change_percent'] = f"{change_percent:+.2f}%"
+                stock_item['price'] = current_price
+                stock_item['change'] = round(change, 4)
+                stock_item['change_percent'] = round(change_percent, 4)
 
             except (ValueError, IndexError):
-                stock_item['change'] = "0.00"
-                stock_item['change_percent'] = "0.00%"
+                stock_item['price'] = parse_number(data_parts[3])
+                stock_item['change'] = 0.0
+                stock_item['change_percent'] = 0.0
 
             # 成交量（如果有的话）
-            stock_item['volume'] = data_parts[8] if len(data_parts) > 8 else "0"
+            try:
+                stock_item['volume'] = int(float(data_parts[8])) if len(data_parts) > 8 else 0
+            except ValueError:
+                stock_item['volume'] = None
+            # 成交额（元）
+            stock_item['turnover'] = parse_number(data_parts[9]) if len(data_parts) > 9 else None
+            # 行情日期和时间（第31、32个字段），用于去重
+            if len(data_parts) > 31 and data_parts[30] and data_parts[31]:
+                stock_item['quote_time'] = f"{data_parts[30]} {data_parts[31]}"
             stock_item['source_url'] = response.url
 
             self.logger.info(f"解析股票成功: {stock_item['symbol']} - {stock_item['name']} - {stock_item['price']}")
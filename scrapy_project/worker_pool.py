@@ -0,0 +1,359 @@
+# scrapy_project/worker_pool.py - 常驻的爬虫工作进程池
+# 每个工作进程启动时导入 Scrapy、项目设置、全部爬虫和pipeline（连同SQLAlchemy），之后一直运行 Twisted reactor，
+# 从自己的任务队列接收父进程分配的任务，用 CrawlerRunner 在同一个进程里反复运行爬虫，启动一次爬取不再需要重新导入。
+# 每个进程同时只运行一个任务；任务日志直接写入单独的文件，不在内存中缓冲。
+# 进程池大小为0时退回为每个任务启动一个 scrapy crawl 子进程，输出同样写入任务日志文件。
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS_MODULE = 'scrapy_project.settings'
+DEFAULT_LOG_DIR = os.path.join(PROJECT_ROOT, 'logs', 'crawl')
+
+# 工作进程退出后的重启间隔，避免启动即崩溃时反复重启
+RESPAWN_DELAY = 1.0
+
+
+class CrawlJob:
+    """一次爬取任务；future 的结果为 {'status', 'finish_reason', 'stats', 'error'}
+
+    任务id通过 CRAWL_JOB_ID 设置传给爬虫，CrawlJobStats 扩展据此更新 crawl_jobs 中的记录
+    """
+
+    def __init__(self, spider_name, spider_args=None, settings=None, log_dir=DEFAULT_LOG_DIR, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.spider_name = spider_name
+        self.spider_args = dict(spider_args or {})
+        self.settings = dict(settings or {})
+        self.settings['CRAWL_JOB_ID'] = self.job_id
+        self.submitted_at = datetime.utcnow()
+        self.started_at = None
+        self.worker_pid = None
+        self.log_file = os.path.join(
+            log_dir, f"{self.submitted_at:%Y%m%d_%H%M%S}_{spider_name}_{self.job_id[:8]}.log"
+        )
+        self.future = Future()
+
+    @property
+    def status(self):
+        if self.future.done():
+            return self.future.result()['status']
+        return 'running' if self.started_at else 'queued'
+
+    def wait(self, timeout=None):
+        return self.future.result(timeout)
+
+    def message(self):
+        """发给工作进程的任务描述（可以pickle）"""
+        return {
+            'job_id': self.job_id,
+            'spider_name': self.spider_name,
+            'spider_args': self.spider_args,
+            'settings': self.settings,
+            'log_file': self.log_file,
+        }
+
+
+class CrawlWorkerPool:
+    """任务由父进程分配：每个工作进程有自己的任务队列，只在空闲时收到一个任务。
+    父进程因此始终知道每个工作进程手上的任务，工作进程退出时可以准确地结束该任务
+    """
+
+    def __init__(self, size=2, log_dir=DEFAULT_LOG_DIR):
+        self.size = size
+        self.log_dir = log_dir
+        self.jobs = {}  # 未结束的任务，结束后删除
+        self._lock = threading.Lock()
+        self._started = False
+        self._closing = False
+        self._workers = {}  # pid -> Process
+        self._inboxes = {}  # pid -> 该工作进程的任务队列
+        self._ready = set()
+        self._idle = set()  # 已就绪且没有任务的工作进程
+        self._assigned = {}  # pid -> 已分配给该工作进程的 job_id
+        self._pending = deque()  # 等待空闲工作进程的任务
+        self._respawn_at = []  # 待重启的工作进程的重启时间（time.monotonic）
+        # 爬虫名 -> allowed_domains，由工作进程预热后上报
+        self.spider_domains = {}
+
+    def start(self):
+        """启动工作进程（在后台导入和预热，不等待就绪）"""
+        with self._lock:
+            if self._started or self.size <= 0:
+                return
+            context = multiprocessing.get_context('spawn')
+            self._context = context
+            self._event_queue = context.Queue()
+            for _ in range(self.size):
+                self._spawn()
+            self._collector = threading.Thread(target=self._collect, name='crawl-pool-collector', daemon=True)
+            self._collector.start()
+            self._started = True
+
+    def wait_ready(self, timeout=None):
+        """等待全部工作进程完成预热，返回是否就绪"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self._ready) < self.size:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def create_job(self, spider_name, spider_args=None, settings=None, job_id=None):
+        """创建任务但不提交，调用方可以先登记任务再用 submit_job 提交"""
+        return CrawlJob(spider_name, spider_args, settings, self.log_dir, job_id)
+
+    def submit(self, spider_name, spider_args=None, settings=None, job_id=None):
+        return self.submit_job(self.create_job(spider_name, spider_args, settings, job_id))
+
+    def submit_job(self, job):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.jobs[job.job_id] = job
+        if self.size <= 0:
+            threading.Thread(target=self._run_subprocess, args=(job,), daemon=True).start()
+            return job
+        self.start()
+        with self._lock:
+            self._pending.append(job.job_id)
+            self._assign()
+        return job
+
+    def shutdown(self, timeout=10):
+        """通知工作进程退出：正在运行的任务结束后退出，超时则强制结束；还没分配的任务标记为失败"""
+        with self._lock:
+            if not self._started:
+                return
+            self._closing = True
+            workers = list(self._workers.values())
+            for inbox in self._inboxes.values():
+                inbox.put(None)
+            pending = list(self._pending)
+            self._pending.clear()
+        for job_id in pending:
+            self._resolve(job_id, {'status': 'failed', 'finish_reason': None, 'stats': {},
+                                   'error': "进程池关闭，任务未运行"})
+        deadline = time.monotonic() + timeout
+        for process in workers:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._started = False
+
+    def _spawn(self):
+        inbox = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main, args=(inbox, self._event_queue), name='crawl-worker', daemon=True
+        )
+        process.start()
+        self._workers[process.pid] = process
+        self._inboxes[process.pid] = inbox
+
+    def _assign(self):
+        """在持有 _lock 时调用：把等待中的任务依次交给空闲的工作进程"""
+        while self._pending and self._idle:
+            pid = self._idle.pop()
+            job = self.jobs.get(self._pending.popleft())
+            if job is None:
+                self._idle.add(pid)
+                continue
+            self._assigned[pid] = job.job_id
+            self._inboxes[pid].put(job.message())
+
+    def _collect(self):
+        """接收工作进程的事件，并发现意外退出的工作进程"""
+        while True:
+            try:
+                event, pid, job_id, payload = self._event_queue.get(timeout=1)
+            except queue.Empty:
+                event = None
+            except (EOFError, OSError):
+                return
+
+            if event == 'ready':
+                self.spider_domains.update(payload)
+                with self._lock:
+                    if pid in self._workers:
+                        self._ready.add(pid)
+                        self._idle.add(pid)
+                        self._assign()
+            elif event == 'started':
+                job = self.jobs.get(job_id)
+                if job:
+                    job.started_at, job.worker_pid = payload, pid
+            elif event == 'finished':
+                with self._lock:
+                    if self._assigned.get(pid) == job_id:
+                        del self._assigned[pid]
+                        if pid in self._workers:
+                            self._idle.add(pid)
+                            self._assign()
+                self._resolve(job_id, payload)
+
+            self._reap()
+
+    def _reap(self):
+        failed = []
+        with self._lock:
+            if self._closing:
+                return
+            for pid, process in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                del self._workers[pid]
+                del self._inboxes[pid]
+                self._ready.discard(pid)
+                self._idle.discard(pid)
+                # 包括已分配但工作进程还没来得及上报 started 的任务
+                job_id = self._assigned.pop(pid, None)
+                if job_id:
+                    failed.append((job_id, f"工作进程意外退出，退出码 {process.exitcode}"))
+                # 不在这里等待：收集线程每秒至少检查一次，到时间后再重启
+                self._respawn_at.append(time.monotonic() + RESPAWN_DELAY)
+
+            now = time.monotonic()
+            for respawn_at in [t for t in self._respawn_at if t <= now]:
+                self._respawn_at.remove(respawn_at)
+                self._spawn()
+
+        # 释放锁之后再结束任务：future 的回调（如爬取任务队列启动下一个任务）可能再次调用进程池
+        for job_id, error in failed:
+            self._resolve(job_id, {'status': 'failed', 'finish_reason': None, 'stats': {}, 'error': error})
+
+    def _resolve(self, job_id, result):
+        """结束任务并不再保留：长期运行的API中已结束的任务只保存在数据库里"""
+        job = self.jobs.pop(job_id, None)
+        if job and not job.future.done():
+            job.future.set_result(result)
+
+    def _run_subprocess(self, job):
+        """进程池大小为0时的后备方式：每个任务一个 scrapy crawl 子进程"""
+        command = [sys.executable, '-m', 'scrapy', 'crawl', job.spider_name]
+        for key, value in job.spider_args.items():
+            command += ['-a', f"{key}={value}"]
+        for key, value in job.settings.items():
+            command += ['-s', f"{key}={value}"]
+        job.started_at = datetime.utcnow()
+        try:
+            with open(job.log_file, 'w', encoding='utf-8') as log:
+                returncode = subprocess.run(command, cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT).returncode
+            result = {'status': 'finished' if returncode == 0 else 'failed', 'finish_reason': None, 'stats': {},
+                      'error': None if returncode == 0 else f"scrapy crawl 返回码 {returncode}"}
+        except Exception as e:
+            result = {'status': 'failed', 'finish_reason': None, 'stats': {}, 'error': str(e)}
+        self._resolve(job.job_id, result)
+
+
+def _plain_stats(stats):
+    """统计值转为可以跨进程传递的基本类型"""
+    plain = {}
+    for key, value in stats.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif not isinstance(value, (int, float, str, bool, type(None))):
+            value = str(value)
+        plain[key] = value
+    return plain
+
+
+def _worker_main(job_queue, event_queue):
+    """工作进程入口：预热后运行 reactor，任务由接收线程转交给 reactor 线程执行"""
+    # 终端中的 Ctrl+C 会发给整个进程组，工作进程由父进程通知退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.chdir(PROJECT_ROOT)
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', SETTINGS_MODULE)
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+
+    from scrapy.crawler import CrawlerRunner
+    from scrapy.utils.log import configure_logging
+    from scrapy.utils.misc import load_object
+    from scrapy.utils.project import get_project_settings
+    from scrapy.utils.reactor import install_reactor
+
+    settings = get_project_settings()
+    if settings.get('TWISTED_REACTOR'):
+        install_reactor(settings['TWISTED_REACTOR'])
+    from twisted.internet import reactor
+
+    settings.set('LOG_INSTALL_ROOT_HANDLER', False)
+    configure_logging(settings)
+    logging.getLogger().setLevel(logging.DEBUG)
+
+    # 预热：导入全部爬虫模块和pipeline，同时取得各爬虫的域名
+    spider_loader = CrawlerRunner(settings).spider_loader
+    spider_domains = {
+        name: list(getattr(spider_loader.load(name), 'allowed_domains', None) or [])
+        for name in spider_loader.list()
+    }
+    for path in settings.getdict('ITEM_PIPELINES'):
+        load_object(path)
+
+    pid = os.getpid()
+
+    def run_job(job, done):
+        handler = logging.FileHandler(job['log_file'], encoding='utf-8')
+        handler.setFormatter(logging.Formatter(settings.get('LOG_FORMAT'), settings.get('LOG_DATEFORMAT')))
+        handler.setLevel(settings.get('LOG_LEVEL'))
+        logging.getLogger().addHandler(handler)
+
+        def finish(status, crawler=None, error=None):
+            try:
+                # 爬虫在创建阶段失败时 crawler 还没有 stats
+                collector = getattr(crawler, 'stats', None)
+                stats = _plain_stats(collector.get_stats()) if collector else {}
+            except Exception:
+                logging.getLogger(__name__).exception("读取爬虫统计失败")
+                stats = {}
+            finally:
+                logging.getLogger().removeHandler(handler)
+                handler.close()
+            event_queue.put(('finished', pid, job['job_id'], {
+                'status': status,
+                'finish_reason': stats.get('finish_reason'),
+                'stats': stats,
+                'error': error,
+            }))
+            done.set()
+
+        try:
+            job_settings = settings.copy()
+            job_settings.setdict(job['settings'], priority='cmdline')
+            runner = CrawlerRunner(job_settings)
+            crawler = runner.create_crawler(job['spider_name'])
+            deferred = runner.crawl(crawler, **job['spider_args'])
+        except Exception as e:
+            logging.getLogger(__name__).exception("启动爬虫失败")
+            finish('failed', error=str(e))
+            return
+
+        deferred.addCallbacks(
+            lambda _: finish('finished', crawler),
+            lambda failure: finish('failed', crawler, failure.getErrorMessage()),
+        )
+
+    def receive():
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            event_queue.put(('started', pid, job['job_id'], datetime.utcnow()))
+            done = threading.Event()
+            reactor.callFromThread(run_job, job, done)
+            done.wait()
+        reactor.callFromThread(reactor.stop)
+
+    threading.Thread(target=receive, name='crawl-job-receiver', daemon=True).start()
+    event_queue.put(('ready', pid, None, spider_domains))
+    reactor.run(installSignalHandlers=False)